@@ -0,0 +1,132 @@
+import copy
+import os
+import queue
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# Índices compostos para os filtros do histórico, sempre do mais recente para o mais antigo
+INDICES_HISTORICO = [
+    [('criado_em', -1)],
+    [('etapa_funil', 1), ('criado_em', -1)],
+    [('objetivo_campanha', 1), ('criado_em', -1)],
+]
+
+
+class RepositorioPlanos:
+    """Histórico de planos gerados em uma coleção do MongoDB.
+
+    `colecao` é uma coleção do pymongo (ou de um substituto em memória com a
+    mesma API, como o mongomock). As gravações vão para uma fila e são feitas
+    em lote por uma thread em segundo plano, sem atrasar quem salva;
+    `aguardar` bloqueia até a fila esvaziar.
+    """
+
+    def __init__(self, colecao: Any, tamanho_lote: int = 50):
+        self.colecao = colecao
+        self.tamanho_lote = tamanho_lote
+        self.gravados = 0
+        self.falhas = 0
+        self.ultimo_erro: Optional[str] = None
+        self._fila: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def garantir_indices(self) -> None:
+        """Cria os índices de INDICES_HISTORICO (sem efeito se já existirem)"""
+        for campos in INDICES_HISTORICO:
+            self.colecao.create_index(campos)
+
+    def salvar(self, params: Dict[str, Any], plano: Dict[str, str], **metricas: Any) -> None:
+        """Agenda a gravação do plano com `metricas` como modo, segundos,
+        tokens_entrada e tokens_saida"""
+        self._fila.put({
+            'objetivo_campanha': params['objetivo_campanha'],
+            'etapa_funil': params['etapa_funil'],
+            'criado_em': datetime.now(timezone.utc),
+            'params': copy.deepcopy(params),
+            'plano': dict(plano),
+            **metricas,
+        })
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._gravar_em_segundo_plano, daemon=True)
+                self._thread.start()
+
+    def aguardar(self) -> None:
+        """Bloqueia até todos os planos agendados serem gravados (ou falharem)"""
+        self._fila.join()
+
+    def _gravar_em_segundo_plano(self) -> None:
+        try:
+            self.garantir_indices()
+        except Exception as erro:
+            self.ultimo_erro = f"{type(erro).__name__}: {erro}"
+        while True:
+            documentos = [self._fila.get()]
+            # Junta o que mais estiver na fila em um único insert_many
+            while len(documentos) < self.tamanho_lote:
+                try:
+                    documentos.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.colecao.insert_many(documentos, ordered=False)
+                self.gravados += len(documentos)
+            except Exception as erro:
+                self.falhas += len(documentos)
+                self.ultimo_erro = f"{type(erro).__name__}: {erro}"
+            finally:
+                for _ in documentos:
+                    self._fila.task_done()
+
+    def listar(
+        self,
+        etapa_funil: Optional[str] = None,
+        campanha: Optional[str] = None,
+        inicio: Optional[datetime] = None,
+        fim: Optional[datetime] = None,
+        pagina: int = 0,
+        por_pagina: int = 20,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Planos mais recentes primeiro e o total que atende aos filtros.
+
+        `campanha` filtra pelo início do nome da campanha, o que usa o índice
+        de `objetivo_campanha`; `fim` é exclusivo.
+        """
+        filtro: Dict[str, Any] = {}
+        if etapa_funil:
+            filtro['etapa_funil'] = etapa_funil
+        if campanha:
+            filtro['objetivo_campanha'] = {'$regex': f"^{re.escape(campanha)}"}
+        if inicio or fim:
+            filtro['criado_em'] = {
+                **({'$gte': inicio} if inicio else {}),
+                **({'$lt': fim} if fim else {}),
+            }
+        cursor = self.colecao.find(filtro).sort('criado_em', -1).skip(pagina * por_pagina).limit(por_pagina)
+        return list(cursor), self.colecao.count_documents(filtro)
+
+
+def criar_repositorio_planos() -> Optional[RepositorioPlanos]:
+    """Repositório configurado pelas variáveis MONGODB_*, ou None sem MONGODB_URI.
+
+    O cliente mantém um pool de conexões e deve ser um só por processo.
+    `MONGODB_URI=mongomock://` usa o mongomock em memória.
+    """
+    uri = os.getenv("MONGODB_URI")
+    if not uri:
+        return None
+    if uri.startswith("mongomock://"):
+        import mongomock
+        cliente = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        cliente = MongoClient(
+            uri,
+            maxPoolSize=int(os.getenv("MONGODB_MAX_POOL", "20")),
+            serverSelectionTimeoutMS=int(os.getenv("MONGODB_TIMEOUT_MS", "5000")),
+        )
+    banco = cliente[os.getenv("MONGODB_DB", "planejamento_midia")]
+    return RepositorioPlanos(banco[os.getenv("MONGODB_COLECAO", "planos")])
@@ -0,0 +1,366 @@
+"""Benchmark do pipeline de geração com um modelo simulado, sem gastar cota da API.
+
+Uso:
+    python benchmark.py --saida benchmark.json
+    python benchmark.py --saida atual.json --comparar benchmark.json --tolerancia 0.2
+
+Mede a latência de ponta a ponta de um plano e o tempo até a primeira seção
+(GeradorPlano, nos modos encadeado e único), o custo de cada reexecução do
+main.py e a vazão do envio do formulário com várias sessões simultâneas
+(streamlit.testing). Com --comparar, termina com código 1 se algum tempo
+piorar mais que --tolerancia em relação ao relatório base.
+"""
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from unittest import mock
+
+from cache_contexto import CacheContexto
+from compactacao import estimar_tokens
+from gerador import DESCRICOES_METRICAS, ESQUEMA_PLANO_UNICO, METRICAS_POR_ETAPA, GeradorPlano
+from instrumentacao import percentil
+from provedores import RespostaModelo, UsoTokens
+from resiliencia import LimitadorTaxa, PoliticaResiliencia
+
+PARAMS_PADRAO = {
+    'objetivo_campanha': "Campanha de Awareness - Marca X",
+    'tipo_campanha': "Alcance",
+    'etapa_funil': "Topo",
+    'budget': 100000,
+    'periodo': "1 mês",
+    'ferramentas': ["Meta Ads (Facebook/Instagram)", "Google Ads"],
+    'localizacao_primaria': "MT, GO, RS",
+    'localizacao_secundaria': "Rio de Janeiro, São Paulo, Cuiabá",
+    'tipo_publico': "Interesses",
+    'tipo_criativo': ["Estático", "Vídeo"],
+    'metricas': {
+        metrica: {'selecionada': True, 'valor': "", 'descricao': DESCRICOES_METRICAS.get(metrica, "")}
+        for metrica in METRICAS_POR_ETAPA['Topo']
+    },
+    'detalhes_acao': "Campanha de produtos agrícolas para pequenos e médios produtores",
+    'observacoes': "",
+}
+
+
+class ErroSimulado(Exception):
+    """Erro temporário do modelo simulado (repetido pela política de resiliência)"""
+    code = 503
+
+
+class ModeloSimulado:
+    """Modelo falso com a interface do Gemini e desempenho configurável.
+
+    A latência até o primeiro token segue uma lognormal (`mediana_primeiro_token`,
+    `sigma_primeiro_token`), o texto sai a `tokens_por_segundo` e cada chamada
+    falha com probabilidade `taxa_erro`. Os sorteios dependem só da `semente`,
+    do prompt e de quantas vezes o mesmo prompt já foi chamado, então a mesma
+    carga produz os mesmos tempos em qualquer ordem de execução.
+
+    Com `tokens_entrada_por_segundo`, o primeiro token espera também o
+    processamento da entrada, menos o início do prompt que já foi visto em
+    outra chamada, em blocos de BLOCO_CACHE_CARACTERES, como no cache de
+    prefixos dos provedores. Esse tempo depende da ordem das chamadas.
+    """
+
+    BLOCO_CACHE_CARACTERES = 512  # ~128 tokens
+
+    def __init__(self, mediana_primeiro_token: float = 0.05, sigma_primeiro_token: float = 0.5,
+                 tokens_por_segundo: float = 2000, tokens_resposta: int = 400, taxa_erro: float = 0.0,
+                 semente: int = 0, tokens_entrada_por_segundo: float = 0.0):
+        self.model_name = "simulado"
+        self.mediana_primeiro_token = mediana_primeiro_token
+        self.sigma_primeiro_token = sigma_primeiro_token
+        self.tokens_por_segundo = tokens_por_segundo
+        self.tokens_resposta = tokens_resposta
+        self.taxa_erro = taxa_erro
+        self.semente = semente
+        self.tokens_entrada_por_segundo = tokens_entrada_por_segundo
+        self._chamadas: Dict[str, int] = {}
+        self._blocos_cache: set = set()
+        self._lock = threading.Lock()
+
+    def _sorteio(self, prompt: str) -> random.Random:
+        with self._lock:
+            n = self._chamadas.get(prompt, 0)
+            self._chamadas[prompt] = n + 1
+        digest = hashlib.sha256(f"{self.semente}:{n}:{prompt}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _tokens_cache(self, prompt: str) -> int:
+        # Hash de cada início do prompt que termina em fronteira de bloco
+        inicios = [
+            hashlib.sha256(prompt[:fim].encode("utf-8")).digest()
+            for fim in range(self.BLOCO_CACHE_CARACTERES, len(prompt) + 1, self.BLOCO_CACHE_CARACTERES)
+        ]
+        with self._lock:
+            em_cache = next((i for i, inicio in enumerate(inicios) if inicio not in self._blocos_cache), len(inicios))
+            self._blocos_cache.update(inicios)
+        return estimar_tokens(prompt[:em_cache * self.BLOCO_CACHE_CARACTERES])
+
+    def _texto(self, json_mode: bool, rng: random.Random) -> str:
+        if not json_mode:
+            # Cada resposta começa diferente, como as de um modelo de verdade
+            return f"## Análise {rng.getrandbits(32):08x}\n" + " ".join(f"palavra{i}" for i in range(self.tokens_resposta))
+        texto = " ".join(f"palavra{i}" for i in range(self.tokens_resposta // 6))
+        dados: Dict[str, Any] = {campo: texto for campo in ESQUEMA_PLANO_UNICO['properties'] if campo != 'cronograma'}
+        dados['cronograma'] = [
+            {'fase': f"Fase {i}", 'periodo': f"Semana {i}", 'percentual_budget': 25, 'acoes': texto[:80]}
+            for i in range(1, 5)
+        ]
+        return json.dumps(dados, ensure_ascii=False)
+
+    def generate_content(self, prompt: str, stream: bool = False, generation_config: Optional[Dict[str, Any]] = None):
+        rng = self._sorteio(prompt)
+        espera = self.mediana_primeiro_token * math.exp(self.sigma_primeiro_token * rng.gauss(0, 1))
+        falhar = rng.random() < self.taxa_erro
+        texto = self._texto((generation_config or {}).get('response_mime_type') == "application/json", rng)
+        uso = UsoTokens(estimar_tokens(prompt), estimar_tokens(texto), self._tokens_cache(prompt))
+        if self.tokens_entrada_por_segundo:
+            espera += (uso.prompt_token_count - uso.cached_content_token_count) / self.tokens_entrada_por_segundo
+        if stream:
+            return self._fragmentos(texto, uso, espera, falhar)
+        time.sleep(espera + uso.candidates_token_count / self.tokens_por_segundo)
+        if falhar:
+            raise ErroSimulado("Falha simulada do modelo")
+        return RespostaModelo(texto, uso, self.model_name)
+
+    def _fragmentos(self, texto: str, uso: UsoTokens, espera: float, falhar: bool) -> Iterator[RespostaModelo]:
+        time.sleep(espera)
+        if falhar:
+            raise ErroSimulado("Falha simulada do modelo")
+        tamanho = 80  # ~20 tokens por fragmento
+        partes = [texto[i:i + tamanho] for i in range(0, len(texto), tamanho)]
+        for i, parte in enumerate(partes):
+            time.sleep(estimar_tokens(parte) / self.tokens_por_segundo)
+            yield RespostaModelo(parte, uso if i == len(partes) - 1 else None, self.model_name)
+
+
+def resumo_tempos(valores: List[float]) -> Dict[str, float]:
+    """p50, p95, máximo e média em milissegundos"""
+    if not valores:
+        return {}
+    return {
+        'n': len(valores),
+        'p50_ms': round(percentil(valores, 50) * 1000, 2),
+        'p95_ms': round(percentil(valores, 95) * 1000, 2),
+        'max_ms': round(max(valores) * 1000, 2),
+        'media_ms': round(sum(valores) / len(valores) * 1000, 2),
+    }
+
+
+def medir_pipeline(modelo: ModeloSimulado, resiliencia: PoliticaResiliencia, planos: int, modo: str,
+                   streaming: bool) -> Dict[str, Any]:
+    """Latência de ponta a ponta e até a primeira seção concluída, sem cache de
+    respostas, com a fração dos tokens de entrada vinda do cache de prefixos"""
+    totais, primeiras, falhas = [], [], 0
+    contexto, tokens_entrada, tokens_cache = CacheContexto(), 0, 0
+    for i in range(planos):
+        # Um prompt diferente por plano, para cada plano ter seus próprios sorteios
+        params = {**PARAMS_PADRAO, 'observacoes': f"benchmark {i}"}
+        gerador = GeradorPlano(modelo, resiliencia=resiliencia, contexto=contexto)
+        inicio, primeira = time.perf_counter(), []
+        try:
+            gerador.gerar_plano(
+                params,
+                modo=modo,
+                ao_concluir=lambda *_: primeira or primeira.append(time.perf_counter() - inicio),
+                ao_fragmento=(lambda *_: None) if streaming else None,
+            )
+        except Exception:
+            falhas += 1
+            continue
+        finally:
+            tokens_entrada += gerador.tokens_entrada
+            tokens_cache += gerador.tokens_cache
+        totais.append(time.perf_counter() - inicio)
+        primeiras.extend(primeira[:1])
+    estatisticas = contexto.estatisticas()
+    return {
+        'plano': resumo_tempos(totais),
+        'primeira_secao': resumo_tempos(primeiras),
+        'falhas': falhas,
+        'prefixo': {
+            'acertos': estatisticas['acertos'],
+            'falhas': estatisticas['falhas'],
+            'fracao_tokens_cache': round(tokens_cache / tokens_entrada, 3) if tokens_entrada else 0.0,
+        },
+    }
+
+
+def _enviar_formulario(at: Any) -> None:
+    # Sem cache de respostas, para medir a geração de verdade
+    for checkbox in at.sidebar.checkbox:
+        if checkbox.label == "Ignorar cache de respostas":
+            checkbox.check()
+    at.button[0].click().run()
+    # A geração roda na fila em segundo plano e o AppTest não reexecuta sozinho
+    # o fragmento que acompanha o progresso. A espera consulta o estado direto
+    # no SQLite da fila: reexecutar o main.py a cada consulta disputaria a CPU
+    # com a geração, o que o fragmento (uma consulta por segundo) não faz
+    if 'tarefa' in at.session_state:
+        with closing(sqlite3.connect(os.environ['TAREFAS_PATH'], timeout=10)) as conexao:
+            consulta = "SELECT estado FROM tarefas WHERE id = ?"
+            while conexao.execute(consulta, (at.session_state['tarefa'],)).fetchone()[0] in ('na_fila', 'executando'):
+                time.sleep(0.02)
+    while 'tarefa' in at.session_state:
+        at.run()
+
+
+def _medir_sessao(caminho_main: str, configuracao: Dict[str, Any], indice: int,
+                  planos_por_sessao: int) -> Tuple[List[float], float, float]:
+    """Tempos de envio do formulário em uma sessão, com o instante do primeiro e do fim do último"""
+    from streamlit.testing.v1 import AppTest
+
+    with mock.patch("gerador.criar_modelo_texto", lambda: ModeloSimulado(**configuracao)):
+        app = AppTest.from_file(caminho_main, default_timeout=600)
+        app.run()
+        tempos, inicio_sessao = [], time.time()
+        for j in range(planos_por_sessao):
+            app.text_area[1].input(f"sessão {indice}, plano {j}")
+            inicio = time.perf_counter()
+            _enviar_formulario(app)
+            tempos.append(time.perf_counter() - inicio)
+    return tempos, inicio_sessao, time.time()
+
+
+def medir_streamlit(configuracao: Dict[str, Any], reexecucoes: int, sessoes: int,
+                    planos_por_sessao: int) -> Dict[str, Any]:
+    """Custo das reexecuções do main.py e vazão do envio do formulário com
+    `sessoes` sessões simultâneas"""
+    from streamlit.testing.v1 import AppTest
+
+    caminho_main = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+    # AppTest não pode rodar em várias threads do mesmo processo: cada sessão
+    # simultânea fica em um processo próprio, com o seu modelo simulado. Vem
+    # antes de qualquer AppTest aqui, que troca o __main__ herdado pelos processos
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=sessoes, mp_context=contexto, max_tasks_per_child=1) as executor:
+        resultados = list(executor.map(
+            _medir_sessao,
+            [caminho_main] * sessoes, [configuracao] * sessoes, range(sessoes), [planos_por_sessao] * sessoes,
+        ))
+    envios = [t for tempos, _, _ in resultados for t in tempos]
+    # A vazão conta do primeiro envio ao último, sem a partida dos processos
+    duracao = max(fim for _, _, fim in resultados) - min(inicio for _, inicio, _ in resultados)
+
+    at = AppTest.from_file(caminho_main, default_timeout=600)
+    at.run()
+    _enviar_formulario(at)
+    if at.exception:
+        raise RuntimeError(f"Erro no main.py: {at.exception[0].message}")
+    # Interações depois do plano gerado; o tempo vem do próprio script (tempos_execucao)
+    for i in range(reexecucoes):
+        at.sidebar.checkbox[0].set_value(i % 2 == 0).run()
+    tempos_reexecucao = [ms / 1000 for ms in at.session_state['tempos_execucao'][-reexecucoes:]]
+    return {
+        'reexecucao_apos_plano': resumo_tempos(tempos_reexecucao),
+        'envio_formulario': resumo_tempos(envios),
+        'sessoes': sessoes,
+        'planos_por_segundo': round(len(envios) / duracao, 3),
+    }
+
+
+def comparar(atual: Dict[str, Any], base: Dict[str, Any], tolerancia: float, caminho: str = "") -> List[str]:
+    """Tempos (chaves terminadas em _ms) que pioraram mais que `tolerancia` e vazões que caíram"""
+    regressoes = []
+    for chave, valor in atual.items():
+        antigo = base.get(chave) if isinstance(base, dict) else None
+        nome = f"{caminho}.{chave}" if caminho else chave
+        if isinstance(valor, dict) and isinstance(antigo, dict):
+            regressoes += comparar(valor, antigo, tolerancia, nome)
+        elif isinstance(valor, (int, float)) and isinstance(antigo, (int, float)) and antigo > 0:
+            if chave.endswith("_ms") and chave != 'max_ms' and valor > antigo * (1 + tolerancia):
+                regressoes.append(f"{nome}: {antigo} -> {valor}")
+            elif chave == 'planos_por_segundo' and valor < antigo * (1 - tolerancia):
+                regressoes.append(f"{nome}: {antigo} -> {valor}")
+    return regressoes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de geração com um modelo simulado")
+    parser.add_argument("--saida", default="benchmark.json", help="Relatório em JSON (padrão: benchmark.json)")
+    parser.add_argument("--planos", type=int, default=20, help="Planos por cenário do pipeline (padrão: 20)")
+    parser.add_argument("--reexecucoes", type=int, default=20, help="Reexecuções do main.py medidas (padrão: 20)")
+    parser.add_argument("--sessoes", type=int, default=4, help="Sessões Streamlit simultâneas (padrão: 4)")
+    parser.add_argument("--planos-por-sessao", type=int, default=3, help="Envios do formulário por sessão (padrão: 3)")
+    parser.add_argument("--mediana-primeiro-token", type=float, default=0.05, help="Segundos (padrão: 0.05)")
+    parser.add_argument("--sigma-primeiro-token", type=float, default=0.5, help="Dispersão lognormal (padrão: 0.5)")
+    parser.add_argument("--tokens-por-segundo", type=float, default=2000, help="Vazão de saída (padrão: 2000)")
+    parser.add_argument(
+        "--tokens-entrada-por-segundo", type=float, default=0.0,
+        help="Processamento da entrada fora do cache de prefixos (padrão: 0, sem custo de entrada)",
+    )
+    parser.add_argument("--tokens-resposta", type=int, default=400, help="Tokens por resposta (padrão: 400)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Probabilidade de falha por chamada (padrão: 0)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--sem-streamlit", action="store_true", help="Mede só o pipeline, sem o main.py")
+    parser.add_argument("--comparar", help="Relatório base para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Piora aceita em relação à base (padrão: 0.2)")
+    args = parser.parse_args(argv)
+
+    configuracao = {
+        'mediana_primeiro_token': args.mediana_primeiro_token,
+        'sigma_primeiro_token': args.sigma_primeiro_token,
+        'tokens_por_segundo': args.tokens_por_segundo,
+        'tokens_resposta': args.tokens_resposta,
+        'tokens_entrada_por_segundo': args.tokens_entrada_por_segundo,
+        'taxa_erro': args.taxa_erro,
+        'semente': args.semente,
+    }
+    modelo = ModeloSimulado(**configuracao)
+    # Repetições rápidas e sem limite de taxa: mede o pipeline, não a política da API
+    resiliencia = PoliticaResiliencia(LimitadorTaxa(por_segundo=1000, capacidade=1000), espera_base=0.01)
+
+    relatorio: Dict[str, Any] = {
+        'instante': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'configuracao': {**configuracao, 'planos': args.planos},
+        'pipeline': {},
+    }
+    for modo in ('encadeado', 'unico'):
+        for streaming in ((False, True) if modo == 'encadeado' else (False,)):
+            cenario = f"{modo}_streaming" if streaming else modo
+            relatorio['pipeline'][cenario] = medir_pipeline(modelo, resiliencia, args.planos, modo, streaming)
+            print(f"{cenario}: {relatorio['pipeline'][cenario]['plano']}", file=sys.stderr)
+
+    if not args.sem_streamlit:
+        with tempfile.TemporaryDirectory() as diretorio, mock.patch.dict(os.environ, {
+            'CACHE_RESPOSTAS_PATH': os.path.join(diretorio, "respostas.sqlite3"),
+            'CHAMADAS_LOG_PATH': os.path.join(diretorio, "chamadas.jsonl"),
+            'INDICE_PLANOS_PATH': os.path.join(diretorio, "planos.jsonl"),
+            'TAREFAS_PATH': os.path.join(diretorio, "tarefas.sqlite3"),
+            'MODELO_REQUISICOES_POR_MINUTO': "60000",
+            'MODELO_RAJADA': "1000",
+        }), mock.patch("gerador.criar_modelo_texto", lambda: modelo):
+            os.environ.pop('MONGODB_URI', None)
+            relatorio['streamlit'] = medir_streamlit(configuracao, args.reexecucoes, args.sessoes, args.planos_por_sessao)
+        print(f"streamlit: {relatorio['streamlit']}", file=sys.stderr)
+
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            regressoes = comparar(relatorio, json.load(arquivo), args.tolerancia)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}", file=sys.stderr)
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from compactacao import estimar_tokens
+
+
+class CacheContexto:
+    """Registro em memória dos prefixos compartilhados enviados a cada modelo.
+
+    Os provedores reaproveitam o processamento de um prefixo idêntico ao de
+    uma chamada recente (cache de contexto implícito da OpenAI e do Gemini), e
+    as respostas informam quantos tokens de entrada vieram desse cache. Este
+    registro faz o papel local do cache: conta como acerto o prefixo já enviado
+    ao mesmo modelo há no máximo `ttl_segundos`, para acompanhar o
+    reaproveitamento mesmo com provedores que não informam os tokens em cache.
+    """
+
+    def __init__(self, ttl_segundos: float = 300, max_prefixos: int = 1000):
+        self.ttl_segundos = ttl_segundos
+        self.max_prefixos = max_prefixos
+        self.acertos = 0
+        self.falhas = 0
+        self.tokens_reaproveitados = 0
+        # chave do prefixo -> instante do último envio, do mais antigo ao mais recente
+        self._prefixos: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def registrar(self, modelo: str, prefixo: str) -> bool:
+        """Registra o envio do prefixo ao modelo; True se ele já estava no cache"""
+        chave = hashlib.sha256(f"{modelo}\n{prefixo}".encode("utf-8")).hexdigest()
+        agora = time.time()
+        with self._lock:
+            enviado_em = self._prefixos.pop(chave, None)
+            acerto = enviado_em is not None and agora - enviado_em <= self.ttl_segundos
+            self._prefixos[chave] = agora
+            while len(self._prefixos) > self.max_prefixos:
+                self._prefixos.popitem(last=False)
+            if acerto:
+                self.acertos += 1
+                self.tokens_reaproveitados += estimar_tokens(prefixo)
+            else:
+                self.falhas += 1
+        return acerto
+
+    def estatisticas(self) -> Dict[str, int]:
+        """Acertos, falhas, tokens de prefixo reaproveitados (estimados) e prefixos ainda válidos"""
+        limite = time.time() - self.ttl_segundos
+        with self._lock:
+            validos = sum(1 for enviado_em in self._prefixos.values() if enviado_em >= limite)
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'tokens_reaproveitados': self.tokens_reaproveitados,
+                'prefixos': validos,
+            }
+
+
+def criar_cache_contexto() -> CacheContexto:
+    """Registro configurado pelas variáveis de ambiente CACHE_CONTEXTO_*"""
+    return CacheContexto(
+        ttl_segundos=float(os.getenv("CACHE_CONTEXTO_TTL", "300")),
+        max_prefixos=int(os.getenv("CACHE_CONTEXTO_MAX_PREFIXOS", "1000")),
+    )
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+def normalizar_prompt(prompt: str) -> str:
+    """Remove a indentação e os espaços nas bordas de cada linha do prompt"""
+    return "\n".join(linha.strip() for linha in prompt.strip().splitlines())
+
+
+def chave_cache(prompt: str, modelo: str, config: Optional[Dict[str, Any]] = None) -> str:
+    """Hash canônico de prompt, nome do modelo e configuração de geração"""
+    conteudo = json.dumps(
+        {'prompt': normalizar_prompt(prompt), 'modelo': modelo, 'config': config or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+class CacheRespostas:
+    """Cache em disco (SQLite) das respostas do modelo, compartilhado entre
+    sessões e processos, com expiração (TTL) e remoção LRU por número de entradas.
+    """
+
+    def __init__(self, caminho: str, max_entradas: int = 5000, ttl_segundos: float = 7 * 24 * 3600):
+        self.caminho = caminho
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS respostas (
+                    chave TEXT PRIMARY KEY,
+                    resposta TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL
+                )
+            """)
+            conexao.execute("CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas (acessado_em)")
+
+    @contextmanager
+    def _conectar(self) -> Iterator[sqlite3.Connection]:
+        # Uma conexão por operação: sqlite3 não compartilha conexões entre threads
+        conexao = sqlite3.connect(self.caminho, timeout=10)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def obter(self, chave: str) -> Optional[str]:
+        """Retorna a resposta em cache ou None se ausente/expirada"""
+        agora = time.time()
+        with self._conectar() as conexao:
+            linha = conexao.execute(
+                "SELECT resposta, criado_em FROM respostas WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha and agora - linha[1] <= self.ttl_segundos:
+                conexao.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (agora, chave))
+                resposta = linha[0]
+            else:
+                if linha:
+                    conexao.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+                resposta = None
+
+        with self._lock:
+            if resposta is None:
+                self.falhas += 1
+            else:
+                self.acertos += 1
+        return resposta
+
+    def salvar(self, chave: str, resposta: str) -> None:
+        """Grava a resposta e remove as entradas menos usadas acima do limite"""
+        agora = time.time()
+        with self._conectar() as conexao:
+            conexao.execute(
+                "INSERT OR REPLACE INTO respostas (chave, resposta, criado_em, acessado_em) VALUES (?, ?, ?, ?)",
+                (chave, resposta, agora, agora),
+            )
+            conexao.execute("DELETE FROM respostas WHERE criado_em < ?", (agora - self.ttl_segundos,))
+            conexao.execute(
+                """
+                DELETE FROM respostas WHERE chave IN (
+                    SELECT chave FROM respostas ORDER BY acessado_em DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entradas,),
+            )
+
+    def limpar(self) -> None:
+        """Remove todas as entradas do cache"""
+        with self._conectar() as conexao:
+            conexao.execute("DELETE FROM respostas")
+
+    def estatisticas(self) -> Dict[str, int]:
+        """Contadores de acertos/falhas deste processo e total de entradas em disco"""
+        with self._conectar() as conexao:
+            entradas = conexao.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+        return {'acertos': self.acertos, 'falhas': self.falhas, 'entradas': entradas}
+
+
+def criar_cache_respostas() -> CacheRespostas:
+    """Cache configurado pelas variáveis de ambiente CACHE_RESPOSTAS_*"""
+    return CacheRespostas(
+        os.getenv("CACHE_RESPOSTAS_PATH", ".cache/respostas.sqlite3"),
+        max_entradas=int(os.getenv("CACHE_RESPOSTAS_MAX_ENTRADAS", "5000")),
+        ttl_segundos=float(os.getenv("CACHE_RESPOSTAS_TTL", str(7 * 24 * 3600))),
+    )
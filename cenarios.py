@@ -0,0 +1,162 @@
+from typing import Any, Dict, List
+
+import numpy as np
+
+from orcamento import INDICE_PLATAFORMA, pesos_plataformas
+from previsao import COLUNAS_BENCHMARK, MESES_POR_PERIODO, carregar_benchmarks
+
+# Público alcançável por mês em cada plataforma, por etapa do funil, em milhões
+# de pessoas (ordem de orcamento.PLATAFORMAS). Estimativas para uma campanha
+# regional: no meio e no fundo do funil a segmentação restringe o público
+PUBLICO_POR_ETAPA = {
+    'Topo':  np.array([6.0, 8.0, 3.5, 1.0, 6.0, 7.0, 1.0, 0.8]),
+    'Meio':  np.array([2.4, 3.2, 1.4, 0.4, 2.4, 2.8, 0.4, 0.3]),
+    'Fundo': np.array([0.5, 0.6, 0.3, 0.1, 0.5, 0.6, 0.1, 0.07]),
+}
+
+# Métrica que escolhe a melhor mistura de plataformas em cada etapa do funil
+METRICA_POR_ETAPA = {'Topo': 'Alcance', 'Meio': 'Cliques', 'Fundo': 'Resultados'}
+
+METRICAS_CENARIO = ('Alcance', 'Cliques', 'Resultados')
+
+# Concentração das misturas sorteadas em torno da distribuição atual (maior = mais próximas)
+CONCENTRACAO_MISTURAS = 8.0
+
+
+def misturas_candidatas(params: Dict[str, Any], n_misturas: int = 24, semente: int = 0) -> np.ndarray:
+    """Matriz mistura × plataforma com a fatia do budget de cada plataforma
+    escolhida. A linha 0 é a distribuição atual (orcamento.calcular_distribuicao);
+    seguem uma linha por plataforma sozinha e misturas sorteadas ao redor da atual"""
+    ferramentas = [f for f in params['ferramentas'] if f in INDICE_PLATAFORMA]
+    if not ferramentas:
+        raise ValueError("Nenhuma plataforma conhecida selecionada para os cenários")
+    okrs = [k for k, v in params['metricas'].items() if v['selecionada']]
+    atual = pesos_plataformas(params['etapa_funil'], ferramentas, okrs)
+    atual = atual / atual.sum()
+    if len(ferramentas) == 1:
+        return atual[None, :]
+
+    rng = np.random.default_rng(semente)
+    sorteadas = rng.dirichlet(CONCENTRACAO_MISTURAS * len(ferramentas) * atual, max(n_misturas - 1 - len(ferramentas), 0))
+    return np.vstack([atual, np.eye(len(ferramentas)), sorteadas])
+
+
+def curvas_resposta(params: Dict[str, Any], budgets: np.ndarray, misturas: np.ndarray) -> Dict[str, np.ndarray]:
+    """Alcance, cliques e resultados de cada budget × mistura, com os ganhos
+    marginais de cada um por real adicional gasto na mesma mistura.
+
+    Em cada plataforma, o alcance satura no público disponível, A·(1 - e^(-I/A)),
+    e as impressões além da frequência útil rendem cada vez menos cliques:
+    I_útil = A·f·(1 - e^(-I/(A·f))). O público e a frequência útil crescem com a
+    raiz da duração da campanha, como em previsao.simular_resultados.
+    """
+    ferramentas = [f for f in params['ferramentas'] if f in INDICE_PLATAFORMA]
+    benchmarks = carregar_benchmarks()[params['etapa_funil']]
+    b = np.array([benchmarks[p] for p in ferramentas]).T
+    colunas = {coluna: b[i] for i, coluna in enumerate(COLUNAS_BENCHMARK)}
+    escala_periodo = np.sqrt(MESES_POR_PERIODO.get(params['periodo'], 1))
+    publico = PUBLICO_POR_ETAPA[params['etapa_funil']][[INDICE_PLATAFORMA[f] for f in ferramentas]] * 1e6 * escala_periodo
+    saturacao = publico * colunas['frequencia'] * escala_periodo
+
+    # Eixos: budget × mistura × plataforma
+    custos = budgets[:, None, None] * misturas[None, :, :]
+    impressoes_por_real = 1000 / colunas['cpm']
+    impressoes = custos * impressoes_por_real
+    naoalcancados = np.exp(-impressoes / publico)
+    naosaturados = np.exp(-impressoes / saturacao)
+    cliques_por_impressao = np.minimum(colunas['ctr'], 1)
+    resultados_por_clique = np.minimum(colunas['cvr'], 1)
+
+    alcance = publico * (1 - naoalcancados)
+    cliques = saturacao * (1 - naosaturados) * cliques_por_impressao
+    # Derivadas em relação ao budget, com cada plataforma recebendo a sua fatia do real adicional
+    marginal_alcance = naoalcancados * impressoes_por_real * misturas
+    marginal_cliques = naosaturados * impressoes_por_real * cliques_por_impressao * misturas
+    return {
+        'Impressões': impressoes.sum(axis=2),
+        'Alcance': alcance.sum(axis=2),
+        'Cliques': cliques.sum(axis=2),
+        'Resultados': (cliques * resultados_por_clique).sum(axis=2),
+        'Alcance por R$': marginal_alcance.sum(axis=2),
+        'Cliques por R$': marginal_cliques.sum(axis=2),
+        'Resultados por R$': (marginal_cliques * resultados_por_clique).sum(axis=2),
+        'alcance_plataforma': alcance,
+        'cliques_plataforma': cliques,
+    }
+
+
+def simular_cenarios(params: Dict[str, Any], fator_minimo: float = 0.25, fator_maximo: float = 4.0,
+                     n_budgets: int = 40, n_misturas: int = 24, semente: int = 0) -> Dict[str, Any]:
+    """Grade de cenários de budget (de `fator_minimo` a `fator_maximo` vezes o
+    budget atual, em escala geométrica, incluindo o atual) × mistura de plataformas"""
+    budgets = np.unique(np.append(
+        np.geomspace(params['budget'] * fator_minimo, params['budget'] * fator_maximo, n_budgets),
+        float(params['budget']),
+    ))
+    misturas = misturas_candidatas(params, n_misturas, semente)
+    curvas = curvas_resposta(params, budgets, misturas)
+    metrica = METRICA_POR_ETAPA[params['etapa_funil']]
+    return {
+        'plataformas': [f for f in params['ferramentas'] if f in INDICE_PLATAFORMA],
+        'budgets': budgets,
+        'misturas': misturas,
+        'metrica': metrica,
+        'indice_budget_atual': int(np.searchsorted(budgets, params['budget'])),
+        'melhor_mistura': curvas[metrica].argmax(axis=1),
+        **curvas,
+    }
+
+
+def curvas_dataframe(cenarios: Dict[str, Any], mistura: int = 0):
+    """DataFrame indexado pelo budget com os totais e os ganhos por R$ 1.000
+    adicionais da `mistura` (0 = distribuição atual), para gráficos"""
+    import pandas as pd
+
+    dados = {metrica: cenarios[metrica][:, mistura] for metrica in METRICAS_CENARIO}
+    for metrica in METRICAS_CENARIO:
+        dados[f"{metrica} por R$ 1.000"] = cenarios[f"{metrica} por R$"][:, mistura] * 1000
+    return pd.DataFrame(dados, index=pd.Index(cenarios['budgets'].round(2), name="Budget (R$)"))
+
+
+def resumo_cenario(cenarios: Dict[str, Any], indice_budget: int, mistura: int) -> Dict[str, Any]:
+    """Budget, fatia de cada plataforma, totais e ganhos marginais de um cenário"""
+    budget = float(cenarios['budgets'][indice_budget])
+    fatias = cenarios['misturas'][mistura]
+    plataformas: List[Dict[str, Any]] = [
+        {
+            'plataforma': plataforma,
+            'fatia': float(fatia),
+            'valor': budget * float(fatia),
+            'alcance': float(cenarios['alcance_plataforma'][indice_budget, mistura, i]),
+            'cliques': float(cenarios['cliques_plataforma'][indice_budget, mistura, i]),
+        }
+        for i, (plataforma, fatia) in enumerate(zip(cenarios['plataformas'], fatias))
+        if fatia > 0.0005
+    ]
+    return {
+        'budget': budget,
+        'plataformas': plataformas,
+        **{metrica: float(cenarios[metrica][indice_budget, mistura]) for metrica in METRICAS_CENARIO},
+        **{f"{metrica} por R$": float(cenarios[f"{metrica} por R$"][indice_budget, mistura]) for metrica in METRICAS_CENARIO},
+    }
+
+
+def tabela_cenario_markdown(resumo: Dict[str, Any]) -> str:
+    """Tabelas Markdown do cenário: divisão por plataforma e totais com os ganhos marginais"""
+    linhas = [
+        "| Plataforma | % Budget | Valor (R$) | Alcance | Cliques |",
+        "| --- | --- | --- | --- | --- |",
+    ]
+    for item in resumo['plataformas']:
+        linhas.append(
+            f"| {item['plataforma']} | {item['fatia']:.1%} | {item['valor']:,.2f} "
+            f"| {item['alcance']:,.0f} | {item['cliques']:,.0f} |"
+        )
+    linhas += [
+        "",
+        "| Métrica | Total | A cada R$ 1.000 adicionais |",
+        "| --- | --- | --- |",
+    ]
+    for metrica in METRICAS_CENARIO:
+        linhas.append(f"| {metrica} | {resumo[metrica]:,.0f} | {resumo[f'{metrica} por R$'] * 1000:,.1f} |")
+    return "\n".join(linhas)
@@ -0,0 +1,83 @@
+import json
+import math
+import re
+from typing import Any, Dict, List
+
+from orcamento import calcular_distribuicao
+
+MAX_ITENS_POR_TOPICO = 5
+MAX_CARACTERES_POR_ITEM = 200
+
+# Ordem dos tópicos no resumo da recomendação estratégica
+ORDEM_TOPICOS = ['analise', 'oportunidades', 'riscos', 'abordagem']
+
+# Palavras que identificam o tópico de cada header, na ordem em que são testadas
+TOPICOS_ESTRATEGIA = [
+    ('riscos', ('risco',)),
+    ('oportunidades', ('oportunidade',)),
+    ('abordagem', ('abordagem', 'recomenda', 'conclus')),
+    ('analise', ('análise', 'analise', 'estratég', 'estrateg')),
+]
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa de tokens (≈ 4 caracteres por token), sem chamar a API"""
+    return math.ceil(len(texto) / 4)
+
+
+def _topico(titulo: str, atual: str) -> str:
+    titulo = titulo.lower()
+    for topico, palavras in TOPICOS_ESTRATEGIA:
+        if any(palavra in titulo for palavra in palavras):
+            return topico
+    return atual
+
+
+def _primeira_frase(texto: str) -> str:
+    frase = re.split(r"(?<=[.!?])\s", texto, maxsplit=1)[0]
+    if len(frase) > MAX_CARACTERES_POR_ITEM:
+        frase = frase[:MAX_CARACTERES_POR_ITEM].rsplit(" ", 1)[0] + "…"
+    return frase
+
+
+def resumir_estrategia(texto: str) -> Dict[str, List[str]]:
+    """Extrai as decisões principais da recomendação estratégica por tópico
+    (análise, oportunidades, riscos e abordagem): a primeira frase de cada
+    parágrafo ou item de lista, limitada a MAX_ITENS_POR_TOPICO por tópico"""
+    resumo: Dict[str, List[str]] = {topico: [] for topico in ORDEM_TOPICOS}
+    atual = 'analise'
+    for linha in texto.splitlines():
+        linha = linha.strip()
+        if not linha:
+            continue
+        # Headers em Markdown ou linhas inteiras em negrito ("**Riscos:**")
+        negrito = re.fullmatch(r"\*\*([^*]+)\*\*:?", linha)
+        if linha.startswith("#") or negrito:
+            atual = _topico(negrito.group(1) if negrito else linha.lstrip("#"), atual)
+            continue
+        item = re.sub(r"^([-*+•]|\d+[.)])\s+", "", linha).replace("**", "").strip()
+        if item and len(resumo[atual]) < MAX_ITENS_POR_TOPICO:
+            resumo[atual].append(_primeira_frase(item))
+    return {topico: itens for topico, itens in resumo.items() if itens}
+
+
+def resumir_distribuicao(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Alocações em R$ por plataforma, localização (e localidade reconhecida) e criativo"""
+    distribuicao = calcular_distribuicao(params)
+    centavos = distribuicao['centavos']
+    resumo = {
+        'budget_total': params['budget'],
+        'por_plataforma': dict(zip(distribuicao['plataformas'], (centavos.sum(axis=(1, 2)) / 100).tolist())),
+        'por_localizacao': dict(zip(distribuicao['localizacoes'], (centavos.sum(axis=(0, 2)) / 100).tolist())),
+        'por_criativo': dict(zip(distribuicao['criativos'], (centavos.sum(axis=(0, 1)) / 100).tolist())),
+    }
+    if distribuicao['localidades']:
+        resumo['por_localidade'] = {
+            localidade.rotulo: valor / 100 for _, localidade, _, valor in distribuicao['localidades']
+        }
+    return resumo
+
+
+def em_json(resumo: Dict[str, Any]) -> str:
+    """JSON compacto para inserir no prompt"""
+    return json.dumps(resumo, ensure_ascii=False, separators=(",", ":"))
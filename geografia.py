@@ -0,0 +1,354 @@
+"""Índice geográfico do Brasil: estados e municípios com código IBGE, nome
+normalizado, população e UF, para reconhecer as localizações digitadas no
+formulário e dividir o budget entre elas pela população.
+
+O índice de municípios (dados/municipios.npy) é gerado uma vez e versionado;
+em execução ele é mapeado em memória na primeira consulta. Para gerá-lo de
+novo (códigos IBGE do pacote brutils e populações do GeoNames, pacote
+geonamescache, que não são dependências do app):
+
+    pip install brutils geonamescache
+    python geografia.py
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+CAMINHO_MUNICIPIOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados", "municipios.npy")
+
+# Unidades da federação na ordem do código IBGE: sigla -> (código, nome)
+ESTADOS = {
+    'RO': (11, "Rondônia"), 'AC': (12, "Acre"), 'AM': (13, "Amazonas"), 'RR': (14, "Roraima"),
+    'PA': (15, "Pará"), 'AP': (16, "Amapá"), 'TO': (17, "Tocantins"), 'MA': (21, "Maranhão"),
+    'PI': (22, "Piauí"), 'CE': (23, "Ceará"), 'RN': (24, "Rio Grande do Norte"), 'PB': (25, "Paraíba"),
+    'PE': (26, "Pernambuco"), 'AL': (27, "Alagoas"), 'SE': (28, "Sergipe"), 'BA': (29, "Bahia"),
+    'MG': (31, "Minas Gerais"), 'ES': (32, "Espírito Santo"), 'RJ': (33, "Rio de Janeiro"), 'SP': (35, "São Paulo"),
+    'PR': (41, "Paraná"), 'SC': (42, "Santa Catarina"), 'RS': (43, "Rio Grande do Sul"),
+    'MS': (50, "Mato Grosso do Sul"), 'MT': (51, "Mato Grosso"), 'GO': (52, "Goiás"), 'DF': (53, "Distrito Federal"),
+}
+SIGLAS = list(ESTADOS)  # o campo 'uf' do índice é a posição nesta lista
+
+# Um registro de 84 bytes por município; `chave` é o nome normalizado (normalizar_nome)
+DTYPE_MUNICIPIOS = np.dtype([
+    ('codigo', '<i4'), ('uf', 'u1'), ('populacao', '<i4'), ('chave', 'S33'), ('nome', 'S42'),
+])
+
+# Diferença máxima (edições) aceita na busca aproximada, conforme o tamanho do nome
+MIN_CARACTERES_APROXIMADO = 4
+CARACTERES_PARA_DUAS_EDICOES = 8
+
+SEPARADORES = re.compile(r"[,;|\n]+")
+SUFIXO_UF = re.compile(r"^(.+?)\s*(?:[-/(]\s*|\s+)([A-Za-z]{2})\s*\)?$")
+SUBDIVISOES = re.compile(r"\s*/\s*|\s+e\s+")
+
+
+class Localidade(NamedTuple):
+    tipo: str  # 'estado' ou 'municipio'
+    codigo: int
+    nome: str
+    uf: str
+    populacao: int
+
+    @property
+    def rotulo(self) -> str:
+        return f"{self.nome} ({self.uf})"
+
+
+def normalizar_nome(texto: str) -> str:
+    """Minúsculas sem acentos, com pontuação trocada por espaços simples"""
+    sem_acentos = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", sem_acentos.lower()).split())
+
+
+@lru_cache(maxsize=None)
+def carregar_municipios() -> np.ndarray:
+    """Índice de municípios mapeado em memória (só as páginas lidas saem do disco)"""
+    return np.load(CAMINHO_MUNICIPIOS, mmap_mode='r')
+
+
+@lru_cache(maxsize=None)
+def _populacao_estados() -> np.ndarray:
+    municipios = carregar_municipios()
+    return np.bincount(municipios['uf'], weights=municipios['populacao'], minlength=len(SIGLAS)).astype(np.int64)
+
+
+# Localidades são identificadas por um inteiro: a linha do município no índice
+# ou, para estados, -1 - posição em SIGLAS
+@lru_cache(maxsize=None)
+def _indice_nomes() -> Dict[str, Tuple[int, ...]]:
+    indice: Dict[str, List[int]] = {}
+    for linha, chave in enumerate(carregar_municipios()['chave'].tolist()):
+        indice.setdefault(chave.decode("ascii"), []).append(linha)
+    for posicao, (sigla, (_, nome)) in enumerate(ESTADOS.items()):
+        for chave in (sigla.lower(), normalizar_nome(nome)):
+            indice.setdefault(chave, []).append(-1 - posicao)
+    return {chave: tuple(ids) for chave, ids in indice.items()}
+
+
+def _delecoes(chave: str) -> Set[str]:
+    return {chave[:i] + chave[i + 1:] for i in range(len(chave))}
+
+
+@lru_cache(maxsize=None)
+def _indice_delecoes() -> Dict[str, Tuple[str, ...]]:
+    # Busca aproximada por deleções simétricas: dois nomes a até uma edição
+    # de distância têm alguma variante com um caractere a menos em comum
+    indice: Dict[str, Set[str]] = {}
+    for chave in _indice_nomes():
+        if len(chave) >= MIN_CARACTERES_APROXIMADO:
+            for variante in _delecoes(chave) | {chave}:
+                indice.setdefault(variante, set()).add(chave)
+    return {variante: tuple(chaves) for variante, chaves in indice.items()}
+
+
+def _distancia(a: str, b: str) -> int:
+    # Distância de edição com transposição de caracteres vizinhos
+    anterior, atual = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        antepenultima, anterior, atual = anterior, atual, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            atual[j] = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                atual[j] = min(atual[j], antepenultima[j - 2] + 1)
+    return atual[-1]
+
+
+def _populacao(id_localidade: int) -> int:
+    if id_localidade < 0:
+        return int(_populacao_estados()[-1 - id_localidade])
+    return int(carregar_municipios()['populacao'][id_localidade])
+
+
+def _uf(id_localidade: int) -> str:
+    if id_localidade < 0:
+        return SIGLAS[-1 - id_localidade]
+    return SIGLAS[carregar_municipios()['uf'][id_localidade]]
+
+
+def _localidade(id_localidade: int) -> Localidade:
+    if id_localidade < 0:
+        sigla = SIGLAS[-1 - id_localidade]
+        codigo, nome = ESTADOS[sigla]
+        return Localidade('estado', codigo, nome, sigla, _populacao(id_localidade))
+    linha = carregar_municipios()[id_localidade]
+    return Localidade(
+        'municipio', int(linha['codigo']), linha['nome'].decode("utf-8"), SIGLAS[linha['uf']], int(linha['populacao'])
+    )
+
+
+def _resolver_nome(nome: str, uf: Optional[str], preferir: str) -> Optional[int]:
+    chave = normalizar_nome(nome)
+    indice = _indice_nomes()
+    # Sem UF, o homônimo mais populoso; o tipo preferido vem antes
+    distancias = {id_localidade: 0 for id_localidade in indice.get(chave, ())}
+    if not distancias and len(chave) >= MIN_CARACTERES_APROXIMADO:
+        limite = 2 if len(chave) >= CARACTERES_PARA_DUAS_EDICOES else 1
+        indice_delecoes = _indice_delecoes()
+        parecidas = {c for variante in _delecoes(chave) | {chave} for c in indice_delecoes.get(variante, ())}
+        for parecida in parecidas:
+            distancia = _distancia(chave, parecida)
+            if distancia <= limite:
+                distancias.update((id_localidade, distancia) for id_localidade in indice[parecida])
+    candidatos = [i for i in distancias if uf is None or _uf(i) == uf]
+    if not candidatos:
+        return None
+    tipo_preferido = -1 if preferir == 'estado' else 1
+    return min(candidatos, key=lambda i: (distancias[i], (i < 0) != (tipo_preferido < 0), -_populacao(i)))
+
+
+def _resolver_trecho(trecho: str, preferir: str) -> List[int]:
+    encontrado = _resolver_nome(trecho, None, preferir)
+    if encontrado is not None:
+        return [encontrado]
+    # "Cuiabá - MT", "Cuiabá/MT", "Cuiabá (MT)"
+    com_uf = SUFIXO_UF.match(trecho)
+    if com_uf and com_uf.group(2).upper() in ESTADOS:
+        encontrado = _resolver_nome(com_uf.group(1), com_uf.group(2).upper(), preferir)
+        if encontrado is not None:
+            return [encontrado]
+    # "MT/GO", "Rio de Janeiro e São Paulo"
+    partes = [parte for parte in SUBDIVISOES.split(trecho) if parte]
+    if len(partes) > 1:
+        ids = [_resolver_nome(parte, None, preferir) for parte in partes]
+        if None not in ids:
+            return ids
+    return []
+
+
+@lru_cache(maxsize=1024)
+def resolver_localizacoes(texto: str, preferir: str = 'estado') -> Tuple[Tuple[Localidade, ...], Tuple[str, ...]]:
+    """Localidades reconhecidas no texto livre, sem repetições e na ordem em
+    que aparecem, e os trechos não reconhecidos. Nomes ambíguos (como "São
+    Paulo") ficam com o tipo `preferir` ('estado' ou 'municipio'); homônimos,
+    com o município mais populoso, a menos que a UF venha junto ("Bom Jesus - PI")"""
+    ids: List[int] = []
+    nao_reconhecidos: List[str] = []
+    for trecho in SEPARADORES.split(texto):
+        trecho = trecho.strip(" .")
+        if not trecho:
+            continue
+        encontrados = _resolver_trecho(trecho, preferir)
+        if not encontrados:
+            nao_reconhecidos.append(trecho)
+        ids.extend(i for i in encontrados if i not in ids)
+    return tuple(_localidade(i) for i in ids), tuple(nao_reconhecidos)
+
+
+def descrever_localizacoes(texto: str, preferir: str = 'estado') -> str:
+    """Nome oficial e UF de cada localidade reconhecida, seguidos dos trechos não reconhecidos"""
+    localidades, nao_reconhecidos = resolver_localizacoes(texto, preferir)
+    return ", ".join([localidade.rotulo for localidade in localidades] + list(nao_reconhecidos))
+
+
+def localizacoes_params(params: Dict[str, Any]) -> List[Tuple[Tuple[Localidade, ...], Tuple[str, ...]]]:
+    """Resolução da localização primária (estados) e, se houver, da secundária (cidades)"""
+    grupos = [resolver_localizacoes(params['localizacao_primaria'], 'estado')]
+    if params.get('localizacao_secundaria'):
+        grupos.append(resolver_localizacoes(params['localizacao_secundaria'], 'municipio'))
+    return grupos
+
+
+def divisao_por_populacao(params: Dict[str, Any], peso_primaria: float) -> Optional[Dict[str, Any]]:
+    """Pesos da localização primária e da secundária (a prioridade de cada uma,
+    `peso_primaria` e 1 - `peso_primaria`, vezes a sua população) e a população
+    de cada localidade reconhecida, por grupo. Um município listado à parte sai
+    da população do seu estado, e o que se repete nas duas fica só na primária.
+    None se algum grupo não tiver nenhuma localidade reconhecida."""
+    grupos = [list(localidades) for localidades, _ in localizacoes_params(params)]
+    for localidade in grupos[0]:
+        if len(grupos) > 1 and localidade in grupos[1]:
+            grupos[1].remove(localidade)
+    if not all(grupos):
+        return None
+
+    municipios = [l for grupo in grupos for l in grupo if l.tipo == 'municipio']
+    populacoes = [
+        np.array([
+            max(l.populacao - sum(m.populacao for m in municipios if m.uf == l.uf), 0) if l.tipo == 'estado'
+            else l.populacao
+            for l in grupo
+        ], dtype=np.float64)
+        for grupo in grupos
+    ]
+    totais = np.array([p.sum() for p in populacoes])
+    if not totais.all():
+        return None
+    prioridades = np.array([peso_primaria, 1 - peso_primaria])[:len(grupos)] if len(grupos) > 1 else np.array([1.0])
+    pesos = prioridades * totais
+    return {'pesos': pesos / pesos.sum(), 'localidades': grupos, 'populacoes': populacoes}
+
+
+def _titulo(chave: str) -> str:
+    minusculas = {'da', 'das', 'de', 'do', 'dos', 'e'}
+    palavras = [p if p in minusculas else p[:2] + p[2:].capitalize() if p.startswith("d'") else p.capitalize()
+                for p in chave.split(" ")]
+    return "-".join(p[:1].upper() + p[1:] for p in " ".join(palavras).split("-"))
+
+
+def construir_indice(caminho: str = CAMINHO_MUNICIPIOS) -> np.ndarray:
+    """Gera o índice de municípios: códigos IBGE e nomes do pacote brutils,
+    com a população do GeoNames (cidades com 500+ habitantes) e a grafia
+    acentuada quando o nome coincide. Municípios sem correspondência exata no
+    GeoNames ficam com uma população baixa (percentil 10) do seu estado."""
+    from importlib.metadata import distribution
+
+    import geonamescache
+
+    with open(distribution("brutils").locate_file("brutils/data/cities_code.json"), encoding="utf-8") as arquivo:
+        codigos: Dict[str, Dict[str, str]] = json.load(arquivo)
+    lugares = [c for c in geonamescache.GeonamesCache(min_city_population=500).get_cities().values()
+               if c['countrycode'] == "BR"]
+
+    # Nomes normalizados dos lugares do GeoNames por UF; o código de estado do
+    # GeoNames é associado à UF com mais nomes de municípios em comum
+    chaves_uf = {uf: {normalizar_nome(nome) for nome in municipios} for uf, municipios in codigos.items()}
+    contagem: Dict[Tuple[str, str], int] = {}
+    for lugar in lugares:
+        for uf, chaves in chaves_uf.items():
+            if normalizar_nome(lugar['name']) in chaves:
+                contagem[(lugar['admin1code'], uf)] = contagem.get((lugar['admin1code'], uf), 0) + 1
+    uf_geonames: Dict[str, str] = {}
+    for (admin1, uf), _ in sorted(contagem.items(), key=lambda item: -item[1]):
+        if admin1 not in uf_geonames and uf not in uf_geonames.values():
+            uf_geonames[admin1] = uf
+    # Lugares do GeoNames por UF e nome normalizado, principal ou alternativo
+    principais: Dict[Tuple[str, str], List[int]] = {}
+    alternativos: Dict[Tuple[str, str], List[int]] = {}
+    for posicao, lugar in enumerate(lugares):
+        uf = uf_geonames.get(lugar['admin1code'])
+        if uf is None:
+            continue
+        principal = normalizar_nome(lugar['name'])
+        principais.setdefault((uf, principal), []).append(posicao)
+        for chave in {normalizar_nome(nome) for nome in lugar['alternatenames']} - {principal}:
+            alternativos.setdefault((uf, chave), []).append(posicao)
+
+    # Cada lugar do GeoNames vale para no máximo um município: primeiro pelo
+    # nome principal idêntico (o mais populoso, se houver vários) e, depois, por
+    # um nome alternativo idêntico, só quando ele aponta para um único lugar
+    # ainda livre e esse lugar é pedido por um único município
+    correspondencias: Dict[Tuple[str, str], int] = {}
+    for uf, municipios in codigos.items():
+        for nome in municipios:
+            chave = normalizar_nome(nome)
+            if (uf, chave) in principais:
+                correspondencias[(uf, chave)] = max(principais[(uf, chave)], key=lambda p: lugares[p]['population'])
+    usados = set(correspondencias.values())
+    pedidos: Dict[int, List[Tuple[str, str]]] = {}
+    for uf, municipios in codigos.items():
+        for nome in municipios:
+            chave = normalizar_nome(nome)
+            livres = [p for p in alternativos.get((uf, chave), ()) if p not in usados]
+            if (uf, chave) not in correspondencias and len(livres) == 1:
+                pedidos.setdefault(livres[0], []).append((uf, chave))
+    correspondencias.update((pedido[0], posicao) for posicao, pedido in pedidos.items() if len(pedido) == 1)
+
+    registros = []
+    for uf, municipios in codigos.items():
+        encontrados = []
+        for nome, codigo in municipios.items():
+            chave = normalizar_nome(nome)
+            lugar = lugares[correspondencias[(uf, chave)]] if (uf, chave) in correspondencias else None
+            # O nome é sempre o do IBGE; do GeoNames só vem a grafia acentuada do mesmo nome
+            nome_oficial = lugar['name'] if lugar and normalizar_nome(lugar['name']) == chave else _titulo(nome)
+            # População 0 no GeoNames é população desconhecida
+            populacao = lugar['population'] if lugar and lugar['population'] > 0 else None
+            encontrados.append([int(codigo), SIGLAS.index(uf), populacao, chave, nome_oficial])
+        conhecidas = [r[2] for r in encontrados if r[2] is not None]
+        minimo = int(np.percentile(conhecidas, 10))
+        for registro in encontrados:
+            registro[2] = minimo if registro[2] is None else registro[2]
+            registros.append(tuple(registro))
+
+    nomes_por_uf = {(uf, nome) for _, uf, _, _, nome in registros}
+    if len(nomes_por_uf) != len(registros):
+        raise ValueError("Dois municípios com o mesmo nome na mesma UF no índice")
+    indice = np.array(
+        [(codigo, uf, populacao, chave.encode("ascii"), nome.encode("utf-8"))
+         for codigo, uf, populacao, chave, nome in sorted(registros)],
+        dtype=DTYPE_MUNICIPIOS,
+    )
+    if any(len(nome.encode("utf-8")) > DTYPE_MUNICIPIOS['nome'].itemsize for *_, nome in registros):
+        raise ValueError("Nome de município maior que o campo 'nome' do índice")
+    np.save(caminho, indice, allow_pickle=False)
+    return indice
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Gera o índice de municípios usado pelo app")
+    parser.add_argument("--saida", default=CAMINHO_MUNICIPIOS, help=f"Arquivo .npy (padrão: {CAMINHO_MUNICIPIOS})")
+    args = parser.parse_args(argv)
+    indice = construir_indice(args.saida)
+    print(f"{len(indice)} municípios, {indice['populacao'].sum():,} habitantes em {args.saida}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
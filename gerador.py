@@ -0,0 +1,713 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from cache_contexto import CacheContexto
+from cache_respostas import CacheRespostas, chave_cache, normalizar_prompt
+from cenarios import tabela_cenario_markdown
+from compactacao import em_json, estimar_tokens, resumir_distribuicao, resumir_estrategia
+from geografia import descrever_localizacoes
+from instrumentacao import MonitorChamadas, contagem_tokens
+from orcamento import calcular_distribuicao, tabela_distribuicao_markdown
+from pipeline import ErroSecoes, Secao, executar_grafo
+from previsao import prever_resultados, tabela_previsao_markdown
+from provedores import ModeloComHedge, criar_modelo
+from resiliencia import Disjuntor, LimitadorTaxa, PoliticaResiliencia
+from tabelas import validar_plano
+
+# Dicionários de métricas por etapa do funil
+METRICAS_POR_ETAPA = {
+    'Topo': ['Impressões', 'Alcance', 'Custo', 'CPM', 'Cliques', 'CTR', 'Engajamentos', 'Frequência'],
+    'Meio': ['Impressões', 'Cliques', 'CTR', 'CPM', 'Custo', 'Engajamentos', 'Visualizações', 'ThruPlays'],
+    'Fundo': ['Impressões', 'Cliques', 'Resultados', 'CTR', 'CPM', 'Custo por resultado', 'Custo']
+}
+
+DESCRICOES_METRICAS = {
+    'Impressões': "Número total de vezes que seu anúncio foi exibido",
+    'Alcance': "Número de pessoas únicas que viram seu anúncio",
+    'Custo': "Custo total da campanha",
+    'CPM': "Custo por mil impressões",
+    'Cliques': "Número total de cliques no anúncio",
+    'CTR': "Taxa de cliques (cliques/impressões)",
+    'Engajamentos': "Interações com o anúncio (curtidas, comentários, compartilhamentos)",
+    'Frequência': "Média de vezes que cada pessoa viu seu anúncio",
+    'Visualizações': "Visualizações do vídeo (3s ou mais)",
+    'ThruPlays': "Visualizações completas do vídeo",
+    'Resultados': "Número de conversões (compras, cadastros, etc.)",
+    'Custo por resultado': "Custo médio por conversão",
+}
+
+# Seções das quais cada seção do plano depende: cada seção roda assim que
+# as seções das quais depende estiverem prontas
+DEPENDENCIAS = {
+    'recomendacao_estrategica': [],
+    'distribuicao_budget': ['recomendacao_estrategica'],
+    'previsao_resultados': [],
+    'recomendacoes_publico': ['recomendacao_estrategica'],
+    'cronograma': ['recomendacao_estrategica', 'distribuicao_budget'],
+}
+
+# Campos de `params` que determinam cada seção, nas instruções, nos cálculos
+# locais (distribuição e previsão) e no prefixo do prompt, que traz só esses
+# campos (prefixo_campanha). A previsão usa só o total de cada plataforma, que
+# não depende das localizações nem dos criativos; o cronograma recebe a
+# alocação por localização e criativo calculada localmente
+CAMPOS_ALOCACAO = [
+    'etapa_funil', 'metricas', 'budget', 'periodo', 'ferramentas', 'tipo_criativo',
+    'localizacao_primaria', 'localizacao_secundaria',
+]
+CAMPOS_POR_SECAO = {
+    'recomendacao_estrategica': [
+        'objetivo_campanha', 'tipo_campanha', 'etapa_funil', 'periodo', 'ferramentas', 'metricas',
+        'detalhes_acao', 'observacoes',
+    ],
+    'distribuicao_budget': CAMPOS_ALOCACAO,
+    'previsao_resultados': ['etapa_funil', 'metricas', 'budget', 'periodo', 'ferramentas'],
+    'recomendacoes_publico': [
+        'etapa_funil', 'metricas', 'tipo_publico', 'objetivo_campanha', 'ferramentas',
+        'localizacao_primaria', 'localizacao_secundaria',
+    ],
+    'cronograma': CAMPOS_ALOCACAO,
+}
+
+# Ordem e títulos de exibição das seções
+TITULOS_SECOES = {
+    'recomendacao_estrategica': "## 📌 Recomendação Estratégica",
+    'distribuicao_budget': "## 📊 Distribuição de Budget",
+    'previsao_resultados': "## 📈 Previsão de Resultados",
+    'recomendacoes_publico': "## 🎯 Recomendações de Público",
+    'cronograma': "## 📅 Cronograma Sugerido",
+}
+
+CONFIG_GERACAO: Dict[str, Any] = {}
+
+# Esquema da resposta em JSON do modo de chamada única
+ESQUEMA_PLANO_UNICO = {
+    'type': "object",
+    'properties': {
+        'recomendacao_estrategica': {'type': "string"},
+        'justificativa_distribuicao': {'type': "string"},
+        'analise_previsao': {'type': "string"},
+        'recomendacoes_publico': {'type': "string"},
+        'cronograma': {
+            'type': "array",
+            'items': {
+                'type': "object",
+                'properties': {
+                    'fase': {'type': "string"},
+                    'periodo': {'type': "string"},
+                    'percentual_budget': {'type': "number"},
+                    'acoes': {'type': "string"},
+                },
+                'required': ['fase', 'periodo', 'percentual_budget', 'acoes'],
+            },
+        },
+        'observacoes_cronograma': {'type': "string"},
+    },
+    'required': [
+        'recomendacao_estrategica', 'justificativa_distribuicao', 'analise_previsao',
+        'recomendacoes_publico', 'cronograma', 'observacoes_cronograma',
+    ],
+}
+
+
+def criar_modelo_texto():
+    """Cria o modelo de texto de MODELO_PRIMARIO (padrão: Gemini 1.5 Flash).
+
+    Com MODELO_SECUNDARIO (ex.: "openai:gpt-4o-mini"), as chamadas lentas ou
+    com erro são repetidas no secundário (provedores.ModeloComHedge), com o
+    prazo no percentil HEDGE_PERCENTIL das latências do primário.
+    """
+    primario = criar_modelo(os.getenv("MODELO_PRIMARIO", "gemini:gemini-1.5-flash"), CONFIG_GERACAO)
+    secundario = os.getenv("MODELO_SECUNDARIO")
+    if not secundario:
+        return primario
+    return ModeloComHedge(
+        primario,
+        criar_modelo(secundario, CONFIG_GERACAO),
+        percentil=float(os.getenv("HEDGE_PERCENTIL", "95")),
+        atraso_inicial=float(os.getenv("HEDGE_ATRASO_INICIAL", "8")),
+    )
+
+
+def criar_politica_resiliencia() -> PoliticaResiliencia:
+    """Política configurada pelas variáveis de ambiente MODELO_*"""
+    return PoliticaResiliencia(
+        limitador=LimitadorTaxa(
+            por_segundo=float(os.getenv("MODELO_REQUISICOES_POR_MINUTO", "60")) / 60,
+            capacidade=int(os.getenv("MODELO_RAJADA", "5")),
+        ),
+        disjuntor=Disjuntor(
+            limite_falhas=int(os.getenv("MODELO_LIMITE_FALHAS", "5")),
+            segundos_aberto=float(os.getenv("MODELO_SEGUNDOS_CIRCUITO_ABERTO", "30")),
+        ),
+        tentativas=int(os.getenv("MODELO_TENTATIVAS", "4")),
+    )
+
+
+def _linhas_campanha(params: Dict[str, Any]) -> List[Tuple[str, Callable[[], str]]]:
+    okrs_escolhidos = [k for k, v in params['metricas'].items() if v['selecionada']]
+    metas_especificas = [f"{k}: {v['valor']}" for k, v in params['metricas'].items() if v['selecionada'] and v['valor']]
+    # Os campos comuns a todas as seções vêm primeiro, para o prefixo idêntico ser o mais longo possível
+    return [
+        ('etapa_funil', lambda: f"**Etapa do Funil:** {params['etapa_funil']}"),
+        ('ferramentas', lambda: f"**Ferramentas/Plataformas:** {', '.join(params['ferramentas'])}"),
+        ('metricas', lambda: f"**OKRs Escolhidos:** {', '.join(okrs_escolhidos) if okrs_escolhidos else 'A serem definidos'}"),
+        ('metricas', lambda: f"**Metas Específicas:** {', '.join(metas_especificas) if metas_especificas else 'Nenhuma meta específica'}"),
+        ('periodo', lambda: f"**Período da Campanha:** {params['periodo']}"),
+        ('budget', lambda: f"**Budget Total:** R$ {params['budget']:,.2f}"),
+        ('objetivo_campanha', lambda: f"**Campanha:** {params['objetivo_campanha']}"),
+        ('tipo_campanha', lambda: f"**Tipo de Campanha:** {params['tipo_campanha']}"),
+        ('localizacao_primaria', lambda: f"**Localização Primária:** {descrever_localizacoes(params['localizacao_primaria'], 'estado')}"),
+        ('localizacao_secundaria', lambda: f"**Localização Secundária:** {descrever_localizacoes(params['localizacao_secundaria'], 'municipio')}"),
+        ('tipo_publico', lambda: f"**Tipo de Público:** {params['tipo_publico']}"),
+        ('tipo_criativo', lambda: f"**Tipos de Criativo:** {', '.join(params['tipo_criativo'])}"),
+        ('detalhes_acao', lambda: f"**Detalhes da Ação:** {params['detalhes_acao'] or 'Nenhum'}"),
+        ('observacoes', lambda: f"**Observações:** {params['observacoes'] or 'Nenhuma'}"),
+    ]
+
+
+def prefixo_campanha(params: Dict[str, Any], campos: Optional[Iterable[str]] = None) -> str:
+    """Início comum aos prompts do plano: os dados da campanha, sempre com o
+    mesmo texto e na mesma ordem, para o provedor reaproveitar o processamento
+    do prefixo entre as chamadas (cache de contexto).
+
+    Com `campos`, traz só esses campos: uma seção só vê os campos da sua
+    impressão digital (CAMPOS_POR_SECAO), senão seria reaproveitada depois da
+    edição de um campo que estava no seu prompt."""
+    campos = None if campos is None else set(campos)
+    return "\n".join([
+        "Como especialista em planejamento de mídia digital, você está elaborando, uma seção por vez, "
+        "o plano de mídia da campanha abaixo.",
+        "",
+    ] + [linha() for campo, linha in _linhas_campanha(params) if campos is None or campo in campos])
+
+
+class GeradorPlano:
+    """Gera as seções do plano com um modelo e, opcionalmente, um cache de
+    respostas, um monitor de chamadas e uma política de resiliência
+    (limite de taxa, repetição e circuit breaker) para as chamadas ao modelo.
+
+    Com `contexto_compacto`, as seções anteriores entram nos prompts seguintes
+    como um resumo estruturado em JSON em vez do texto completo;
+    `tokens_economizados` acumula a redução estimada de tokens de entrada e
+    `tokens_entrada`/`tokens_saida` os tokens informados pelo modelo.
+    `avisos_validacao` guarda os problemas que restaram nas tabelas de budget
+    do último plano gerado.
+
+    Com `exemplo` (as seções de um plano semelhante já gerado), a recomendação
+    estratégica recebe o resumo da estratégia desse plano como referência.
+
+    Os prompts começam pelo prefixo com os campos da campanha que determinam a
+    seção (prefixo_campanha), seguido da recomendação estratégica nas seções
+    que dependem dela, e só depois vêm as instruções da seção. Com `contexto`,
+    cada prefixo enviado é registrado no cache de contexto, que conta os
+    acertos; `tokens_cache` acumula os tokens de entrada que o provedor
+    informou ter reaproveitado.
+    """
+
+    def __init__(self, modelo: Any, cache: Optional[CacheRespostas] = None, usar_cache: bool = True,
+                 contexto_compacto: bool = False, monitor: Optional[MonitorChamadas] = None,
+                 resiliencia: Optional[PoliticaResiliencia] = None, exemplo: Optional[Dict[str, str]] = None,
+                 contexto: Optional[CacheContexto] = None):
+        self.modelo = modelo
+        self.cache = cache
+        self.usar_cache = usar_cache
+        self.contexto_compacto = contexto_compacto
+        self.monitor = monitor
+        self.resiliencia = resiliencia
+        self.exemplo = exemplo
+        self.contexto = contexto
+        self.avisos_validacao: Dict[str, str] = {}
+        self.tokens_economizados = 0
+        self.tokens_entrada = 0
+        self.tokens_saida = 0
+        self.tokens_cache = 0
+        self.condicionais_reaproveitadas = 0
+        self.respostas_cache = 0
+        self._lock = threading.Lock()
+
+    def secoes(self, condicionais: Optional[Dict[str, Dict[str, str]]] = None) -> Dict[str, Secao]:
+        """Grafo de seções no formato de pipeline.executar_grafo. As seções em
+        `condicionais` (secoes_reaproveitaveis) devolvem o texto anterior, sem
+        chamar o modelo, se as dependências tiverem os mesmos textos de antes"""
+        condicionais = condicionais or {}
+        return {
+            nome: (self._reaproveitar(getattr(self, f"gerar_{nome}"), condicionais[nome]) if nome in condicionais
+                   else getattr(self, f"gerar_{nome}"), dependencias)
+            for nome, dependencias in DEPENDENCIAS.items()
+        }
+
+    def _reaproveitar(self, gerar: Callable[..., str], anterior: Dict[str, str]) -> Callable[..., str]:
+        def gerar_se_mudou(params: Dict[str, Any], *dependencias: str, **kwargs: Any) -> str:
+            if impressao_textos(dependencias) != anterior['dependencias']:
+                return gerar(params, *dependencias, **kwargs)
+            with self._lock:
+                self.condicionais_reaproveitadas += 1
+            return anterior['texto']
+        return gerar_se_mudou
+
+    def _contexto(self, texto_completo: str, resumo: Callable[[], Dict[str, Any]]) -> str:
+        if not self.contexto_compacto:
+            return texto_completo
+        compacto = em_json(resumo())
+        with self._lock:
+            self.tokens_economizados += estimar_tokens(texto_completo) - estimar_tokens(compacto)
+        return compacto
+
+    def contexto_estrategia(self, recomendacao_estrategica: str) -> str:
+        """Recomendação estratégica no formato usado nos prompts seguintes"""
+        return self._contexto(recomendacao_estrategica, lambda: resumir_estrategia(recomendacao_estrategica))
+
+    def contexto_distribuicao(self, params: Dict[str, Any], distribuicao_budget: str) -> str:
+        """Distribuição de budget no formato usado nos prompts seguintes"""
+        return self._contexto(distribuicao_budget, lambda: resumir_distribuicao(params))
+
+    def contexto_exemplo(self) -> str:
+        """Resumo da estratégia do plano de exemplo, ou vazio sem exemplo"""
+        if not self.exemplo or not self.exemplo.get('recomendacao_estrategica'):
+            return ""
+        resumo = em_json(resumir_estrategia(self.exemplo['recomendacao_estrategica']))
+        return f"Estratégia de uma campanha semelhante já planejada (use como referência, adaptando a esta campanha): {resumo}"
+
+    def prefixo_estrategia(self, params: Dict[str, Any], secao: str, recomendacao_estrategica: str) -> str:
+        """Prefixo da campanha com os campos da `secao`, seguido da
+        recomendação estratégica, comum às seções que dependem dela"""
+        return (
+            f"{prefixo_campanha(params, CAMPOS_POR_SECAO[secao])}\n\n"
+            f"Recomendação estratégica já definida para esta campanha:\n{self.contexto_estrategia(recomendacao_estrategica)}"
+        )
+
+    def gerar_texto(self, prompt: str, ao_fragmento: Optional[Callable[[str], None]] = None, secao: str = "",
+                    config: Optional[Dict[str, Any]] = None, prefixo: str = "") -> str:
+        """Chama o modelo, reaproveitando a resposta em cache para o mesmo prompt.
+
+        O `prefixo` compartilhado entre as chamadas do plano vai no início do
+        prompt, antes das instruções da seção. Com `ao_fragmento`, a resposta
+        é lida em streaming e o texto acumulado é publicado a cada fragmento
+        recebido. `config` complementa CONFIG_GERACAO nesta chamada. Cada
+        chamada é registrada no monitor, quando houver, com o nome da `secao`.
+        """
+        if prefixo:
+            prompt = f"{prefixo}\n\n{normalizar_prompt(prompt)}"
+        modelo = self.modelo.model_name
+        inicio = time.perf_counter()
+        config_chamada = {**CONFIG_GERACAO, **(config or {})}
+        chave = chave_cache(prompt, modelo, config_chamada)
+        if self.cache and self.usar_cache:
+            resposta = self.cache.obter(chave)
+            if resposta is not None:
+                with self._lock:
+                    self.respostas_cache += 1
+                if ao_fragmento:
+                    ao_fragmento(resposta)
+                self._registrar(secao=secao, modelo=modelo, inicio=inicio, primeiro_token=inicio, cache=True)
+                return resposta
+
+        prefixo_cache = self.contexto.registrar(modelo, prefixo) if self.contexto and prefixo else None
+        primeiro_token = None
+
+        def chamar_modelo() -> Tuple[str, Any]:
+            nonlocal primeiro_token
+            # Sem config extra, vale a configuração com que o modelo foi criado
+            argumentos = {'generation_config': config_chamada} if config else {}
+            if not ao_fragmento:
+                response = self.modelo.generate_content(prompt, **argumentos)
+                return response.text, response
+            partes, response = [], None
+            for chunk in self.modelo.generate_content(prompt, stream=True, **argumentos):
+                if primeiro_token is None:
+                    primeiro_token = time.perf_counter()
+                partes.append(chunk.text)
+                ao_fragmento("".join(partes))
+                response = chunk  # o último fragmento traz o uso de tokens
+            return "".join(partes), response
+
+        try:
+            if self.resiliencia:
+                texto, response = self.resiliencia.executar(chamar_modelo)
+            else:
+                texto, response = chamar_modelo()
+        except Exception as erro:
+            self._registrar(secao=secao, modelo=modelo, inicio=inicio, primeiro_token=primeiro_token,
+                            prefixo_cache=prefixo_cache, erro=f"{type(erro).__name__}: {erro}")
+            raise
+
+        tokens = contagem_tokens(response)
+        with self._lock:
+            self.tokens_entrada += tokens['tokens_entrada']
+            self.tokens_saida += tokens['tokens_saida']
+            self.tokens_cache += tokens['tokens_cache']
+        # Com hedge, a resposta pode ter vindo do modelo secundário; a chave do
+        # cache é a do primário, então só a resposta dele é guardada
+        modelo_resposta = getattr(response, 'modelo', None) or modelo
+        self._registrar(secao=secao, modelo=modelo_resposta, inicio=inicio, primeiro_token=primeiro_token,
+                        prefixo_cache=prefixo_cache, **tokens)
+        if self.cache and modelo_resposta == modelo:
+            self.cache.salvar(chave, texto)
+        return texto
+
+    def _registrar(self, inicio: float, primeiro_token: Optional[float], **registro: Any) -> None:
+        if self.monitor is None:
+            return
+        fim = time.perf_counter()
+        self.monitor.registrar(
+            segundos=fim - inicio,
+            primeiro_token_segundos=(primeiro_token or fim) - inicio,
+            **registro,
+        )
+
+    def gerar_recomendacao_estrategica(self, params: Dict[str, Any], ao_fragmento: Optional[Callable[[str], None]] = None) -> str:
+        """Gera a recomendação estratégica inicial"""
+        etapa_funil = params['etapa_funil']
+
+        prompt = f"""
+        {self.contexto_exemplo()}
+
+        Seção: recomendação estratégica. Forneça:
+        1. Análise estratégica focada em {etapa_funil} do funil (150-200 palavras)
+        2. Principais oportunidades para os OKRs escolhidos
+        3. Riscos potenciais específicos para esta etapa
+        4. Recomendação geral de abordagem
+
+        Dicas:
+        - Mantenha o foco absoluto nos OKRs escolhidos (sem OKRs, sugira os apropriados)
+        - Considere as metas específicas quando fornecidas
+        - Adapte ao período especificado
+
+        Formato: Markdown com headers (##, ###)
+        """
+        return self.gerar_texto(
+            prompt, ao_fragmento, secao='recomendacao_estrategica',
+            prefixo=prefixo_campanha(params, CAMPOS_POR_SECAO['recomendacao_estrategica']),
+        )
+
+    def gerar_distribuicao_budget(self, params: Dict[str, Any], recomendacao_estrategica: str, ao_fragmento: Optional[Callable[[str], None]] = None) -> str:
+        """Calcula a distribuição de budget e gera a justificativa com o modelo"""
+        # Os valores são calculados localmente; o modelo só escreve a justificativa
+        tabelas = tabela_distribuicao_markdown(calcular_distribuicao(params))
+
+        prompt = f"""
+        Seção: distribuição de budget. A distribuição já foi calculada:
+        {tabelas}
+
+        Escreva:
+        1. Justificativa estratégica para a alocação de cada plataforma
+        2. Justificativa da divisão geográfica (primária vs secundária, ponderada pela população)
+        3. Breve análise (50-100 palavras) explicando como a distribuição atende aos objetivos
+
+        REGRAS:
+        - NÃO reproduza nem altere as tabelas e os valores acima
+        - Relacione a justificativa aos OKRs escolhidos (sem OKRs, otimize para a etapa do funil)
+        - Considere as metas específicas quando fornecidas
+
+        Formato: Markdown com headers (###) e listas
+        """
+        justificativa = self.gerar_texto(
+            prompt,
+            (lambda texto: ao_fragmento(f"{tabelas}\n\n{texto}")) if ao_fragmento else None,
+            secao='distribuicao_budget',
+            prefixo=self.prefixo_estrategia(params, 'distribuicao_budget', recomendacao_estrategica),
+        )
+        return f"{tabelas}\n\n{justificativa}"
+
+    def gerar_previsao_resultados(self, params: Dict[str, Any], ao_fragmento: Optional[Callable[[str], None]] = None) -> str:
+        """Estima os resultados por simulação e gera a análise com o modelo"""
+        # Faixas P10/P50/P90 calculadas localmente a partir dos benchmarks por plataforma
+        tabela = tabela_previsao_markdown(prever_resultados(params, METRICAS_POR_ETAPA[params['etapa_funil']]))
+
+        prompt = f"""
+        Seção: previsão de resultados. A previsão já foi calculada por simulação com benchmarks do setor:
+        {tabela}
+
+        Forneça:
+        1. Análise de potencial desempenho (50-100 palavras)
+        2. Comparação das metas específicas com as faixas previstas, quando fornecidas
+        3. KPIs CHAVE para monitorar
+
+        REGRAS:
+        - NÃO reproduza nem altere a tabela e os valores acima
+        - Destaque os OKRs escolhidos (sem OKRs, foque na etapa do funil)
+
+        Formato: Markdown com headers (###) e listas
+        """
+        analise = self.gerar_texto(
+            prompt,
+            (lambda texto: ao_fragmento(f"{tabela}\n\n{texto}")) if ao_fragmento else None,
+            secao='previsao_resultados',
+            prefixo=prefixo_campanha(params, CAMPOS_POR_SECAO['previsao_resultados']),
+        )
+        return f"{tabela}\n\n{analise}"
+
+    def gerar_recomendacoes_publico(self, params: Dict[str, Any], recomendacao_estrategica: str, ao_fragmento: Optional[Callable[[str], None]] = None) -> str:
+        """Gera recomendações detalhadas de público-alvo"""
+        etapa_funil = params['etapa_funil']
+
+        prompt = f"""
+        Seção: recomendações de público. Desenvolva recomendações OTIMIZADAS PARA OS OBJETIVOS incluindo:
+        1. Segmentação específica para os OKRs selecionados
+        2. Parâmetros de targeting focados nos objetivos
+        3. Estratégias de expansão adequadas
+        4. Considerações sobre frequência e saturação
+
+        REGRAS:
+        - Manter foco absoluto nos estados especificados
+        - Adaptar recomendações aos OKRs selecionados
+        - Priorizar estratégias adequadas para a etapa {etapa_funil}
+
+        Formato: Markdown com listas e headers
+        """
+        return self.gerar_texto(
+            prompt, ao_fragmento, secao='recomendacoes_publico',
+            prefixo=self.prefixo_estrategia(params, 'recomendacoes_publico', recomendacao_estrategica),
+        )
+
+    def gerar_cronograma(self, params: Dict[str, Any], recomendacao_estrategica: str, distribuicao_budget: str, ao_fragmento: Optional[Callable[[str], None]] = None) -> str:
+        """Gera cronograma de implementação"""
+        prompt = f"""
+        Seção: cronograma. Com base na distribuição de budget:
+        {self.contexto_distribuicao(params, distribuicao_budget)}
+
+        Crie um cronograma OTIMIZADO para o budget, o período, as plataformas e os OKRs da campanha, incluindo:
+        1. Fases de implementação adequadas
+        2. Distribuição temporal do budget
+        3. Marcos importantes
+        4. Frequência de ajustes recomendada
+
+        DICAS:
+        - Adaptar cronograma aos objetivos específicos
+        - Não incluir fases irrelevantes
+        - Manter realismo no período especificado
+
+        Formato: Markdown com tabelas ou listas numeradas
+        """
+        return self.gerar_texto(
+            prompt, ao_fragmento, secao='cronograma',
+            prefixo=self.prefixo_estrategia(params, 'cronograma', recomendacao_estrategica),
+        )
+
+    def narrar_cenario(self, params: Dict[str, Any], resumo: Dict[str, Any], ao_fragmento: Optional[Callable[[str], None]] = None) -> str:
+        """Explica um cenário da análise de sensibilidade (cenarios.resumo_cenario)"""
+        # Os números vêm das curvas de resposta calculadas localmente
+        tabela = tabela_cenario_markdown(resumo)
+
+        prompt = f"""
+        Análise de cenário: o planejador está avaliando o cenário de R$ {resumo['budget']:,.2f}
+        em vez do budget atual da campanha.
+
+        As curvas de resposta (com saturação de alcance e de frequência por plataforma) indicam:
+        {tabela}
+
+        Escreva (100-150 palavras):
+        1. O que muda em relação ao budget atual e se o cenário vale o investimento
+        2. Onde está a saturação, considerando os ganhos a cada R$ 1.000 adicionais
+        3. Uma recomendação objetiva
+
+        REGRAS:
+        - NÃO reproduza nem altere as tabelas e os valores acima
+
+        Formato: Markdown com listas
+        """
+        return self.gerar_texto(prompt, ao_fragmento, secao='cenario', prefixo=prefixo_campanha(params))
+
+    def gerar_plano_unico(self, params: Dict[str, Any]) -> Dict[str, str]:
+        """Gera as cinco seções em uma única chamada com resposta em JSON"""
+        etapa_funil = params['etapa_funil']
+
+        # Distribuição e previsão continuam calculadas localmente
+        tabelas_distribuicao = tabela_distribuicao_markdown(calcular_distribuicao(params))
+        tabela_previsao = tabela_previsao_markdown(prever_resultados(params, METRICAS_POR_ETAPA[etapa_funil]))
+
+        prompt = f"""
+        {self.contexto_exemplo()}
+
+        Crie agora o plano completo, com todas as seções de uma vez.
+
+        Distribuição de budget já calculada:
+        {tabelas_distribuicao}
+
+        Previsão de resultados já calculada por simulação:
+        {tabela_previsao}
+
+        Preencha cada campo do JSON:
+        - recomendacao_estrategica: análise focada em {etapa_funil} do funil (150-200 palavras), oportunidades para os OKRs, riscos e abordagem geral (Markdown com ###)
+        - justificativa_distribuicao: justificativa de cada plataforma e da divisão geográfica, sem repetir as tabelas (Markdown)
+        - analise_previsao: análise de desempenho (50-100 palavras), comparação com as metas e KPIs chave, sem repetir a tabela (Markdown)
+        - recomendacoes_publico: segmentação, targeting, expansão, frequência e saturação, mantendo o foco nos estados especificados (Markdown)
+        - cronograma: fases de implementação dentro do período, com a fatia do budget de cada fase
+        - observacoes_cronograma: marcos importantes e frequência de ajustes (Markdown)
+        """
+        resposta = self.gerar_texto(
+            prompt,
+            secao='plano_unico',
+            prefixo=prefixo_campanha(params),
+            config={'response_mime_type': "application/json", 'response_schema': ESQUEMA_PLANO_UNICO},
+        )
+        dados = json.loads(resposta)
+
+        linhas_cronograma = [
+            "| Fase | Período | % Budget | Ações |",
+            "| --- | --- | --- | --- |",
+        ] + [
+            f"| {fase['fase']} | {fase['periodo']} | {fase['percentual_budget']:.0f}% | {fase['acoes'].replace('|', '/')} |"
+            for fase in dados['cronograma']
+        ]
+        return {
+            'recomendacao_estrategica': dados['recomendacao_estrategica'],
+            'distribuicao_budget': f"{tabelas_distribuicao}\n\n{dados['justificativa_distribuicao']}",
+            'previsao_resultados': f"{tabela_previsao}\n\n{dados['analise_previsao']}",
+            'recomendacoes_publico': dados['recomendacoes_publico'],
+            'cronograma': "\n".join(linhas_cronograma) + f"\n\n{dados['observacoes_cronograma']}",
+        }
+
+    def _completar_plano_unico(self, params: Dict[str, Any], existentes: Dict[str, str],
+                               ao_concluir: Optional[Callable[[str, str], None]]) -> Dict[str, str]:
+        # Uma chamada única; as seções `existentes` ficam como estão
+        if all(nome in existentes for nome in DEPENDENCIAS):
+            return dict(existentes)
+        try:
+            plano = self.gerar_plano_unico(params)
+        except Exception as erro:
+            raise ErroSecoes(dict(existentes), {nome: erro for nome in DEPENDENCIAS if nome not in existentes}, [])
+        for nome, texto in plano.items():
+            if nome in existentes:
+                plano[nome] = existentes[nome]
+            elif ao_concluir:
+                ao_concluir(nome, texto)
+        return plano
+
+    def gerar_plano(
+        self,
+        params: Dict[str, Any],
+        modo: str = 'encadeado',
+        max_concorrencia: int = 3,
+        ao_concluir: Optional[Callable[[str, str], None]] = None,
+        ao_fragmento: Optional[Callable[[str, str], None]] = None,
+        resultados_existentes: Optional[Dict[str, str]] = None,
+        condicionais: Optional[Dict[str, Dict[str, str]]] = None,
+    ) -> Dict[str, str]:
+        """Gera as seções que faltam no modo 'encadeado' (uma chamada por seção,
+        conforme DEPENDENCIAS) ou 'unico' (uma chamada com resposta em JSON).
+        No modo encadeado, as seções `condicionais` são reaproveitadas se as
+        dependências saírem com os mesmos textos de antes (secoes_reaproveitaveis).
+
+        Registra no monitor a latência de ponta a ponta e os tokens do plano,
+        para comparar os modos por etapa do funil. Falhas levantam ErroSecoes
+        com as seções já concluídas.
+
+        Seções com tabelas de budget inconsistentes (tabelas.validar_plano) são
+        pedidas de novo ao modelo uma vez, sem cache e no mesmo modo, junto com
+        as que dependem delas (no modo único, numa nova chamada única da qual só
+        elas são aproveitadas); o que continuar inconsistente fica em
+        `avisos_validacao`.
+        """
+        inicio = time.perf_counter()
+        existentes = resultados_existentes or {}
+        if modo == 'unico':
+            plano = self._completar_plano_unico(params, existentes, ao_concluir)
+        else:
+            plano = executar_grafo(
+                self.secoes(condicionais), params, max_concorrencia, ao_concluir, ao_fragmento, existentes
+            )
+
+        self.avisos_validacao = validar_plano(params, plano)
+        if self.avisos_validacao:
+            refazer = secoes_dependentes(self.avisos_validacao)
+            usar_cache, self.usar_cache = self.usar_cache, False
+            validas = {nome: texto for nome, texto in plano.items() if nome not in refazer}
+            try:
+                if modo == 'unico':
+                    plano = self._completar_plano_unico(params, validas, ao_concluir)
+                else:
+                    plano = executar_grafo(self.secoes(), params, max_concorrencia, ao_concluir, ao_fragmento, validas)
+            finally:
+                self.usar_cache = usar_cache
+            self.avisos_validacao = validar_plano(params, plano)
+
+        if self.monitor:
+            self.monitor.registrar_plano(
+                modo=modo,
+                etapa_funil=params['etapa_funil'],
+                segundos=time.perf_counter() - inicio,
+                tokens_entrada=self.tokens_entrada,
+                tokens_saida=self.tokens_saida,
+                tokens_cache=self.tokens_cache,
+                respostas_cache=self.respostas_cache,
+                parcial=bool(existentes) or bool(self.condicionais_reaproveitadas),
+            )
+        return plano
+
+
+def secoes_dependentes(nomes: Iterable[str]) -> Set[str]:
+    """As seções `nomes` e todas as que dependem delas, direta ou indiretamente"""
+    resultado = set(nomes)
+    while True:
+        novas = {nome for nome, deps in DEPENDENCIAS.items() if nome not in resultado and resultado.intersection(deps)}
+        if not novas:
+            return resultado
+        resultado |= novas
+
+
+def impressoes_digitais(params: Dict[str, Any], configuracao: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """Hash do que determina cada seção além das seções das quais ela depende:
+    os campos de CAMPOS_POR_SECAO e a `configuracao` de geração. No modo
+    'unico', as seções saem de um prompt com todos os campos"""
+    unico = (configuracao or {}).get('modo') == 'unico'
+    impressoes = {}
+    for nome, campos in CAMPOS_POR_SECAO.items():
+        if unico:
+            campos = sorted(params)
+        conteudo = {'campos': {campo: params.get(campo) for campo in campos}, 'configuracao': configuracao or {}}
+        impressoes[nome] = hashlib.sha256(
+            json.dumps(conteudo, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
+    return impressoes
+
+
+def impressao_textos(textos: Iterable[str]) -> str:
+    """Hash dos textos das seções das quais uma seção depende"""
+    return hashlib.sha256(json.dumps(list(textos), ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def secoes_reaproveitaveis(plano: Dict[str, str], impressoes_antigas: Dict[str, str],
+                           impressoes_novas: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, Dict[str, str]]]:
+    """Seções do plano anterior que continuam válidas para os novos parâmetros:
+    as que não mudaram e cujas dependências também são reaproveitadas, e as
+    condicionais, que não mudaram mas dependem de seções geradas de novo. Uma
+    condicional traz o texto anterior e o hash dos textos das dependências com
+    que foi gerada (GeradorPlano.gerar_plano a reaproveita se forem os mesmos)."""
+    inalteradas = [
+        nome for nome in DEPENDENCIAS
+        if nome in plano and nome in impressoes_novas and impressoes_antigas.get(nome) == impressoes_novas[nome]
+    ]
+    reaproveitadas: Dict[str, str] = {}
+    condicionais: Dict[str, Dict[str, str]] = {}
+    for nome in inalteradas:  # DEPENDENCIAS vem em ordem topológica
+        dependencias = DEPENDENCIAS[nome]
+        if all(d in reaproveitadas for d in dependencias):
+            reaproveitadas[nome] = plano[nome]
+        elif all(d in plano for d in dependencias):
+            condicionais[nome] = {
+                'texto': plano[nome], 'dependencias': impressao_textos(plano[d] for d in dependencias),
+            }
+    return reaproveitadas, condicionais
+
+
+def montar_markdown(params: Dict[str, Any], plano: Dict[str, str]) -> str:
+    """Documento Markdown com o plano completo, no formato do download"""
+    okrs_selecionados = [k for k, v in params['metricas'].items() if v['selecionada']]
+    metas_definidas = [f"{k}: {v['valor']}" for k, v in params['metricas'].items() if v['selecionada'] and v['valor']]
+    partes = [
+        f"# 📊 Plano de Mídia Completo ({params['etapa_funil']} do Funil)\n",
+        f"**Campanha:** {params['objetivo_campanha']}",
+        f"**Budget:** R$ {params['budget']:,.2f}",
+        f"**Período:** {params['periodo']}",
+        f"**OKRs Selecionados:** {', '.join(okrs_selecionados) if okrs_selecionados else 'A serem otimizados'}",
+        f"**Metas Definidas:** {', '.join(metas_definidas) if metas_definidas else 'Nenhuma específica'}\n",
+    ]
+    for chave, titulo in TITULOS_SECOES.items():
+        partes += [titulo, plano[chave]]
+    return "\n\n".join(partes)
@@ -0,0 +1,142 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+# Preço em US$ por milhão de tokens (entrada, saída)
+PRECOS_POR_MILHAO_TOKENS = {
+    'gemini-1.5-flash': (0.075, 0.30),
+    'gemini-1.5-pro': (1.25, 5.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+}
+
+# Preço em US$ por milhão de tokens de entrada vindos do cache de contexto do provedor
+PRECOS_CACHE_POR_MILHAO_TOKENS = {
+    'gemini-1.5-flash': 0.01875,
+    'gemini-1.5-pro': 0.3125,
+    'gpt-4o-mini': 0.075,
+    'gpt-4o': 1.25,
+}
+
+
+def estimar_custo(modelo: str, tokens_entrada: int, tokens_saida: int, tokens_cache: int = 0) -> float:
+    """Custo estimado em US$ de uma chamada; 0 para modelos sem preço conhecido.
+    `tokens_cache` são os tokens de entrada (já incluídos em `tokens_entrada`)
+    que vieram do cache de contexto"""
+    nome = modelo.split("/")[-1]
+    preco_entrada, preco_saida = PRECOS_POR_MILHAO_TOKENS.get(nome, (0.0, 0.0))
+    preco_cache = PRECOS_CACHE_POR_MILHAO_TOKENS.get(nome, preco_entrada)
+    return ((tokens_entrada - tokens_cache) * preco_entrada + tokens_cache * preco_cache
+            + tokens_saida * preco_saida) / 1_000_000
+
+
+def contagem_tokens(response: Any) -> Dict[str, int]:
+    """Tokens de entrada, de entrada vindos do cache de contexto e de saída
+    informados em `usage_metadata` da resposta"""
+    uso = getattr(response, 'usage_metadata', None)
+    return {
+        'tokens_entrada': getattr(uso, 'prompt_token_count', 0) or 0,
+        'tokens_cache': getattr(uso, 'cached_content_token_count', 0) or 0,
+        'tokens_saida': getattr(uso, 'candidates_token_count', 0) or 0,
+    }
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil pelo método do posto mais próximo"""
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class MonitorChamadas:
+    """Guarda em memória as últimas chamadas ao modelo e, opcionalmente,
+    acrescenta cada uma a um log JSONL para análise posterior"""
+
+    def __init__(self, max_registros: int = 1000, caminho_log: Optional[str] = None):
+        self.registros: deque = deque(maxlen=max_registros)
+        self.planos: deque = deque(maxlen=max_registros)
+        self.caminho_log = caminho_log
+        self._lock = threading.Lock()
+        if caminho_log and os.path.dirname(caminho_log):
+            os.makedirs(os.path.dirname(caminho_log), exist_ok=True)
+
+    def registrar(self, **registro: Any) -> None:
+        """Registra uma chamada: secao, modelo, segundos, primeiro_token_segundos,
+        tokens_entrada, tokens_cache, tokens_saida, cache, prefixo_cache e erro"""
+        registro.setdefault('instante', time.time())
+        registro['custo_estimado'] = estimar_custo(
+            registro.get('modelo', ''), registro.get('tokens_entrada', 0), registro.get('tokens_saida', 0),
+            registro.get('tokens_cache', 0),
+        )
+        with self._lock:
+            self.registros.append(registro)
+            self._gravar_log(registro)
+
+    def registrar_plano(self, **registro: Any) -> None:
+        """Registra a geração de um plano: modo, etapa_funil, segundos,
+        tokens_entrada, tokens_saida, respostas_cache (seções que vieram do cache
+        de respostas, sem tokens) e parcial (só parte das seções foi gerada)"""
+        registro.setdefault('instante', time.time())
+        registro['tipo'] = 'plano'
+        with self._lock:
+            self.planos.append(registro)
+            self._gravar_log(registro)
+
+    def _gravar_log(self, registro: Dict[str, Any]) -> None:
+        if self.caminho_log:
+            with open(self.caminho_log, "a", encoding="utf-8") as log:
+                log.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    def resumo(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95 de latência, tokens e acertos do prefixo compartilhado por
+        seção, só com chamadas feitas ao modelo"""
+        with self._lock:
+            registros = [r for r in self.registros if not r.get('cache') and not r.get('erro')]
+
+        por_secao: Dict[str, List[Dict[str, Any]]] = {}
+        for registro in registros:
+            por_secao.setdefault(registro.get('secao') or '-', []).append(registro)
+
+        resumo = {}
+        for secao, chamadas in por_secao.items():
+            segundos = [c['segundos'] for c in chamadas]
+            primeiro_token = [c['primeiro_token_segundos'] for c in chamadas]
+            com_prefixo = [c['prefixo_cache'] for c in chamadas if c.get('prefixo_cache') is not None]
+            resumo[secao] = {
+                'chamadas': len(chamadas),
+                'p50_segundos': percentil(segundos, 50),
+                'p95_segundos': percentil(segundos, 95),
+                'p50_primeiro_token': percentil(primeiro_token, 50),
+                'p95_primeiro_token': percentil(primeiro_token, 95),
+                'tokens_entrada': sum(c['tokens_entrada'] for c in chamadas) / len(chamadas),
+                'tokens_cache': sum(c.get('tokens_cache', 0) for c in chamadas) / len(chamadas),
+                'tokens_saida': sum(c['tokens_saida'] for c in chamadas) / len(chamadas),
+                'acertos_prefixo': sum(com_prefixo) / len(com_prefixo) if com_prefixo else None,
+                'custo_total': sum(c['custo_estimado'] for c in chamadas),
+            }
+        return resumo
+
+    def resumo_planos(self) -> Dict[Tuple[str, str], Dict[str, float]]:
+        """p50/p95 de latência de ponta a ponta e tokens médios por (etapa do funil, modo),
+        só com planos gerados por inteiro pelo modelo: um plano com respostas do
+        cache parece mais rápido e mais barato do que o modo é"""
+        with self._lock:
+            planos = [p for p in self.planos if not p.get('parcial') and not p.get('respostas_cache')]
+
+        por_grupo: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for plano in planos:
+            por_grupo.setdefault((plano['etapa_funil'], plano['modo']), []).append(plano)
+
+        return {
+            grupo: {
+                'planos': len(itens),
+                'p50_segundos': percentil([p['segundos'] for p in itens], 50),
+                'p95_segundos': percentil([p['segundos'] for p in itens], 95),
+                'tokens_entrada': sum(p['tokens_entrada'] for p in itens) / len(itens),
+                'tokens_saida': sum(p['tokens_saida'] for p in itens) / len(itens),
+            }
+            for grupo, itens in sorted(por_grupo.items())
+        }
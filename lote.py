@@ -0,0 +1,211 @@
+"""Geração de planos em lote, sem a interface Streamlit.
+
+Uso:
+    python lote.py campanhas.csv --saida planos/ --workers 8
+
+Cada linha do CSV/JSONL tem os mesmos campos do formulário (os campos de
+`params` em main.py). No CSV, listas como `ferramentas` e `tipo_criativo` são
+separadas por ";", os OKRs vão na coluna `okrs` (ex.: "Alcance;CPM") e as
+metas na coluna `metas` (ex.: "Alcance=2.000.000;CPM=R$ 15"). Sem `okrs`,
+todas as métricas da etapa do funil são selecionadas, como no formulário.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from cache_contexto import criar_cache_contexto
+from cache_respostas import criar_cache_respostas
+from gerador import (
+    DESCRICOES_METRICAS, METRICAS_POR_ETAPA, GeradorPlano, criar_modelo_texto, criar_politica_resiliencia,
+    montar_markdown,
+)
+from armazenamento import RepositorioPlanos, criar_repositorio_planos
+from instrumentacao import MonitorChamadas
+from similaridade import IndicePlanos, criar_indice_planos
+
+CAMPOS_OBRIGATORIOS = ['objetivo_campanha', 'tipo_campanha', 'budget', 'ferramentas', 'localizacao_primaria', 'detalhes_acao']
+
+
+def carregar_campanhas(caminho: str) -> Iterator[Dict[str, Any]]:
+    """Lê as campanhas de um arquivo .csv ou .jsonl"""
+    with open(caminho, encoding="utf-8", newline="") as arquivo:
+        if caminho.endswith(".jsonl"):
+            for linha in arquivo:
+                if linha.strip():
+                    yield json.loads(linha)
+        else:
+            yield from csv.DictReader(arquivo)
+
+
+def _lista(valor: Any) -> List[str]:
+    if isinstance(valor, list):
+        return valor
+    return [item.strip() for item in (valor or "").split(";") if item.strip()]
+
+
+def normalizar_campanha(linha: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte uma linha do arquivo no dicionário `params` usado pelos geradores"""
+    faltando = [campo for campo in CAMPOS_OBRIGATORIOS if not linha.get(campo)]
+    if faltando:
+        raise ValueError(f"Campos obrigatórios ausentes: {', '.join(faltando)}")
+
+    etapa_funil = linha.get('etapa_funil') or 'Topo'
+    if etapa_funil not in METRICAS_POR_ETAPA:
+        raise ValueError(f"Etapa do funil inválida: {etapa_funil}")
+
+    metricas = linha.get('metricas')
+    if not isinstance(metricas, dict):
+        okrs = _lista(linha.get('okrs')) or METRICAS_POR_ETAPA[etapa_funil]
+        metas = dict(item.split("=", 1) for item in _lista(linha.get('metas')) if "=" in item)
+        metricas = {
+            metrica: {
+                'selecionada': metrica in okrs,
+                'valor': metas.get(metrica, "").strip(),
+                'descricao': DESCRICOES_METRICAS.get(metrica, ""),
+            }
+            for metrica in METRICAS_POR_ETAPA[etapa_funil]
+        }
+
+    return {
+        'objetivo_campanha': linha['objetivo_campanha'],
+        'tipo_campanha': linha['tipo_campanha'],
+        'etapa_funil': etapa_funil,
+        'budget': float(linha['budget']),
+        'periodo': linha.get('periodo') or '1 mês',
+        'ferramentas': _lista(linha['ferramentas']),
+        'localizacao_primaria': linha['localizacao_primaria'],
+        'localizacao_secundaria': linha.get('localizacao_secundaria') or "",
+        'tipo_publico': linha.get('tipo_publico') or 'Interesses',
+        'tipo_criativo': _lista(linha.get('tipo_criativo')) or ['Estático'],
+        'metricas': metricas,
+        'detalhes_acao': linha['detalhes_acao'],
+        'observacoes': linha.get('observacoes') or "",
+    }
+
+
+def _nome_arquivo(indice: int, params: Dict[str, Any]) -> str:
+    slug = re.sub(r"[^\w-]+", "_", params['objetivo_campanha'].lower()).strip("_")[:40]
+    return f"{indice:04d}_{slug or 'plano'}.md"
+
+
+def gerar_lote(
+    campanhas: List[Dict[str, Any]],
+    criar_gerador: Callable[[], GeradorPlano],
+    saida: str,
+    workers: int = 4,
+    secoes_simultaneas: int = 3,
+    modo: str = 'encadeado',
+    indice_planos: Optional[IndicePlanos] = None,
+    repositorio: Optional[RepositorioPlanos] = None,
+) -> Tuple[int, int]:
+    """Gera os planos com até `workers` campanhas em paralelo.
+
+    `criar_gerador` cria um GeradorPlano por campanha. Cada plano é gravado em
+    Markdown assim que termina e registrado em `planos.jsonl` e, quando
+    houver, no `indice_planos` de planos semelhantes e no `repositorio` do
+    histórico. Retorna (sucessos, falhas).
+    """
+    os.makedirs(saida, exist_ok=True)
+    lock_registro = threading.Lock()
+    total = len(campanhas)
+
+    def gerar(indice: int, linha: Dict[str, Any]) -> Dict[str, Any]:
+        inicio = time.perf_counter()
+        params = normalizar_campanha(linha)
+        gerador = criar_gerador()
+        plano = gerador.gerar_plano(params, modo, secoes_simultaneas)
+        arquivo = _nome_arquivo(indice, params)
+        with open(os.path.join(saida, arquivo), "w", encoding="utf-8") as md:
+            md.write(montar_markdown(params, plano))
+        segundos = time.perf_counter() - inicio
+        if indice_planos is not None:
+            indice_planos.adicionar(params, plano)
+        if repositorio is not None:
+            repositorio.salvar(params, plano, modo=modo, segundos=segundos, secoes_geradas=len(plano),
+                               tokens_entrada=gerador.tokens_entrada, tokens_saida=gerador.tokens_saida)
+        return {'linha': indice, 'arquivo': arquivo, 'modo': modo, 'params': params, 'plano': plano,
+                'segundos': round(segundos, 2),
+                'tokens_entrada': gerador.tokens_entrada, 'tokens_saida': gerador.tokens_saida,
+                'tokens_economizados': gerador.tokens_economizados,
+                'avisos_validacao': gerador.avisos_validacao}
+
+    sucessos = falhas = 0
+    with open(os.path.join(saida, "planos.jsonl"), "a", encoding="utf-8") as registro, \
+            ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futuros = {executor.submit(gerar, indice, linha): indice for indice, linha in enumerate(campanhas, start=1)}
+        for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+            indice = futuros[futuro]
+            try:
+                resultado = futuro.result()
+            except Exception as erro:
+                falhas += 1
+                resultado = {'linha': indice, 'erro': f"{type(erro).__name__}: {erro}"}
+                print(f"[{concluidos}/{total}] linha {indice}: ERRO {resultado['erro']}", file=sys.stderr)
+            else:
+                sucessos += 1
+                print(f"[{concluidos}/{total}] linha {indice}: ok {resultado['arquivo']} ({resultado['segundos']} s)", file=sys.stderr)
+            with lock_registro:
+                registro.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+                registro.flush()
+    return sucessos, falhas
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Gera planos de mídia em lote a partir de um CSV/JSONL de campanhas")
+    parser.add_argument("entrada", help="Arquivo .csv ou .jsonl com uma campanha por linha")
+    parser.add_argument("--saida", default="planos", help="Diretório dos planos gerados (padrão: planos)")
+    parser.add_argument("--workers", type=int, default=4, help="Campanhas geradas em paralelo (padrão: 4)")
+    parser.add_argument(
+        "--secoes-simultaneas", type=int, default=int(os.getenv("MAX_CHAMADAS_CONCORRENTES", "3")),
+        help="Seções de um mesmo plano geradas em paralelo (padrão: MAX_CHAMADAS_CONCORRENTES ou 3)",
+    )
+    parser.add_argument(
+        "--modo", choices=['encadeado', 'unico'], default='encadeado',
+        help="encadeado: uma chamada por seção; unico: uma chamada com resposta em JSON (padrão: encadeado)",
+    )
+    parser.add_argument("--sem-cache", action="store_true", help="Ignora respostas em cache e gera tudo novamente")
+    parser.add_argument(
+        "--contexto-compacto", action="store_true",
+        help="Envia às seções seguintes um resumo em JSON das seções anteriores em vez do texto completo",
+    )
+    args = parser.parse_args(argv)
+
+    campanhas = list(carregar_campanhas(args.entrada))
+    modelo, cache, contexto = criar_modelo_texto(), criar_cache_respostas(), criar_cache_contexto()
+    monitor = MonitorChamadas(caminho_log=os.getenv("CHAMADAS_LOG_PATH", ".cache/chamadas.jsonl"))
+    resiliencia = criar_politica_resiliencia()
+    repositorio = criar_repositorio_planos()
+    inicio = time.perf_counter()
+    sucessos, falhas = gerar_lote(
+        campanhas,
+        lambda: GeradorPlano(
+            modelo,
+            cache=cache,
+            usar_cache=not args.sem_cache,
+            contexto_compacto=args.contexto_compacto,
+            monitor=monitor,
+            resiliencia=resiliencia,
+            contexto=contexto,
+        ),
+        args.saida,
+        args.workers,
+        args.secoes_simultaneas,
+        args.modo,
+        criar_indice_planos(),
+        repositorio,
+    )
+    if repositorio:
+        repositorio.aguardar()
+    print(f"{sucessos} planos gerados, {falhas} falhas em {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
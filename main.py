@@ -1,8 +1,32 @@
+import time
+inicio_execucao = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
-import google.generativeai as genai
 import os
-from typing import Dict, Any
+import threading
+import uuid
+from functools import partial
+from datetime import datetime, time as hora, timedelta, timezone
+from typing import Callable, Dict, Any, List, Optional
+
+from armazenamento import RepositorioPlanos, criar_repositorio_planos
+
+from cache_contexto import CacheContexto, criar_cache_contexto
+from cache_respostas import CacheRespostas, criar_cache_respostas
+from cenarios import curvas_dataframe, resumo_cenario, simular_cenarios, tabela_cenario_markdown
+from gerador import (
+    DEPENDENCIAS, DESCRICOES_METRICAS, METRICAS_POR_ETAPA, TITULOS_SECOES,
+    GeradorPlano, criar_modelo_texto, criar_politica_resiliencia, impressoes_digitais, montar_markdown,
+    secoes_reaproveitaveis,
+)
+from geografia import localizacoes_params
+from instrumentacao import MonitorChamadas
+from orcamento import PLATAFORMAS, TIPOS_CRIATIVO
+from pipeline import ErroSecoes
+from resiliencia import PoliticaResiliencia
+from similaridade import IndicePlanos, criar_indice_planos
+from tabelas import FORMATOS_EXPORTACAO, exportar_tabelas
+from tarefas import FilaCheia, FilaTarefas, criar_fila_tarefas
 
 # Configuração inicial
 st.set_page_config(
@@ -11,69 +35,277 @@ st.set_page_config(
     page_icon="📊"
 )
 
-# CSS personalizado
-st.markdown("""
-<style>
-    .main {
-        background-color: #f5f7fa;
-    }
-    .stTextInput input, .stSelectbox select, .stTextArea textarea {
-        border-radius: 8px !important;
-        border: 1px solid #d1d5db !important;
-    }
-    .stButton button {
-        background-color: #4f46e5 !important;
-        color: white !important;
-        border-radius: 8px !important;
-        padding: 10px 24px !important;
-        font-weight: 500 !important;
-    }
-    .stButton button:hover {
-        background-color: #4338ca !important;
-    }
-    .result-card {
-        background-color: white;
-        border-radius: 12px;
-        padding: 20px;
-        margin-bottom: 20px;
-        box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-    }
-    table {
-        width: 100%;
-        border-collapse: collapse;
-    }
-    th, td {
-        padding: 12px;
-        text-align: left;
-        border-bottom: 1px solid #e5e7eb;
-    }
-    th {
-        background-color: #f9fafb;
-        font-weight: 600;
-    }
-    .stTabs [aria-selected="true"] {
-        color: #4f46e5 !important;
-        font-weight: 600 !important;
-    }
-    .metric-row {
-        display: flex;
-        align-items: center;
-        margin-bottom: 8px;
-    }
-    .metric-name {
-        width: 200px;
-        font-weight: 500;
-    }
-    .metric-input {
-        flex-grow: 1;
+# CSS personalizado (lido do disco uma única vez por processo)
+@st.cache_resource
+def carregar_css() -> str:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "estilo.css"), encoding="utf-8") as arquivo:
+        return f"<style>\n{arquivo.read()}</style>"
+
+st.markdown(carregar_css(), unsafe_allow_html=True)
+
+# Inicializar Gemini (uma única vez por processo, compartilhado entre sessões).
+# Criado só na primeira geração: não é necessário para desenhar o formulário.
+# A fábrica fica em cache, e não o modelo, para as threads da fila, que não têm
+# o contexto do Streamlit, o criarem na primeira tarefa
+@st.cache_resource
+def obter_fabrica_modelo_texto() -> Callable[[], Any]:
+    trava = threading.Lock()
+    modelo = []
+
+    def obter():
+        with trava:
+            if not modelo:
+                modelo.append(criar_modelo_texto())
+            return modelo[0]
+    return obter
+
+def obter_modelo_texto():
+    return obter_fabrica_modelo_texto()()
+
+# Cache de respostas em disco, compartilhado entre sessões e processos
+@st.cache_resource
+def obter_cache_respostas() -> CacheRespostas:
+    return criar_cache_respostas()
+
+cache_respostas = obter_cache_respostas()
+
+# Prefixos compartilhados já enviados ao modelo, compartilhados entre sessões
+@st.cache_resource
+def obter_cache_contexto() -> CacheContexto:
+    return criar_cache_contexto()
+
+cache_contexto = obter_cache_contexto()
+
+# Registro de latência e tokens das chamadas ao modelo, compartilhado entre sessões
+@st.cache_resource
+def obter_monitor_chamadas() -> MonitorChamadas:
+    return MonitorChamadas(caminho_log=os.getenv("CHAMADAS_LOG_PATH", ".cache/chamadas.jsonl"))
+
+monitor_chamadas = obter_monitor_chamadas()
+
+# Limite de taxa, repetição e circuit breaker compartilhados por todas as sessões
+@st.cache_resource
+def obter_politica_resiliencia() -> PoliticaResiliencia:
+    return criar_politica_resiliencia()
+
+# Índice de similaridade dos planos já gerados, compartilhado entre sessões
+@st.cache_resource
+def obter_indice_planos() -> IndicePlanos:
+    return criar_indice_planos()
+
+indice_planos = obter_indice_planos()
+
+# Histórico de planos no MongoDB (um cliente com pool de conexões por processo);
+# None quando MONGODB_URI não está configurada
+@st.cache_resource
+def obter_repositorio_planos() -> Optional[RepositorioPlanos]:
+    return criar_repositorio_planos()
+
+repositorio_planos = obter_repositorio_planos()
+
+def executar_tarefa(obter_modelo: Callable[[], Any], resiliencia: PoliticaResiliencia, tarefa: Dict[str, Any],
+                    ao_concluir, ao_fragmento) -> Dict[str, Any]:
+    """Gera o plano de uma tarefa da fila, em uma thread de trabalho sem acesso
+    à sessão, e o registra no índice de semelhantes e no histórico"""
+    params, opcoes = tarefa['params'], tarefa['opcoes']
+    gerador = GeradorPlano(
+        obter_modelo(),
+        cache=cache_respostas,
+        usar_cache=opcoes['usar_cache'],
+        contexto_compacto=opcoes['contexto_compacto'],
+        monitor=monitor_chamadas,
+        resiliencia=resiliencia,
+        contexto=cache_contexto,
+        exemplo=indice_planos.obter(opcoes['exemplo'])['plano'] if opcoes.get('exemplo') is not None else None,
+    )
+    erros_secoes = {}
+    inicio_geracao = time.perf_counter()
+    try:
+        plano = gerador.gerar_plano(
+            params,
+            modo=opcoes['modo'],
+            max_concorrencia=opcoes['max_concorrencia'],
+            ao_concluir=ao_concluir,
+            ao_fragmento=ao_fragmento if opcoes['streaming'] else None,
+            resultados_existentes=tarefa['secoes'],
+            condicionais=opcoes.get('condicionais'),
+        )
+    except ErroSecoes as erro:
+        # As seções concluídas já foram gravadas; só as que falharam serão repetidas
+        plano = erro.resultados
+        for chave, excecao in erro.erros.items():
+            erros_secoes[chave] = f"Falha ao gerar esta seção: {type(excecao).__name__}: {excecao}"
+        for chave in erro.ignoradas:
+            erros_secoes[chave] = "Não gerada porque depende de uma seção que falhou."
+    reaproveitadas = opcoes['reaproveitadas'] + gerador.condicionais_reaproveitadas
+    secoes_geradas = len(DEPENDENCIAS) - reaproveitadas
+    if secoes_geradas and not erros_secoes:
+        indice_planos.adicionar(params, plano)
+        if repositorio_planos:
+            repositorio_planos.salvar(
+                params,
+                plano,
+                modo=opcoes['modo'],
+                segundos=time.perf_counter() - inicio_geracao,
+                secoes_geradas=secoes_geradas,
+                tokens_entrada=gerador.tokens_entrada,
+                tokens_saida=gerador.tokens_saida,
+            )
+    return {
+        'erros_secoes': erros_secoes,
+        'avisos_validacao': gerador.avisos_validacao,
+        'secoes_geradas': secoes_geradas,
+        'reaproveitadas': reaproveitadas,
+        'tokens_economizados': gerador.tokens_economizados if opcoes['contexto_compacto'] else None,
     }
-</style>
-""", unsafe_allow_html=True)
 
-# Inicializar Gemini
-gemini_api_key = os.getenv("GEM_API_KEY")
-genai.configure(api_key=gemini_api_key)
-modelo_texto = genai.GenerativeModel("gemini-1.5-flash")
+# Fila de geração do processo, compartilhada entre sessões: a geração continua
+# se a página for recarregada ou a conexão cair
+@st.cache_resource
+def obter_fila_tarefas() -> FilaTarefas:
+    # Os recursos em cache são obtidos aqui, na execução do script: as threads
+    # de trabalho não têm o contexto do Streamlit. O modelo só é criado na
+    # primeira tarefa
+    return criar_fila_tarefas(partial(executar_tarefa, obter_fabrica_modelo_texto(), obter_politica_resiliencia()))
+
+fila_tarefas = obter_fila_tarefas()
+
+# Consulta do histórico reaproveitada entre reexecuções; planos novos aparecem em até 30 s
+@st.cache_data(ttl=30, show_spinner=False)
+def listar_historico(etapa: Optional[str], campanha: Optional[str], inicio: Optional[datetime],
+                     fim: Optional[datetime], pagina: int, por_pagina: int):
+    return repositorio_planos.listar(etapa, campanha, inicio, fim, pagina, por_pagina)
+
+# Tabelas do plano exportadas uma vez por conteúdo do plano e formato
+@st.cache_data(max_entries=20, show_spinner=False)
+def exportar_tabelas_plano(plano: Dict[str, str], formato: str) -> bytes:
+    return exportar_tabelas(plano, formato)
+
+# Markdown do plano para download, montado uma vez por conteúdo do plano
+@st.cache_data(max_entries=20, show_spinner=False)
+def markdown_plano(params: Dict[str, Any], plano: Dict[str, str]) -> str:
+    return montar_markdown(params, plano)
+
+def exibir_semelhantes(expandido: bool) -> None:
+    """Planos semelhantes já gerados, com a opção de reaproveitar um deles"""
+    semelhantes = st.session_state.get('semelhantes', [])
+    if not semelhantes:
+        return
+    with st.expander(f"🔁 {len(semelhantes)} plano(s) semelhante(s) já gerado(s)", expanded=expandido):
+        for similaridade, id_plano in semelhantes:
+            registro = indice_planos.obter(id_plano)
+            anterior = registro['params']
+            col_descricao, col_botao = st.columns([4, 1])
+            col_descricao.markdown(
+                f"**{anterior['objetivo_campanha']}** — {anterior['etapa_funil']}, R$ {anterior['budget']:,.2f}, "
+                f"{', '.join(anterior['ferramentas'])} ({similaridade:.0%} semelhante)"
+            )
+            if col_botao.button("Reaproveitar", key=f"reaproveitar_{id_plano}"):
+                st.session_state.params = anterior
+                st.session_state.plano_completo = dict(registro['plano'])
+                st.session_state.erros_secoes = {}
+                st.session_state.avisos_validacao = {}
+                st.session_state.impressoes_plano = {}
+                st.session_state.semelhantes = []
+                st.session_state.resumo_tarefa = {}
+                # A geração em andamento continua na fila, mas deixa de ser acompanhada
+                st.session_state.pop('tarefa', None)
+                st.query_params.pop('tarefa', None)
+                st.rerun(scope="app")
+
+def exibir_acoes_plano() -> None:
+    """Avisos de validação, nova tentativa das seções com falha e downloads"""
+    params = st.session_state.params
+    plano = st.session_state.plano_completo
+    for chave, aviso in st.session_state.avisos_validacao.items():
+        st.warning(f"{TITULOS_SECOES[chave].lstrip('# ')}: {aviso} (mesmo após gerar a seção novamente)")
+    
+    if st.session_state.erros_secoes and st.button("🔄 Gerar novamente as seções que falharam"):
+        st.session_state.repetir_secoes = True
+        st.rerun(scope="app")
+    
+    # Botões de download não reexecutam o script; os arquivos vêm do cache enquanto o plano não muda
+    if all(key in plano for key in DEPENDENCIAS):
+        st.download_button(
+            label="📥 Baixar Plano Completo",
+            data=markdown_plano(params, plano),
+            file_name=f"plano_midia_{params['etapa_funil']}_{params['objetivo_campanha'][:30]}.md",
+            mime="text/markdown",
+            on_click="ignore",
+        )
+        
+        # Tabelas de distribuição, previsão e cronograma com valores numéricos
+        colunas_exportacao = st.columns(len(FORMATOS_EXPORTACAO))
+        for coluna, (formato, (extensao, mime)) in zip(colunas_exportacao, FORMATOS_EXPORTACAO.items()):
+            coluna.download_button(
+                label=f"📑 Tabelas em {formato.upper()}",
+                data=exportar_tabelas_plano(plano, formato),
+                file_name=f"tabelas_{params['etapa_funil']}_{formato}.{extensao}",
+                mime=mime,
+                on_click="ignore",
+            )
+
+# Plano já gerado: as interações dentro deste trecho reexecutam só ele, não o
+# formulário, a barra lateral e as demais abas
+@st.fragment
+def exibir_plano() -> None:
+    exibir_semelhantes(expandido=False)
+    for chave, titulo in TITULOS_SECOES.items():
+        st.markdown(titulo)
+        if chave in st.session_state.erros_secoes:
+            st.error(st.session_state.erros_secoes[chave])
+        else:
+            st.markdown(st.session_state.plano_completo.get(chave, 'Em processamento...'))
+    resumo_tarefa = st.session_state.get('resumo_tarefa') or {}
+    if resumo_tarefa.get('reaproveitadas'):
+        st.caption(
+            f"{resumo_tarefa['reaproveitadas']} seção(ões) reaproveitada(s) do plano anterior; "
+            f"{resumo_tarefa['secoes_geradas']} gerada(s) novamente"
+        )
+    if resumo_tarefa.get('tokens_economizados') is not None:
+        st.caption(f"Contexto compacto: ~{resumo_tarefa['tokens_economizados']:,} tokens de entrada economizados neste plano")
+    nao_reconhecidas = [
+        trecho for _, trechos in localizacoes_params(st.session_state.params) for trecho in trechos
+    ]
+    if nao_reconhecidas:
+        st.caption(
+            f"Localizações não reconhecidas no índice geográfico, fora da divisão do budget por população: "
+            f"{', '.join(nao_reconhecidas)}"
+        )
+    exibir_acoes_plano()
+
+# Progresso da geração em andamento, consultado na fila a cada segundo só neste
+# trecho; ao terminar, o plano passa para a sessão e a página volta ao normal
+@st.fragment(run_every=1.0)
+def acompanhar_tarefa() -> None:
+    tarefa = fila_tarefas.estado(st.session_state.tarefa)
+    if tarefa is None:
+        del st.session_state.tarefa
+        st.query_params.pop('tarefa', None)
+        st.error("A geração deste plano não foi encontrada. Envie o formulário novamente.")
+        return
+    if tarefa['estado'] in ('concluida', 'falhou'):
+        resultado = tarefa['resultado'] or {}
+        st.session_state.plano_completo = tarefa['secoes']
+        st.session_state.erros_secoes = resultado.get('erros_secoes', {})
+        if tarefa['estado'] == 'falhou':
+            for chave in DEPENDENCIAS:
+                if chave not in tarefa['secoes']:
+                    st.session_state.erros_secoes[chave] = f"Falha ao gerar esta seção: {tarefa['erro']}"
+        st.session_state.avisos_validacao = resultado.get('avisos_validacao', {})
+        st.session_state.resumo_tarefa = {'reaproveitadas': tarefa['opcoes']['reaproveitadas'], **resultado}
+        del st.session_state.tarefa
+        st.rerun(scope="app")
+    
+    if tarefa['estado'] == 'na_fila':
+        st.info(f"Plano na fila de geração ({(tarefa['posicao'] or 0) + 1}º a ser iniciado).")
+    else:
+        st.info(f"Gerando plano completo para {tarefa['params']['etapa_funil']} do funil... "
+                "A geração continua mesmo se a página for fechada ou recarregada.")
+    exibir_semelhantes(expandido=True)
+    for chave, titulo in TITULOS_SECOES.items():
+        st.markdown(titulo)
+        st.markdown(tarefa['secoes'].get(chave) or tarefa['parciais'].get(chave) or 'Em processamento...')
 
 # Título do aplicativo
 st.title("📊 IA para Planejamento de Mídia")
@@ -86,210 +318,78 @@ if 'plano_completo' not in st.session_state:
     st.session_state.plano_completo = {}
 if 'current_step' not in st.session_state:
     st.session_state.current_step = 0
-
-# Dicionários de métricas por etapa do funil
-METRICAS_POR_ETAPA = {
-    'Topo': ['Impressões', 'Alcance', 'Custo', 'CPM', 'Cliques', 'CTR', 'Engajamentos', 'Frequência'],
-    'Meio': ['Impressões', 'Cliques', 'CTR', 'CPM', 'Custo', 'Engajamentos', 'Visualizações', 'ThruPlays'],
-    'Fundo': ['Impressões', 'Cliques', 'Resultados', 'CTR', 'CPM', 'Custo por resultado', 'Custo']
+if 'erros_secoes' not in st.session_state:
+    st.session_state.erros_secoes = {}
+if 'avisos_validacao' not in st.session_state:
+    st.session_state.avisos_validacao = {}
+# Identidade do rodízio e da cota da fila: o e-mail do login do Streamlit,
+# quando houver; sem login, um id da sessão, e a cota vale por sessão (uma aba
+# nova ou uma página recarregada sem ?tarefa= começa com a cota cheia)
+if 'usuario' not in st.session_state:
+    st.session_state.usuario = (
+        st.experimental_user.get('email') if st.experimental_user.get('is_logged_in') else None
+    ) or f"sessao:{uuid.uuid4().hex}"
+
+# Página recarregada ou reaberta com o id de uma geração: volta a acompanhá-la
+if 'params' not in st.session_state and st.query_params.get('tarefa'):
+    tarefa_anterior = fila_tarefas.estado(st.query_params['tarefa'])
+    if tarefa_anterior:
+        st.session_state.params = tarefa_anterior['params']
+        st.session_state.usuario = tarefa_anterior['usuario']
+        st.session_state.impressoes_plano = tarefa_anterior['opcoes'].get('impressoes', {})
+        st.session_state.tarefa = tarefa_anterior['id']
+        st.session_state.current_step = 1
+
+# Configurações de geração
+MODOS_GERACAO = {
+    "Encadeado (uma chamada por seção)": 'encadeado',
+    "Chamada única (JSON)": 'unico',
 }
 
-DESCRICOES_METRICAS = {
-    'Impressões': "Número total de vezes que seu anúncio foi exibido",
-    'Alcance': "Número de pessoas únicas que viram seu anúncio",
-    'Custo': "Custo total da campanha",
-    'CPM': "Custo por mil impressões",
-    'Cliques': "Número total de cliques no anúncio",
-    'CTR': "Taxa de cliques (cliques/impressões)",
-    'Engajamentos': "Interações com o anúncio (curtidas, comentários, compartilhamentos)",
-    'Frequência': "Média de vezes que cada pessoa viu seu anúncio",
-    'Visualizações': "Visualizações do vídeo (3s ou mais)",
-    'ThruPlays': "Visualizações completas do vídeo",
-    'Resultados': "Número de conversões (compras, cadastros, etc.)",
-    'Custo por resultado': "Custo médio por conversão",
-}
-
-# Funções de geração de conteúdo
-def gerar_recomendacao_estrategica(params: Dict[str, Any]) -> str:
-    """Gera a recomendação estratégica inicial"""
-    etapa_funil = params['etapa_funil']
-    okrs_escolhidos = [k for k, v in params['metricas'].items() if v['selecionada']]
-    metas_especificas = [f"{k}: {v['valor']}" for k, v in params['metricas'].items() if v['selecionada'] and v['valor']]
-
-    prompt = f"""
-    Como especialista em planejamento de mídia digital, analise os seguintes parâmetros e forneça uma recomendação estratégica:
-
-    **Campanha:** {params['objetivo_campanha']} (Etapa do Funil: {etapa_funil})
-    **Tipo de Campanha:** {params['tipo_campanha']}
-    **Budget Total:** R$ {params['budget']:,.2f}
-    **Período da Campanha:** {params['periodo']}
-    **Ferramentas/Plataformas:** {", ".join(params['ferramentas'])}
-    **Localização Primária:** {params['localizacao_primaria']}
-    **Localização Secundária:** {params['localizacao_secundaria']}
-    **Tipo de Público:** {params['tipo_publico']}
-    **Tipos de Criativo:** {", ".join(params['tipo_criativo'])}
-    **OKRs Escolhidos:** {", ".join(okrs_escolhidos) if okrs_escolhidos else "A serem definidos"}
-    **Metas Específicas:** {", ".join(metas_especificas) if metas_especificas else "Nenhuma meta específica"}
-    **Detalhes da Ação:** {params['detalhes_acao'] or "Nenhum"}
-    **Observações:** {params['observacoes'] or "Nenhuma"}
-
-    Forneça:
-    1. Análise estratégica focada em {etapa_funil} do funil (150-200 palavras)
-    2. Principais oportunidades para os OKRs selecionados
-    3. Riscos potenciais específicos para esta etapa
-    4. Recomendação geral de abordagem
-
-    Dicas:
-    - Mantenha o foco absoluto nos OKRs selecionados: {", ".join(okrs_escolhidos) if okrs_escolhidos else "gerar sugestões apropriadas"}
-    - Considere as metas específicas quando fornecidas
-    - Adapte ao período especificado
-
-    Formato: Markdown com headers (##, ###)
-    """
-    response = modelo_texto.generate_content(prompt)
-    return response.text
-
-def gerar_distribuicao_budget(params: Dict[str, Any], recomendacao_estrategica: str) -> str:
-    """Gera a distribuição de budget baseada na recomendação estratégica"""
-    etapa_funil = params['etapa_funil']
-    okrs_escolhidos = [k for k, v in params['metricas'].items() if v['selecionada']]
-    metas_especificas = [f"{k}: {v['valor']}" for k, v in params['metricas'].items() if v['selecionada'] and v['valor']]
-
-    prompt = f"""
-    Com base na seguinte recomendação estratégica (Etapa {etapa_funil} do Funil):
-    {recomendacao_estrategica}
-
-    E nos parâmetros originais:
-    - Budget: R$ {params['budget']:,.2f}
-    - Período: {params['periodo']}
-    - Plataformas: {", ".join(params['ferramentas'])}
-    - Localizações: Primária ({params['localizacao_primaria']}), Secundária ({params['localizacao_secundaria']})
-    - Tipos de Criativo: {", ".join(params['tipo_criativo'])}
-    - OKRs: {", ".join(okrs_escolhidos) if okrs_escolhidos else "A serem otimizados"}
-    - Metas: {", ".join(metas_especificas) if metas_especificas else "Nenhuma específica"}
-
-    Crie uma tabela detalhada de distribuição de budget OTIMIZADA PARA OS OKRs SELECIONADOS com:
-    1. Divisão por plataforma (% e valor)
-    2. Alocação geográfica (primária vs secundária)
-    3. Tipos de criativos recomendados (APENAS: {", ".join(params['tipo_criativo'])})
-    4. Justificativa estratégica para cada alocação
-
-    REGRAS:
-    - Priorize os OKRs selecionados: {", ".join(okrs_escolhidos) if okrs_escolhidos else "otimize para a etapa do funil"}
-    - Considere as metas específicas quando fornecidas
-    - Não sugerir criativos fora dos tipos especificados
-    - Manter foco absoluto nos estados solicitados
-
-    Inclua também uma breve análise (50-100 palavras) explicando como a distribuição atende aos objetivos.
-
-    Formato: Markdown com tabelas (use | para divisão)
-    """
-    response = modelo_texto.generate_content(prompt)
-    return response.text
-
-def gerar_previsao_resultados(params: Dict[str, Any], recomendacao_estrategica: str, distribuicao_budget: str) -> str:
-    """Gera previsão de resultados baseada nos parâmetros"""
-    etapa_funil = params['etapa_funil']
-    okrs_escolhidos = [k for k, v in params['metricas'].items() if v['selecionada']]
-    metas_especificas = [f"{k}: {v['valor']}" for k, v in params['metricas'].items() if v['selecionada'] and v['valor']]
-
-    prompt = f"""
-    Com base na estratégia para {etapa_funil} do funil:
-    {recomendacao_estrategica}
-
-    E na distribuição de budget:
-    {distribuicao_budget}
-
-    Estime os resultados ESPERADOS considerando:
-    - Budget total: R$ {params['budget']:,.2f}
-    - Período: {params['periodo']}
-    - OKRs: {", ".join(okrs_escolhidos) if okrs_escolhidos else "A serem otimizados"}
-    - Metas: {", ".join(metas_especificas) if metas_especificas else "Nenhuma específica"}
-
-    Forneça:
-    1. Tabela com métricas ESPECÍFICAS para os OKRs selecionados
-    2. Estimativas realistas baseadas em benchmarks
-    3. Análise de potencial desempenho (50-100 palavras)
-    4. KPIs CHAVE para monitorar
-
-    DICAS:
-    - Destaque os OKRs selecionados: {", ".join(okrs_escolhidos) if okrs_escolhidos else "foco na etapa do funil"}
-    - Considere as metas específicas quando fornecidas
-    - Use benchmarks realistas para o setor
-
-    Formato: Markdown com tabelas
-    """
-    response = modelo_texto.generate_content(prompt)
-    return response.text
-
-def gerar_recomendacoes_publico(params: Dict[str, Any], recomendacao_estrategica: str) -> str:
-    """Gera recomendações detalhadas de público-alvo"""
-    etapa_funil = params['etapa_funil']
-    okrs_escolhidos = [k for k, v in params['metricas'].items() if v['selecionada']]
-
-    prompt = f"""
-    Para a campanha na etapa {etapa_funil} do funil com:
-    - Tipo de Público: {params['tipo_publico']}
-    - Objetivo: {params['objetivo_campanha']}
-    - Plataformas: {", ".join(params['ferramentas'])}
-    - Localizações: {params['localizacao_primaria']} (primária), {params['localizacao_secundaria']} (secundária)
-    - OKRs: {", ".join(okrs_escolhidos) if okrs_escolhidos else "A serem otimizados"}
-
-    E considerando a estratégia geral:
-    {recomendacao_estrategica}
-
-    Desenvolva recomendações de público OTIMIZADAS PARA OS OBJETIVOS incluindo:
-    1. Segmentação específica para os OKRs selecionados
-    2. Parâmetros de targeting focados nos objetivos
-    3. Estratégias de expansão adequadas
-    4. Considerações sobre frequência e saturação
-
-    REGRAS:
-    - Manter foco absoluto nos estados especificados
-    - Adaptar recomendações aos OKRs selecionados
-    - Priorizar estratégias adequadas para a etapa {etapa_funil}
-
-    Formato: Markdown com listas e headers
-    """
-    response = modelo_texto.generate_content(prompt)
-    return response.text
-
-def gerar_cronograma(params: Dict[str, Any], recomendacao_estrategica: str, distribuicao_budget: str) -> str:
-    """Gera cronograma de implementação"""
-    etapa_funil = params['etapa_funil']
-    okrs_escolhidos = [k for k, v in params['metricas'].items() if v['selecionada']]
-
-    prompt = f"""
-    Com base na estratégia para {etapa_funil} do funil:
-    {recomendacao_estrategica}
-
-    E na distribuição de budget:
-    {distribuicao_budget}
-
-    Crie um cronograma OTIMIZADO considerando:
-    - Budget total: R$ {params['budget']:,.2f}
-    - Período: {params['periodo']}
-    - Plataformas: {", ".join(params['ferramentas'])}
-    - OKRs: {", ".join(okrs_escolhidos) if okrs_escolhidos else "A serem otimizados"}
-
-    Inclua:
-    1. Fases de implementação adequadas
-    2. Distribuição temporal do budget
-    3. Marcos importantes
-    4. Frequência de ajustes recomendada
-
-    DICAS:
-    - Adaptar cronograma aos objetivos específicos
-    - Não incluir fases irrelevantes
-    - Manter realismo no período especificado
-
-    Formato: Markdown com tabelas ou listas numeradas
-    """
-    response = modelo_texto.generate_content(prompt)
-    return response.text
+with st.sidebar:
+    st.header("⚙️ Configurações")
+    modo_geracao = MODOS_GERACAO[st.radio(
+        "Modo de geração",
+        list(MODOS_GERACAO),
+        index=0,
+        help="Chamada única gera todas as seções em uma só resposta em JSON (sem streaming)"
+    )]
+    max_concorrencia = st.number_input(
+        "Chamadas simultâneas ao modelo",
+        min_value=1,
+        max_value=len(DEPENDENCIAS),
+        value=min(int(os.getenv("MAX_CHAMADAS_CONCORRENTES", "3")), len(DEPENDENCIAS)),
+        help="Número máximo de seções geradas em paralelo"
+    )
+    usar_streaming = st.checkbox(
+        "Exibir texto enquanto é gerado",
+        value=True,
+        help="Mostra cada seção à medida que o modelo escreve, em vez de esperar a seção inteira"
+    )
+    contexto_compacto = st.radio(
+        "Contexto entre seções",
+        ["Texto completo", "Resumo compacto"],
+        index=0,
+        help="Resumo compacto envia às seções seguintes só as decisões principais em JSON, reduzindo os tokens de entrada"
+    ) == "Resumo compacto"
+    usar_exemplo = st.checkbox(
+        "Usar plano semelhante como exemplo",
+        value=False,
+        help="Inclui no prompt da recomendação estratégica o resumo do plano já gerado mais parecido com esta campanha"
+    )
+    usar_cache = not st.checkbox(
+        "Ignorar cache de respostas",
+        value=False,
+        help="Gera novamente todas as seções mesmo que o mesmo plano já tenha sido gerado"
+    )
+    estatisticas_cache = cache_respostas.estatisticas()
+    st.caption(
+        f"Cache: {estatisticas_cache['acertos']} acertos, {estatisticas_cache['falhas']} falhas, "
+        f"{estatisticas_cache['entradas']} respostas armazenadas"
+    )
 
 # Abas principais
-tab1, tab2 = st.tabs(["📋 Criar Novo Plano", "📊 Exemplos por Etapa"])
+tab1, tab2, tab3, tab4 = st.tabs(["📋 Criar Novo Plano", "🔀 Cenários de Budget", "📊 Exemplos por Etapa", "🗂️ Histórico"])
 
 with tab1:
     st.header("Informações do Plano de Mídia")
@@ -333,8 +433,7 @@ with tab1:
         with col2:
             ferramentas = st.multiselect(
                 "Ferramentas/Plataformas*",
-                ["Meta Ads (Facebook/Instagram)", "Google Ads", "TikTok", "LinkedIn", 
-                 "YouTube", "Mídia Programática", "Twitter", "Pinterest"],
+                PLATAFORMAS,
                 default=["Meta Ads (Facebook/Instagram)", "Google Ads"]
             )
             
@@ -359,7 +458,7 @@ with tab1:
             
             tipo_criativo = st.multiselect(
                 "Tipos de Criativo*",
-                ["Estático", "Vídeo", "Carrossel", "Motion", "Story", "Coleção"],
+                TIPOS_CRIATIVO,
                 default=["Estático", "Vídeo"]
             )
         
@@ -397,6 +496,8 @@ with tab1:
         
         submitted = st.form_submit_button("Gerar Plano de Mídia")
     
+    # Pedido de nova tentativa só para as seções que falharam
+    gerar_plano = st.session_state.pop('repetir_secoes', False)
     if submitted:
         if not objetivo_campanha or not tipo_campanha or not budget or not ferramentas or not localizacao_primaria or not detalhes_acao:
             st.error("Por favor, preencha todos os campos obrigatórios (*)")
@@ -418,16 +519,50 @@ with tab1:
                 'observacoes': observacoes
             }
             
+            # Planos já gerados para campanhas parecidas
+            st.session_state.semelhantes = indice_planos.buscar(params)
+            exemplo = st.session_state.semelhantes[0][1] if usar_exemplo and st.session_state.semelhantes else None
+            st.session_state.exemplo = exemplo
+            
+            # Só as seções afetadas pelos parâmetros alterados são geradas de novo;
+            # as que dependem delas, só se o texto das dependências mudar
+            impressoes = impressoes_digitais(
+                params, {'modo': modo_geracao, 'contexto_compacto': contexto_compacto, 'exemplo': exemplo}
+            )
+            st.session_state.plano_completo, st.session_state.secoes_condicionais = secoes_reaproveitaveis(
+                st.session_state.plano_completo, st.session_state.get('impressoes_plano', {}), impressoes
+            )
+            st.session_state.impressoes_plano = impressoes
+            
             st.session_state.current_step = 1
             st.session_state.params = params
-            
-            # Gerar todo o conteúdo de uma vez
-            with st.spinner(f'Gerando plano completo para {etapa_funil} do funil...'):
-                st.session_state.plano_completo['recomendacao_estrategica'] = gerar_recomendacao_estrategica(params)
-                st.session_state.plano_completo['distribuicao_budget'] = gerar_distribuicao_budget(params, st.session_state.plano_completo['recomendacao_estrategica'])
-                st.session_state.plano_completo['previsao_resultados'] = gerar_previsao_resultados(params, st.session_state.plano_completo['recomendacao_estrategica'], st.session_state.plano_completo['distribuicao_budget'])
-                st.session_state.plano_completo['recomendacoes_publico'] = gerar_recomendacoes_publico(params, st.session_state.plano_completo['recomendacao_estrategica'])
-                st.session_state.plano_completo['cronograma'] = gerar_cronograma(params, st.session_state.plano_completo['recomendacao_estrategica'], st.session_state.plano_completo['distribuicao_budget'])
+            gerar_plano = True
+    
+    # A geração roda na fila do processo; a página só acompanha o progresso
+    if gerar_plano:
+        opcoes = {
+            'modo': modo_geracao,
+            'max_concorrencia': max_concorrencia,
+            'streaming': usar_streaming,
+            'contexto_compacto': contexto_compacto,
+            'usar_cache': usar_cache,
+            'exemplo': st.session_state.get('exemplo'),
+            'reaproveitadas': len(st.session_state.plano_completo),
+            'condicionais': st.session_state.get('secoes_condicionais', {}),
+            # Para reaproveitar seções na próxima edição, mesmo após recarregar a página
+            'impressoes': st.session_state.get('impressoes_plano', {}),
+        }
+        try:
+            st.session_state.tarefa = fila_tarefas.submeter(
+                st.session_state.usuario, st.session_state.params, opcoes, st.session_state.plano_completo
+            )
+        except FilaCheia as erro:
+            st.error(str(erro))
+        else:
+            st.query_params['tarefa'] = st.session_state.tarefa
+            st.session_state.erros_secoes = {}
+            st.session_state.avisos_validacao = {}
+            st.session_state.resumo_tarefa = {}
     
     # Exibir resultados
     if st.session_state.current_step >= 1 and 'params' in st.session_state:
@@ -446,50 +581,106 @@ with tab1:
         else:
             st.warning("Nenhuma métrica foi configurada ainda.")
         
-        st.markdown("## 📌 Recomendação Estratégica")
-        st.markdown(st.session_state.plano_completo.get('recomendacao_estrategica', 'Em processamento...'))
-        
-        st.markdown("## 📊 Distribuição de Budget")
-        st.markdown(st.session_state.plano_completo.get('distribuicao_budget', 'Em processamento...'))
-        
-        st.markdown("## 📈 Previsão de Resultados")
-        st.markdown(st.session_state.plano_completo.get('previsao_resultados', 'Em processamento...'))
-        
-        st.markdown("## 🎯 Recomendações de Público")
-        st.markdown(st.session_state.plano_completo.get('recomendacoes_publico', 'Em processamento...'))
-        
-        st.markdown("## 📅 Cronograma Sugerido")
-        st.markdown(st.session_state.plano_completo.get('cronograma', 'Em processamento...'))
-        
-        # Botão para baixar o plano completo
-        if all(key in st.session_state.plano_completo for key in ['recomendacao_estrategica', 'distribuicao_budget', 'previsao_resultados', 'recomendacoes_publico', 'cronograma']):
-            plano_completo = "\n\n".join([
-                f"# 📊 Plano de Mídia Completo ({etapa_funil} do Funil)\n",
-                f"**Campanha:** {st.session_state.params['objetivo_campanha']}",
-                f"**Budget:** R$ {st.session_state.params['budget']:,.2f}",
-                f"**Período:** {st.session_state.params['periodo']}",
-                f"**OKRs Selecionados:** {', '.join(okrs_selecionados) if okrs_selecionados else 'A serem otimizados'}",
-                f"**Metas Definidas:** {', '.join(metas_definidas) if metas_definidas else 'Nenhuma específica'}\n",
-                "## 📌 Recomendação Estratégica",
-                st.session_state.plano_completo['recomendacao_estrategica'],
-                "## 📊 Distribuição de Budget",
-                st.session_state.plano_completo['distribuicao_budget'],
-                "## 📈 Previsão de Resultados",
-                st.session_state.plano_completo['previsao_resultados'],
-                "## 🎯 Recomendações de Público",
-                st.session_state.plano_completo['recomendacoes_publico'],
-                "## 📅 Cronograma Sugerido",
-                st.session_state.plano_completo['cronograma']
-            ])
-            
-            st.download_button(
-                label="📥 Baixar Plano Completo",
-                data=plano_completo,
-                file_name=f"plano_midia_{etapa_funil}_{st.session_state.params['objetivo_campanha'][:30]}.md",
-                mime="text/markdown"
-            )
+        if st.session_state.get('tarefa'):
+            acompanhar_tarefa()
+        else:
+            exibir_plano()
+
+def grafico_linhas(eixo_x: str, series: List[str]) -> Dict[str, Any]:
+    """Especificação Vega-Lite de um gráfico de linhas das colunas `series`.
+    Montada à mão: st.line_chart passa pelo Altair e custa ~100 ms por gráfico a
+    cada execução do script, contra poucos ms de st.vega_lite_chart"""
+    return {
+        'transform': [{'fold': series, 'as': ["Série", "Valor"]}],
+        'mark': {'type': "line", 'tooltip': True},
+        'encoding': {
+            'x': {'field': eixo_x, 'type': "quantitative", 'scale': {'type': "log"}},
+            'y': {'field': "Valor", 'type': "quantitative", 'title': None},
+            'color': {'field': "Série", 'type': "nominal", 'legend': {'orient': "bottom", 'title': None} if len(series) > 1 else None},
+        },
+    }
+
+# Análise de sensibilidade: a grade inteira é calculada localmente a cada
+# interação e o modelo só é chamado para narrar o cenário escolhido
+@st.fragment
+def exibir_cenarios() -> None:
+    st.header("Cenários de Budget")
+    
+    if 'params' not in st.session_state:
+        st.info("Envie o formulário em \"Criar Novo Plano\" para comparar cenários de budget e de plataformas.")
+        return
+    params = st.session_state.params
+    
+    fator_minimo, fator_maximo = st.select_slider(
+        "Faixa de budget em relação ao atual",
+        options=[0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 10.0],
+        value=(0.25, 4.0),
+        format_func=lambda fator: f"{fator:g}×",
+        key="cenarios_faixa",
+    )
+    inicio_cenarios = time.perf_counter()
+    cenarios = simular_cenarios(params, fator_minimo, fator_maximo)
+    metrica = cenarios['metrica']
+    st.caption(
+        f"{cenarios[metrica].size} cenários ({len(cenarios['budgets'])} budgets × {len(cenarios['misturas'])} "
+        f"misturas de plataformas) calculados em {(time.perf_counter() - inicio_cenarios) * 1000:.1f} ms"
+    )
+    
+    # Ganho de cada real adicional com a distribuição atual: cai conforme as plataformas saturam
+    curvas = curvas_dataframe(cenarios).reset_index()
+    colunas_graficos = st.columns(3)
+    for coluna, nome in zip(colunas_graficos, ("Alcance", "Cliques", "Resultados")):
+        coluna.markdown(f"**{nome} a cada R$ 1.000 adicionais**")
+        coluna.vega_lite_chart(curvas, grafico_linhas("Budget (R$)", [f"{nome} por R$ 1.000"]), height=220)
+    
+    st.markdown(f"**{metrica}: distribuição atual × melhor mistura de plataformas**")
+    comparacao = curvas[["Budget (R$)", metrica]].rename(columns={metrica: "Distribuição atual"})
+    comparacao["Melhor mistura"] = cenarios[metrica].max(axis=1)
+    st.vega_lite_chart(comparacao, grafico_linhas("Budget (R$)", ["Distribuição atual", "Melhor mistura"]), height=260)
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        indice_budget = st.select_slider(
+            "Cenário de budget",
+            options=list(range(len(cenarios['budgets']))),
+            value=cenarios['indice_budget_atual'],
+            format_func=lambda i: f"R$ {cenarios['budgets'][i]:,.0f}",
+            key="cenarios_budget",
+        )
+    with col2:
+        usar_melhor = st.radio(
+            "Plataformas", ["Distribuição atual", f"Melhor para {metrica}"], key="cenarios_mistura"
+        ) != "Distribuição atual"
+    mistura = int(cenarios['melhor_mistura'][indice_budget]) if usar_melhor else 0
+    resumo = resumo_cenario(cenarios, indice_budget, mistura)
+    st.markdown(tabela_cenario_markdown(resumo))
+    
+    narracao = st.session_state.get('narracao_cenario')
+    if narracao and narracao['params'] == params and narracao['resumo'] == resumo:
+        st.markdown(narracao['texto'])
+    elif st.button("📝 Narrar cenário"):
+        espaco_narracao = st.empty()
+        gerador = GeradorPlano(
+            obter_modelo_texto(),
+            cache=cache_respostas,
+            usar_cache=usar_cache,
+            monitor=monitor_chamadas,
+            resiliencia=obter_politica_resiliencia(),
+            contexto=cache_contexto,
+        )
+        try:
+            with st.spinner("Narrando o cenário..."):
+                texto = gerador.narrar_cenario(params, resumo, espaco_narracao.markdown if usar_streaming else None)
+        except Exception as erro:
+            st.error(f"Falha ao narrar o cenário: {type(erro).__name__}: {erro}")
+        else:
+            espaco_narracao.markdown(texto)
+            st.session_state.narracao_cenario = {'params': params, 'resumo': resumo, 'texto': texto}
 
 with tab2:
+    exibir_cenarios()
+
+with tab3:
     st.header("Exemplos por Etapa do Funil")
     
     tab_topo, tab_meio, tab_fundo = st.tabs(["Topo", "Meio", "Fundo"])
@@ -563,8 +754,120 @@ with tab2:
         | Google Ads | 40% | 48.000 | Shopping (100%) |
         """)
 
+# Filtros e paginação do histórico reexecutam só este trecho
+@st.fragment
+def exibir_historico() -> None:
+    st.header("Histórico de Planos")
+    
+    if repositorio_planos is None:
+        st.info("Configure a variável de ambiente MONGODB_URI para guardar e consultar o histórico de planos.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            filtro_etapa = st.selectbox("Etapa do Funil", ["Todas", "Topo", "Meio", "Fundo"], key="historico_etapa")
+        with col2:
+            filtro_campanha = st.text_input("Campanha (início do nome)", key="historico_campanha")
+        with col3:
+            filtro_datas = st.date_input("Período", value=(), key="historico_datas")
+        
+        # Datas do filtro no fuso UTC, com o último dia incluído
+        inicio_filtro = fim_filtro = None
+        if len(filtro_datas) >= 1:
+            inicio_filtro = datetime.combine(filtro_datas[0], hora.min, timezone.utc)
+            fim_filtro = datetime.combine(filtro_datas[-1], hora.min, timezone.utc) + timedelta(days=1)
+        
+        POR_PAGINA = 20
+        pagina = st.session_state.get('historico_pagina', 1)
+        planos_salvos, total_salvos = listar_historico(
+            None if filtro_etapa == "Todas" else filtro_etapa,
+            filtro_campanha.strip() or None,
+            inicio_filtro,
+            fim_filtro,
+            pagina - 1,
+            POR_PAGINA,
+        )
+        total_paginas = max(1, -(-total_salvos // POR_PAGINA))
+        st.caption(f"{total_salvos} plano(s) encontrado(s)")
+        
+        for documento in planos_salvos:
+            with st.expander(
+                f"{documento['objetivo_campanha']} — {documento['etapa_funil']} — "
+                f"{documento['criado_em']:%d/%m/%Y %H:%M} UTC"
+            ):
+                st.caption(
+                    f"Modo {documento.get('modo', '-')}, {documento.get('segundos', 0):.1f} s, "
+                    f"{documento.get('tokens_entrada', 0):,} tokens de entrada e {documento.get('tokens_saida', 0):,} de saída"
+                )
+                st.markdown(markdown_plano(documento['params'], documento['plano']))
+        
+        st.number_input("Página", min_value=1, max_value=total_paginas, key="historico_pagina")
+        if repositorio_planos.falhas:
+            st.warning(f"{repositorio_planos.falhas} plano(s) não foram salvos. Último erro: {repositorio_planos.ultimo_erro}")
+
+with tab4:
+    exibir_historico()
+
 # Rodapé
 st.markdown("---")
 st.caption("""
 Ferramenta de IA para Planejamento de Mídia - Otimize suas campanhas com alocação inteligente de budget por etapa do funil.
 """)
+
+# Painel de diagnóstico das chamadas ao modelo
+with st.sidebar.expander("🩺 Diagnóstico das chamadas"):
+    resumo_chamadas = monitor_chamadas.resumo()
+    if resumo_chamadas:
+        linhas_resumo = [
+            "| Seção | Chamadas | p50 (s) | p95 (s) | 1º token p50 (s) | Tokens entrada | Em cache | Tokens saída "
+            "| Prefixo em cache | Custo (US$) |",
+            "|---|---|---|---|---|---|---|---|---|---|",
+        ]
+        for secao, dados in resumo_chamadas.items():
+            acertos_prefixo = "-" if dados['acertos_prefixo'] is None else f"{dados['acertos_prefixo']:.0%}"
+            linhas_resumo.append(
+                f"| {secao} | {dados['chamadas']} | {dados['p50_segundos']:.1f} | {dados['p95_segundos']:.1f} "
+                f"| {dados['p50_primeiro_token']:.1f} | {dados['tokens_entrada']:,.0f} | {dados['tokens_cache']:,.0f} "
+                f"| {dados['tokens_saida']:,.0f} | {acertos_prefixo} | {dados['custo_total']:.4f} |"
+            )
+        st.markdown("\n".join(linhas_resumo))
+        estatisticas_contexto = cache_contexto.estatisticas()
+        st.caption(
+            f"Prefixo compartilhado: {estatisticas_contexto['acertos']} acertos, {estatisticas_contexto['falhas']} falhas, "
+            f"~{estatisticas_contexto['tokens_reaproveitados']:,} tokens reaproveitados, "
+            f"{estatisticas_contexto['prefixos']} prefixo(s) no cache"
+        )
+    else:
+        st.caption("Nenhuma chamada ao modelo registrada ainda.")
+    
+    resumo_planos = monitor_chamadas.resumo_planos()
+    if resumo_planos:
+        linhas_planos = [
+            "| Etapa | Modo | Planos | p50 (s) | p95 (s) | Tokens entrada | Tokens saída |",
+            "|---|---|---|---|---|---|---|",
+        ]
+        for (etapa, modo), dados in resumo_planos.items():
+            linhas_planos.append(
+                f"| {etapa} | {modo} | {dados['planos']} | {dados['p50_segundos']:.1f} | {dados['p95_segundos']:.1f} "
+                f"| {dados['tokens_entrada']:,.0f} | {dados['tokens_saida']:,.0f} |"
+            )
+        st.markdown("**Plano completo por modo de geração**")
+        st.markdown("\n".join(linhas_planos))
+        st.caption("Só planos gerados por inteiro pelo modelo, sem seções reaproveitadas nem respostas do cache")
+    
+    metricas_fila = fila_tarefas.metricas()
+    st.markdown("**Fila de geração**")
+    st.caption(
+        f"{metricas_fila['na_fila']} plano(s) na fila de {metricas_fila['usuarios_aguardando']} usuário(s) "
+        f"(maior fila por usuário: {metricas_fila['maior_fila_usuario']}), {metricas_fila['executando']} em geração; "
+        f"espera p50 {metricas_fila['espera_p50']:.1f} s, p95 {metricas_fila['espera_p95']:.1f} s; "
+        f"{metricas_fila['concluidas']} concluído(s) e {metricas_fila['falhas']} com falha neste processo"
+    )
+
+# Custo de cada execução do script (cada interação do usuário reexecuta o main.py)
+tempos_execucao = st.session_state.setdefault('tempos_execucao', [])
+tempos_execucao.append((time.perf_counter() - inicio_execucao) * 1000)
+del tempos_execucao[:-50]
+st.sidebar.caption(
+    f"Execução do script: {tempos_execucao[-1]:.0f} ms "
+    f"(mediana das últimas {len(tempos_execucao)}: {sorted(tempos_execucao)[len(tempos_execucao) // 2]:.0f} ms)"
+)
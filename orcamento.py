@@ -0,0 +1,182 @@
+from typing import Any, Dict, List
+
+import numpy as np
+
+from geografia import divisao_por_populacao
+
+PLATAFORMAS = [
+    "Meta Ads (Facebook/Instagram)", "Google Ads", "TikTok", "LinkedIn",
+    "YouTube", "Mídia Programática", "Twitter", "Pinterest",
+]
+TIPOS_CRIATIVO = ["Estático", "Vídeo", "Carrossel", "Motion", "Story", "Coleção"]
+INDICE_PLATAFORMA = {nome: i for i, nome in enumerate(PLATAFORMAS)}
+INDICE_CRIATIVO = {nome: i for i, nome in enumerate(TIPOS_CRIATIVO)}
+
+# Peso relativo de cada plataforma por etapa do funil (ordem de PLATAFORMAS)
+PESOS_PLATAFORMA_POR_ETAPA = {
+    'Topo':  np.array([1.00, 0.55, 0.70, 0.25, 0.85, 0.60, 0.25, 0.20]),
+    'Meio':  np.array([1.00, 0.80, 0.55, 0.45, 0.60, 0.35, 0.25, 0.25]),
+    'Fundo': np.array([1.00, 1.00, 0.35, 0.35, 0.25, 0.30, 0.10, 0.20]),
+}
+
+# Multiplicador de cada plataforma para cada OKR; OKRs ausentes são neutros
+AFINIDADE_OKR = {
+    'Impressões':          np.array([1.10, 0.90, 1.00, 0.70, 1.10, 1.30, 0.90, 0.90]),
+    'Alcance':             np.array([1.25, 0.80, 1.05, 0.70, 1.10, 1.15, 0.85, 0.85]),
+    'CPM':                 np.array([1.10, 0.90, 1.10, 0.50, 1.00, 1.30, 1.00, 1.00]),
+    'Frequência':          np.array([1.10, 0.90, 1.00, 0.80, 1.10, 1.20, 0.90, 0.90]),
+    'Cliques':             np.array([1.10, 1.30, 0.90, 0.90, 0.70, 0.80, 0.80, 1.00]),
+    'CTR':                 np.array([1.00, 1.30, 0.95, 0.95, 0.70, 0.70, 0.85, 1.00]),
+    'Engajamentos':        np.array([1.25, 0.60, 1.30, 1.00, 0.90, 0.50, 1.10, 1.00]),
+    'Visualizações':       np.array([1.10, 0.80, 1.25, 0.70, 1.40, 0.80, 0.90, 0.70]),
+    'ThruPlays':           np.array([1.10, 0.70, 1.10, 0.60, 1.40, 0.80, 0.80, 0.60]),
+    'Resultados':          np.array([1.15, 1.35, 0.80, 1.00, 0.60, 0.70, 0.60, 0.90]),
+    'Custo por resultado': np.array([1.10, 1.25, 0.85, 0.80, 0.70, 0.80, 0.70, 0.90]),
+}
+
+# Adequação de cada tipo de criativo a cada plataforma (linhas: PLATAFORMAS, colunas: TIPOS_CRIATIVO)
+PESOS_CRIATIVO = np.array([
+    # Estático Vídeo Carrossel Motion Story Coleção
+    [1.00, 1.20, 0.90, 0.70, 0.80, 0.60],  # Meta Ads
+    [1.00, 0.70, 0.00, 0.50, 0.00, 0.00],  # Google Ads
+    [0.00, 1.00, 0.30, 0.30, 0.40, 0.00],  # TikTok
+    [1.00, 0.60, 0.60, 0.30, 0.00, 0.00],  # LinkedIn
+    [0.00, 1.00, 0.00, 0.30, 0.20, 0.00],  # YouTube
+    [1.00, 0.60, 0.00, 0.70, 0.00, 0.00],  # Mídia Programática
+    [1.00, 0.70, 0.40, 0.40, 0.00, 0.00],  # Twitter
+    [1.00, 0.50, 0.60, 0.30, 0.30, 0.40],  # Pinterest
+])
+
+# Prioridade da localização primária quando há localização secundária: a fatia
+# do budget quando as localizações não são reconhecidas no índice geográfico e,
+# quando são, o peso que multiplica a população de cada uma
+PESO_LOCALIZACAO_PRIMARIA = 0.7
+
+
+def dividir_centavos(total: float, pesos: np.ndarray) -> np.ndarray:
+    """Divide `total` proporcionalmente a `pesos` em centavos inteiros que
+    somam exatamente o total (método dos maiores restos)"""
+    total_centavos = int(round(total * 100))
+    proporcoes = pesos.ravel() / pesos.sum()
+    brutos = proporcoes * total_centavos
+    centavos = np.floor(brutos).astype(np.int64)
+    faltantes = total_centavos - int(centavos.sum())
+    if faltantes:
+        centavos[np.argsort(brutos - centavos)[::-1][:faltantes]] += 1
+    return centavos.reshape(pesos.shape)
+
+
+def pesos_plataformas(etapa_funil: str, ferramentas: List[str], okrs: List[str]) -> np.ndarray:
+    """Peso de cada plataforma escolhida para a etapa e os OKRs selecionados"""
+    indices = [INDICE_PLATAFORMA[f] for f in ferramentas]
+    pesos = PESOS_PLATAFORMA_POR_ETAPA[etapa_funil][indices]
+    afinidades = [AFINIDADE_OKR[okr] for okr in okrs if okr in AFINIDADE_OKR]
+    if afinidades:
+        pesos = pesos * np.mean(afinidades, axis=0)[indices]
+    return pesos
+
+
+def pesos_criativos(ferramentas: List[str], tipo_criativo: List[str]) -> np.ndarray:
+    """Matriz plataforma × criativo normalizada por linha, restrita aos criativos escolhidos"""
+    pesos = PESOS_CRIATIVO[np.ix_(
+        [INDICE_PLATAFORMA[f] for f in ferramentas],
+        [INDICE_CRIATIVO[c] for c in tipo_criativo],
+    )]
+    # Plataforma sem nenhum criativo adequado entre os escolhidos: divide igualmente
+    pesos[pesos.sum(axis=1) == 0] = 1.0
+    return pesos / pesos.sum(axis=1, keepdims=True)
+
+
+def calcular_distribuicao(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Calcula a matriz plataforma × localização × criativo em centavos
+
+    O total da matriz é exatamente `params['budget']`.
+    """
+    ferramentas = [f for f in params['ferramentas'] if f in INDICE_PLATAFORMA]
+    tipo_criativo = [c for c in params['tipo_criativo'] if c in INDICE_CRIATIVO] or TIPOS_CRIATIVO[:1]
+    okrs = [k for k, v in params['metricas'].items() if v['selecionada']]
+    if not ferramentas:
+        raise ValueError("Nenhuma plataforma conhecida selecionada para a distribuição de budget")
+
+    localizacoes = [params['localizacao_primaria']]
+    pesos_geo = np.array([1.0])
+    if params.get('localizacao_secundaria'):
+        localizacoes.append(params['localizacao_secundaria'])
+        pesos_geo = np.array([PESO_LOCALIZACAO_PRIMARIA, 1 - PESO_LOCALIZACAO_PRIMARIA])
+    divisao = divisao_por_populacao(params, PESO_LOCALIZACAO_PRIMARIA)
+    if divisao:
+        pesos_geo = divisao['pesos']
+
+    # Primeiro o total de cada plataforma, depois a divisão dele por localização
+    # e criativo: o total de cada plataforma não depende das localizações nem
+    # dos criativos escolhidos
+    por_plataforma = dividir_centavos(params['budget'], pesos_plataformas(params['etapa_funil'], ferramentas, okrs))
+    centavos = np.stack([
+        dividir_centavos(int(valor) / 100, pesos_geo[:, None] * criativos[None, :])
+        for valor, criativos in zip(por_plataforma, pesos_criativos(ferramentas, tipo_criativo))
+    ])
+    # Dentro de cada grupo, a fatia de cada localidade reconhecida segue a população
+    localidades = []
+    if divisao:
+        for grupo, (valor, populacoes) in enumerate(zip(centavos.sum(axis=(0, 2)), divisao['populacoes'])):
+            fatias = dividir_centavos(int(valor) / 100, populacoes)
+            localidades += [
+                (grupo, localidade, int(populacao), int(fatia))
+                for localidade, populacao, fatia in zip(divisao['localidades'][grupo], populacoes, fatias)
+            ]
+    return {
+        'plataformas': ferramentas,
+        'localizacoes': localizacoes,
+        'localidades': localidades,
+        'criativos': tipo_criativo,
+        'centavos': centavos,
+    }
+
+
+def _linha(*colunas: str) -> str:
+    return "| " + " | ".join(colunas) + " |"
+
+
+def _percentual(parte: int, total: int) -> str:
+    return f"{100 * parte / total:.1f}%"
+
+
+def tabela_distribuicao_markdown(distribuicao: Dict[str, Any]) -> str:
+    """Tabelas Markdown por plataforma, por localização (e por localidade
+    reconhecida, se houver) e detalhada"""
+    centavos = distribuicao['centavos']
+    total = int(centavos.sum())
+    partes = ["### Divisão por Plataforma", _linha("Plataforma", "% Budget", "Valor (R$)"), _linha("---", "---", "---")]
+    for plataforma, valor in zip(distribuicao['plataformas'], centavos.sum(axis=(1, 2))):
+        partes.append(_linha(plataforma, _percentual(valor, total), f"{valor / 100:,.2f}"))
+
+    partes += ["", "### Alocação Geográfica", _linha("Localização", "% Budget", "Valor (R$)"), _linha("---", "---", "---")]
+    rotulos_geo = ["Primária", "Secundária"]
+    for rotulo, localizacao, valor in zip(rotulos_geo, distribuicao['localizacoes'], centavos.sum(axis=(0, 2))):
+        partes.append(_linha(f"{rotulo} ({localizacao})", _percentual(valor, total), f"{valor / 100:,.2f}"))
+
+    if distribuicao['localidades']:
+        partes += [
+            "", "### Alocação por Localização",
+            _linha("Localização", "Grupo", "População", "% Budget", "Valor (R$)"),
+            _linha("---", "---", "---", "---", "---"),
+        ]
+        for grupo, localidade, populacao, valor in distribuicao['localidades']:
+            partes.append(_linha(
+                localidade.rotulo, rotulos_geo[grupo], f"{populacao:,}", _percentual(valor, total), f"{valor / 100:,.2f}"
+            ))
+
+    partes += [
+        "", "### Distribuição Detalhada",
+        _linha("Plataforma", "Localização", "Tipo de Criativo", "% Budget", "Valor (R$)"),
+        _linha("---", "---", "---", "---", "---"),
+    ]
+    for i, plataforma in enumerate(distribuicao['plataformas']):
+        for j, rotulo in enumerate(rotulos_geo[:len(distribuicao['localizacoes'])]):
+            for k, criativo in enumerate(distribuicao['criativos']):
+                valor = int(centavos[i, j, k])
+                if valor:
+                    partes.append(_linha(plataforma, rotulo, criativo, _percentual(valor, total), f"{valor / 100:,.2f}"))
+
+    partes.append(_linha("**Total**", "", "", "**100%**", f"**{total / 100:,.2f}**"))
+    return "\n".join(partes)
@@ -0,0 +1,143 @@
+import queue
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Uma seção do plano: função geradora e as seções das quais ela depende.
+# A função é chamada como funcao(params, *resultados_das_dependencias).
+Secao = Tuple[Callable[..., Any], Sequence[str]]
+
+
+class ErroSecoes(Exception):
+    """Uma ou mais seções falharam; as demais foram geradas normalmente.
+
+    `resultados` tem as seções concluídas, `erros` a exceção de cada seção que
+    falhou e `ignoradas` as seções não executadas por dependerem delas.
+    """
+
+    def __init__(self, resultados: Dict[str, Any], erros: Dict[str, BaseException], ignoradas: List[str]):
+        self.resultados = resultados
+        self.erros = erros
+        self.ignoradas = ignoradas
+        detalhes = "; ".join(f"{nome}: {type(erro).__name__}: {erro}" for nome, erro in erros.items())
+        super().__init__(f"Falha ao gerar {len(erros)} seção(ões) ({detalhes})")
+
+
+def validar_grafo(secoes: Dict[str, Secao]) -> None:
+    """Garante que todas as dependências existem e que não há ciclos"""
+    visitando, visitadas = set(), set()
+
+    def visitar(nome: str) -> None:
+        if nome in visitadas:
+            return
+        if nome in visitando:
+            raise ValueError(f"Dependência circular envolvendo a seção '{nome}'")
+        visitando.add(nome)
+        for dependencia in secoes[nome][1]:
+            if dependencia not in secoes:
+                raise ValueError(f"Seção '{nome}' depende de '{dependencia}', que não existe")
+            visitar(dependencia)
+        visitando.discard(nome)
+        visitadas.add(nome)
+
+    for nome in secoes:
+        visitar(nome)
+
+
+def executar_grafo(
+    secoes: Dict[str, Secao],
+    params: Dict[str, Any],
+    max_concorrencia: int = 3,
+    ao_concluir: Optional[Callable[[str, Any], None]] = None,
+    ao_fragmento: Optional[Callable[[str, str], None]] = None,
+    resultados_existentes: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Executa as seções respeitando as dependências, com no máximo
+    `max_concorrencia` chamadas simultâneas.
+
+    Cada seção é disparada assim que todas as suas dependências terminam.
+    `ao_concluir(nome, resultado)` é chamado na thread de quem executa o grafo
+    (a thread do script Streamlit), então pode escrever em `st.session_state`.
+
+    Se `ao_fragmento` for informado, as funções recebem o argumento nomeado
+    `ao_fragmento` para publicar o texto parcial da seção; os fragmentos são
+    repassados como `ao_fragmento(nome, texto_parcial)`, também na thread de
+    quem executa o grafo.
+
+    Seções presentes em `resultados_existentes` não são geradas de novo. Se
+    alguma seção falhar, as independentes dela continuam sendo geradas e, no
+    fim, é levantado ErroSecoes com os resultados parciais.
+    """
+    validar_grafo(secoes)
+    resultados: Dict[str, Any] = {
+        nome: texto for nome, texto in (resultados_existentes or {}).items() if nome in secoes
+    }
+    erros: Dict[str, BaseException] = {}
+    ignoradas: List[str] = []
+    pendentes = {nome: secao for nome, secao in secoes.items() if nome not in resultados}
+    em_execucao: Dict[Future, str] = {}
+    fragmentos: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+
+    def publicar_fragmentos() -> None:
+        # Só o texto parcial mais recente de cada seção precisa ser exibido
+        ultimos: Dict[str, str] = {}
+        while True:
+            try:
+                nome, texto = fragmentos.get_nowait()
+            except queue.Empty:
+                break
+            if nome not in resultados:
+                ultimos[nome] = texto
+        for nome, texto in ultimos.items():
+            ao_fragmento(nome, texto)
+
+    def disparar(executor: ThreadPoolExecutor, nome: str, funcao: Callable[..., Any], argumentos: list) -> Future:
+        if ao_fragmento is None:
+            return executor.submit(funcao, params, *argumentos)
+        return executor.submit(
+            funcao, params, *argumentos,
+            ao_fragmento=lambda texto: fragmentos.put((nome, texto)),
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concorrencia)) as executor:
+        try:
+            while pendentes or em_execucao:
+                # Seções que dependem de uma seção com falha não são executadas
+                for nome in [n for n, (_, deps) in pendentes.items() if any(d in erros or d in ignoradas for d in deps)]:
+                    pendentes.pop(nome)
+                    ignoradas.append(nome)
+
+                prontas = [
+                    nome for nome, (_, dependencias) in pendentes.items()
+                    if all(d in resultados for d in dependencias)
+                ]
+                for nome in prontas:
+                    funcao, dependencias = pendentes.pop(nome)
+                    argumentos = [resultados[d] for d in dependencias]
+                    em_execucao[disparar(executor, nome, funcao, argumentos)] = nome
+
+                if not em_execucao:
+                    continue
+                if ao_fragmento is None:
+                    concluidas, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+                else:
+                    concluidas = set()
+                    while not concluidas:
+                        concluidas, _ = wait(em_execucao, timeout=0.1, return_when=FIRST_COMPLETED)
+                        publicar_fragmentos()
+                for futuro in concluidas:
+                    nome = em_execucao.pop(futuro)
+                    try:
+                        resultados[nome] = futuro.result()
+                    except Exception as erro:
+                        erros[nome] = erro
+                        continue
+                    if ao_concluir:
+                        ao_concluir(nome, resultados[nome])
+        except BaseException:
+            for futuro in em_execucao:
+                futuro.cancel()
+            raise
+
+    if erros:
+        raise ErroSecoes(resultados, erros, ignoradas)
+    return resultados
@@ -0,0 +1,112 @@
+import csv
+import os
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import numpy as np
+
+from orcamento import calcular_distribuicao
+
+CAMINHO_BENCHMARKS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados", "benchmarks.csv")
+
+MESES_POR_PERIODO = {"1 mês": 1, "2 meses": 2, "3 meses": 3, "6 meses": 6, "1 ano": 12}
+
+PERCENTIS = (10, 50, 90)
+
+COLUNAS_BENCHMARK = [
+    'cpm', 'cpm_sigma', 'ctr', 'ctr_sigma', 'cvr', 'cvr_sigma',
+    'engajamento', 'visualizacao', 'thruplay', 'frequencia', 'taxas_sigma',
+]
+
+
+@lru_cache(maxsize=None)
+def carregar_benchmarks() -> Dict[str, Dict[str, np.ndarray]]:
+    """Lê a tabela de benchmarks: {etapa: {plataforma: vetor na ordem de COLUNAS_BENCHMARK}}"""
+    benchmarks: Dict[str, Dict[str, np.ndarray]] = {}
+    with open(CAMINHO_BENCHMARKS, encoding="utf-8") as arquivo:
+        for linha in csv.DictReader(arquivo):
+            benchmarks.setdefault(linha['etapa'], {})[linha['plataforma']] = np.array(
+                [float(linha[coluna]) for coluna in COLUNAS_BENCHMARK]
+            )
+    return benchmarks
+
+
+def _lognormal(rng: np.random.Generator, mediana: np.ndarray, sigma: np.ndarray, n_amostras: int) -> np.ndarray:
+    # Uma linha por plataforma, uma coluna por amostra
+    return mediana[:, None] * np.exp(sigma[:, None] * rng.standard_normal((len(mediana), n_amostras)))
+
+
+def simular_resultados(params: Dict[str, Any], n_amostras: int = 100_000, semente: int = 0) -> Dict[str, np.ndarray]:
+    """Amostra as métricas da campanha inteira via Monte Carlo
+
+    Retorna um vetor de `n_amostras` valores para cada métrica suportada.
+    """
+    distribuicao = calcular_distribuicao(params)
+    custos = distribuicao['centavos'].sum(axis=(1, 2)) / 100
+    benchmarks = carregar_benchmarks()[params['etapa_funil']]
+    b = np.array([benchmarks[p] for p in distribuicao['plataformas']]).T
+    cpm, cpm_sigma, ctr, ctr_sigma, cvr, cvr_sigma, engajamento, visualizacao, thruplay, frequencia, taxas_sigma = b
+    meses = MESES_POR_PERIODO.get(params['periodo'], 1)
+
+    rng = np.random.default_rng(semente)
+    impressoes = custos[:, None] / _lognormal(rng, cpm, cpm_sigma, n_amostras) * 1000
+    cliques = impressoes * np.minimum(_lognormal(rng, ctr, ctr_sigma, n_amostras), 1)
+    resultados = cliques * np.minimum(_lognormal(rng, cvr, cvr_sigma, n_amostras), 1)
+    # A frequência cresce com a duração da campanha, mas de forma decrescente
+    frequencias = np.maximum(_lognormal(rng, frequencia * np.sqrt(meses), taxas_sigma, n_amostras), 1)
+    visualizacoes = impressoes * np.minimum(_lognormal(rng, visualizacao, taxas_sigma, n_amostras), 1)
+
+    total_impressoes = impressoes.sum(axis=0)
+    total_cliques = cliques.sum(axis=0)
+    total_resultados = resultados.sum(axis=0)
+    alcance = (impressoes / frequencias).sum(axis=0)
+    custo = np.full(n_amostras, custos.sum())
+    return {
+        'Impressões': total_impressoes,
+        'Alcance': alcance,
+        'Custo': custo,
+        'CPM': custo / total_impressoes * 1000,
+        'Cliques': total_cliques,
+        'CTR': total_cliques / total_impressoes,
+        'Engajamentos': (impressoes * engajamento[:, None]).sum(axis=0),
+        'Frequência': total_impressoes / alcance,
+        'Visualizações': visualizacoes.sum(axis=0),
+        'ThruPlays': (visualizacoes * thruplay[:, None]).sum(axis=0),
+        'Resultados': total_resultados,
+        'Custo por resultado': custo / np.maximum(total_resultados, 1),
+    }
+
+
+def prever_resultados(params: Dict[str, Any], metricas: List[str], n_amostras: int = 100_000, semente: int = 0):
+    """DataFrame com P10/P50/P90 de cada métrica pedida"""
+    import pandas as pd
+
+    amostras = simular_resultados(params, n_amostras, semente)
+    metricas = [m for m in metricas if m in amostras]
+    percentis = np.percentile(np.stack([amostras[m] for m in metricas]), PERCENTIS, axis=1).T
+    return pd.DataFrame(percentis, index=pd.Index(metricas, name="Métrica"), columns=[f"P{p}" for p in PERCENTIS])
+
+
+def formatar_metrica(metrica: str, valor: float) -> str:
+    """Formata o valor no padrão usado nas tabelas do plano"""
+    if metrica in ('Custo', 'CPM', 'Custo por resultado'):
+        return f"R$ {valor:,.2f}"
+    if metrica == 'CTR':
+        return f"{valor:.2%}"
+    if metrica == 'Frequência':
+        return f"{valor:.2f}"
+    return f"{valor:,.0f}"
+
+
+def tabela_previsao_markdown(previsao) -> str:
+    """Tabela Markdown com a faixa pessimista/provável/otimista de cada métrica"""
+    linhas = [
+        "| Métrica | Pessimista (P10) | Provável (P50) | Otimista (P90) |",
+        "| --- | --- | --- | --- |",
+    ]
+    for metrica, valores in previsao.iterrows():
+        # Para métricas de custo, o cenário pessimista é o de valor mais alto
+        if metrica in ('CPM', 'Custo por resultado'):
+            valores = valores.iloc[::-1]
+        linhas.append(f"| {metrica} | " + " | ".join(formatar_metrica(metrica, v) for v in valores) + " |")
+    return "\n".join(linhas)
@@ -0,0 +1,249 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from instrumentacao import percentil
+
+
+@dataclass
+class UsoTokens:
+    """Mesmos nomes do `usage_metadata` do Gemini"""
+    prompt_token_count: int = 0
+    candidates_token_count: int = 0
+    cached_content_token_count: int = 0
+
+
+@dataclass
+class RespostaModelo:
+    """Resposta (ou fragmento, em streaming) no formato usado pelo GeradorPlano,
+    com o nome do `modelo` que efetivamente respondeu"""
+    text: str
+    usage_metadata: Optional[UsoTokens] = None
+    modelo: str = ""
+
+
+class ModeloOpenAI:
+    """Modelo da API da OpenAI (ou compatível) com a interface do Gemini:
+    `model_name` e `generate_content(prompt, stream=False, generation_config=None)`.
+
+    Sem `cliente`, usa OPENAI_API_KEY e OPENAI_BASE_URL, o que permite apontar
+    para servidores locais de teste.
+    """
+
+    def __init__(self, modelo: str, cliente: Any = None):
+        if cliente is None:
+            from openai import OpenAI
+            cliente = OpenAI()
+        self.cliente = cliente
+        self.model_name = modelo
+
+    def _uso(self, usage: Any) -> Optional[UsoTokens]:
+        if usage is None:
+            return None
+        # Tokens do início do prompt reaproveitados pelo cache automático de prefixos da OpenAI
+        detalhes = getattr(usage, 'prompt_tokens_details', None)
+        return UsoTokens(usage.prompt_tokens or 0, usage.completion_tokens or 0, getattr(detalhes, 'cached_tokens', 0) or 0)
+
+    def generate_content(self, prompt: str, stream: bool = False, generation_config: Optional[Dict[str, Any]] = None):
+        argumentos: Dict[str, Any] = {}
+        if (generation_config or {}).get('response_mime_type') == "application/json":
+            argumentos['response_format'] = {'type': "json_object"}
+        mensagens = [{'role': "user", 'content': prompt}]
+        if not stream:
+            resposta = self.cliente.chat.completions.create(model=self.model_name, messages=mensagens, **argumentos)
+            return RespostaModelo(resposta.choices[0].message.content or "", self._uso(resposta.usage), self.model_name)
+        return self._fragmentos(mensagens, argumentos)
+
+    def _fragmentos(self, mensagens: List[Dict[str, str]], argumentos: Dict[str, Any]) -> Iterator[RespostaModelo]:
+        resposta = self.cliente.chat.completions.create(
+            model=self.model_name, messages=mensagens, stream=True, stream_options={'include_usage': True}, **argumentos
+        )
+        try:
+            for chunk in resposta:
+                texto = chunk.choices[0].delta.content if chunk.choices else None
+                yield RespostaModelo(texto or "", self._uso(chunk.usage), self.model_name)
+        finally:
+            resposta.close()
+
+
+def criar_modelo(especificacao: str, generation_config: Optional[Dict[str, Any]] = None) -> Any:
+    """Cria o modelo descrito como "provedor:modelo" (ex.: "gemini:gemini-1.5-flash",
+    "openai:gpt-4o-mini")"""
+    provedor, _, nome = especificacao.partition(":")
+    if provedor == "gemini":
+        # Importado só quando necessário: a biblioteca é pesada
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.getenv("GEM_API_KEY"))
+        return genai.GenerativeModel(nome, generation_config=generation_config or {})
+    if provedor == "openai":
+        return ModeloOpenAI(nome)
+    raise ValueError(f"Provedor de modelo desconhecido: {especificacao}")
+
+
+class ModeloComHedge:
+    """Hedged requests entre dois modelos com a interface do Gemini.
+
+    A chamada vai ao `primario`; se ele não responder até o percentil
+    `percentil` das suas latências recentes (ou `atraso_inicial` segundos,
+    enquanto houver menos de `minimo_amostras`), ou se falhar antes disso, a
+    mesma chamada é feita ao `secundario` e vale a primeira resposta. Em
+    streaming, o prazo vale para o primeiro fragmento e o stream perdedor é
+    interrompido; fora dele, a resposta perdedora é descartada (a chamada
+    HTTP já em andamento não tem como ser cancelada).
+    """
+
+    def __init__(self, primario: Any, secundario: Any, percentil: float = 95.0, atraso_inicial: float = 8.0,
+                 minimo_amostras: int = 20, max_amostras: int = 200):
+        self.primario = primario
+        self.secundario = secundario
+        self.model_name = primario.model_name
+        self.percentil = percentil
+        self.atraso_inicial = atraso_inicial
+        self.minimo_amostras = minimo_amostras
+        # Latência completa (sem streaming) e até o primeiro fragmento (streaming)
+        self._latencias = {False: deque(maxlen=max_amostras), True: deque(maxlen=max_amostras)}
+        self.disparos_secundario = 0
+        self.vitorias_secundario = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+    def prazo(self, stream: bool = False) -> float:
+        """Segundos de espera pelo primário antes de disparar o secundário"""
+        with self._lock:
+            amostras = list(self._latencias[stream])
+        if len(amostras) < self.minimo_amostras:
+            return self.atraso_inicial
+        return percentil(amostras, self.percentil)
+
+    def _registrar_latencia(self, stream: bool, segundos: float) -> None:
+        with self._lock:
+            self._latencias[stream].append(segundos)
+
+    def _disparou_secundario(self) -> None:
+        with self._lock:
+            self.disparos_secundario += 1
+
+    def _venceu_secundario(self) -> None:
+        with self._lock:
+            self.vitorias_secundario += 1
+
+    def generate_content(self, prompt: str, stream: bool = False, **argumentos: Any):
+        if stream:
+            return self._gerar_streaming(prompt, argumentos)
+        return self._gerar(prompt, argumentos)
+
+    @staticmethod
+    def _identificar(resposta: Any, modelo: Any) -> Any:
+        # Respostas do Gemini não dizem o modelo; sem ele, o GeradorPlano
+        # guardaria a resposta do secundário no cache do primário
+        if getattr(resposta, 'modelo', None):
+            return resposta
+        return RespostaModelo(resposta.text, getattr(resposta, 'usage_metadata', None), modelo.model_name)
+
+    def _gerar(self, prompt: str, argumentos: Dict[str, Any]) -> Any:
+        inicio = time.monotonic()
+        primario = self._executor.submit(self.primario.generate_content, prompt, **argumentos)
+
+        def registrar(futuro: Future) -> None:
+            if not futuro.cancelled() and futuro.exception() is None:
+                self._registrar_latencia(False, time.monotonic() - inicio)
+
+        # A latência do primário conta mesmo quando ele perde, para o percentil não ficar otimista
+        primario.add_done_callback(registrar)
+        futuros: Dict[Future, Any] = {primario: self.primario}
+        wait([primario], timeout=self.prazo(False))
+        if not primario.done() or primario.exception() is not None:
+            self._disparou_secundario()
+            futuros[self._executor.submit(self.secundario.generate_content, prompt, **argumentos)] = self.secundario
+
+        erros: List[BaseException] = []
+        pendentes = set(futuros)
+        while pendentes:
+            concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                if futuro.exception() is not None:
+                    erros.append(futuro.exception())
+                    continue
+                for perdedor in pendentes:
+                    perdedor.cancel()
+                if futuros[futuro] is self.secundario:
+                    self._venceu_secundario()
+                return self._identificar(futuro.result(), futuros[futuro])
+        raise erros[0]
+
+    def _gerar_streaming(self, prompt: str, argumentos: Dict[str, Any]) -> Iterator[Any]:
+        modelos = [self.primario, self.secundario]
+        eventos: "queue.Queue[tuple]" = queue.Queue()
+        cancelados = [threading.Event(), threading.Event()]
+        inicio = time.monotonic()
+
+        def consumir(indice: int) -> None:
+            try:
+                fragmentos = modelos[indice].generate_content(prompt, stream=True, **argumentos)
+                try:
+                    for fragmento in fragmentos:
+                        if cancelados[indice].is_set():
+                            break
+                        eventos.put((indice, 'fragmento', fragmento))
+                finally:
+                    fechar = getattr(fragmentos, 'close', None)
+                    if fechar:
+                        fechar()
+                eventos.put((indice, 'fim', None))
+            except Exception as erro:
+                eventos.put((indice, 'erro', erro))
+
+        def disparar(indice: int) -> None:
+            if indice == 1:
+                self._disparou_secundario()
+            threading.Thread(target=consumir, args=(indice,), daemon=True).start()
+
+        disparar(0)
+        disparados, ativos, erros = 1, {0}, {}
+        vencedor: Optional[int] = None
+        limite = inicio + self.prazo(True)
+        try:
+            while True:
+                espera = None if vencedor is not None or disparados == 2 else max(0.0, limite - time.monotonic())
+                try:
+                    indice, tipo, valor = eventos.get(timeout=espera)
+                except queue.Empty:
+                    disparar(1)
+                    disparados, ativos = 2, ativos | {1}
+                    continue
+
+                if vencedor is None:
+                    if tipo == 'erro':
+                        erros[indice] = valor
+                        ativos.discard(indice)
+                        if disparados == 1:
+                            disparar(1)
+                            disparados, ativos = 2, ativos | {1}
+                        elif not ativos:
+                            raise erros.get(0, valor)
+                        continue
+                    # O primeiro modelo a produzir um fragmento (ou terminar) vence
+                    vencedor = indice
+                    cancelados[1 - indice].set()
+                    # Se o primário perdeu, sua latência é pelo menos a do secundário
+                    self._registrar_latencia(True, time.monotonic() - inicio)
+                    if indice == 1:
+                        self._venceu_secundario()
+
+                if indice != vencedor:
+                    continue
+                if tipo == 'fragmento':
+                    yield self._identificar(valor, modelos[indice])
+                elif tipo == 'fim':
+                    return
+                else:
+                    raise valor
+        finally:
+            for cancelado in cancelados:
+                cancelado.set()
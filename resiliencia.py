@@ -0,0 +1,137 @@
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Erros da API que indicam sobrecarga ou indisponibilidade temporária
+CODIGOS_REPETIVEIS = {408, 429, 500, 502, 503, 504}
+ERROS_REPETIVEIS = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'DeadlineExceeded',
+    'InternalServerError', 'GatewayTimeout', 'BadGateway', 'RateLimitError',
+    'APITimeoutError', 'APIConnectionError',
+}
+
+
+class CircuitoAberto(Exception):
+    """O modelo falhou repetidamente e as chamadas estão suspensas temporariamente"""
+
+
+def erro_repetivel(erro: BaseException) -> bool:
+    """Indica se vale a pena repetir a chamada que gerou o erro"""
+    if isinstance(erro, (ConnectionError, TimeoutError)):
+        return True
+    codigo = getattr(erro, 'code', None) or getattr(erro, 'status_code', None)
+    return codigo in CODIGOS_REPETIVEIS or type(erro).__name__ in ERROS_REPETIVEIS
+
+
+class LimitadorTaxa:
+    """Token bucket: até `capacidade` chamadas em rajada e `por_segundo` em regime"""
+
+    def __init__(self, por_segundo: float, capacidade: int):
+        self.por_segundo = por_segundo
+        self.capacidade = capacidade
+        self._fichas = float(capacidade)
+        self._atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self) -> float:
+        """Bloqueia até haver uma ficha disponível; retorna o tempo esperado"""
+        inicio = time.monotonic()
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(self.capacidade, self._fichas + (agora - self._atualizado) * self.por_segundo)
+                self._atualizado = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return agora - inicio
+                espera = (1 - self._fichas) / self.por_segundo
+            time.sleep(espera)
+
+
+class Disjuntor:
+    """Circuit breaker: abre após `limite_falhas` falhas seguidas e só deixa
+    uma chamada de teste passar depois de `segundos_aberto`"""
+
+    def __init__(self, limite_falhas: int = 5, segundos_aberto: float = 30):
+        self.limite_falhas = limite_falhas
+        self.segundos_aberto = segundos_aberto
+        self.estado = 'fechado'
+        self._falhas = 0
+        self._aberto_em = 0.0
+        self._lock = threading.Lock()
+
+    def permitir(self) -> None:
+        """Levanta CircuitoAberto se a chamada não deve ser feita agora"""
+        with self._lock:
+            if self.estado == 'fechado':
+                return
+            restante = self.segundos_aberto - (time.monotonic() - self._aberto_em)
+            if self.estado == 'aberto' and restante <= 0:
+                self.estado = 'meio_aberto'
+                return
+            raise CircuitoAberto(
+                f"Modelo indisponível após {self._falhas} falhas seguidas; "
+                f"nova tentativa em {max(restante, 0):.0f} s"
+            )
+
+    def registrar_sucesso(self) -> None:
+        with self._lock:
+            self.estado = 'fechado'
+            self._falhas = 0
+
+    def registrar_falha(self) -> None:
+        with self._lock:
+            self._falhas += 1
+            if self.estado == 'meio_aberto' or self._falhas >= self.limite_falhas:
+                self.estado = 'aberto'
+                self._aberto_em = time.monotonic()
+
+
+class PoliticaResiliencia:
+    """Limite de taxa, repetição com backoff exponencial e circuit breaker
+    compartilhados por todas as chamadas ao modelo do processo"""
+
+    def __init__(
+        self,
+        limitador: Optional[LimitadorTaxa] = None,
+        disjuntor: Optional[Disjuntor] = None,
+        tentativas: int = 4,
+        espera_base: float = 1.0,
+        espera_maxima: float = 30.0,
+    ):
+        self.limitador = limitador
+        self.disjuntor = disjuntor
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+
+    def executar(self, funcao: Callable[[], T]) -> T:
+        """Chama `funcao`, repetindo em erros temporários com espera
+        exponencial e jitter ("full jitter")"""
+        for tentativa in range(self.tentativas):
+            if self.disjuntor:
+                self.disjuntor.permitir()
+            if self.limitador:
+                self.limitador.adquirir()
+            try:
+                resultado = funcao()
+            except Exception as erro:
+                if not erro_repetivel(erro):
+                    # O modelo respondeu (erro de requisição ou de conteúdo): não conta
+                    # para abrir o circuito, mas encerra a chamada de teste se houver
+                    if self.disjuntor:
+                        self.disjuntor.registrar_sucesso()
+                    raise
+                if self.disjuntor:
+                    self.disjuntor.registrar_falha()
+                if tentativa == self.tentativas - 1:
+                    raise
+                time.sleep(random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa)))
+            else:
+                if self.disjuntor:
+                    self.disjuntor.registrar_sucesso()
+                return resultado
+        raise RuntimeError("tentativas deve ser maior que zero")
@@ -0,0 +1,147 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Dimensão dos vetores de atributos (feature hashing)
+DIMENSOES = 1024
+
+# Peso de cada grupo de atributos no vetor da campanha
+PESOS_ATRIBUTOS = {
+    'etapa_funil': 3.0,
+    'tipo_campanha': 1.0,
+    'periodo': 0.5,
+    'tipo_publico': 0.5,
+    'ferramentas': 1.5,
+    'localizacao_primaria': 1.0,
+    'localizacao_secundaria': 0.5,
+    'tipo_criativo': 1.0,
+    'okrs': 1.0,
+    'budget': 1.5,
+    'texto': 1.5,
+}
+
+# Budgets que diferem por menos de ~10% caem na mesma faixa ou em faixas vizinhas
+RAZAO_FAIXA_BUDGET = 1.1
+
+# Similaridade (cosseno) mínima para sugerir um plano
+SIMILARIDADE_MINIMA = 0.6
+
+
+def _lista(valor: Any) -> List[str]:
+    if isinstance(valor, str):
+        valor = valor.split(",")
+    return [str(item).strip().lower() for item in valor or [] if str(item).strip()]
+
+
+def _acumular(vetor: np.ndarray, atributo: str, valores: List[str], peso: float) -> None:
+    # Cada grupo contribui com o mesmo peso total, qualquer que seja o número de valores
+    if not valores:
+        return
+    peso_valor = peso / math.sqrt(len(valores))
+    for valor in valores:
+        hash_valor = zlib.crc32(f"{atributo}={valor}".encode("utf-8"))
+        sinal = 1.0 if hash_valor & 0x80000000 else -1.0
+        vetor[hash_valor % DIMENSOES] += sinal * peso_valor
+
+
+def vetor_campanha(params: Dict[str, Any]) -> np.ndarray:
+    """Vetor normalizado dos parâmetros da campanha, para similaridade por cosseno"""
+    vetor = np.zeros(DIMENSOES, dtype=np.float32)
+    for campo in ('etapa_funil', 'tipo_campanha', 'periodo', 'tipo_publico'):
+        _acumular(vetor, campo, _lista([params.get(campo) or ""]), PESOS_ATRIBUTOS[campo])
+    for campo in ('ferramentas', 'localizacao_primaria', 'localizacao_secundaria', 'tipo_criativo'):
+        _acumular(vetor, campo, _lista(params.get(campo)), PESOS_ATRIBUTOS[campo])
+
+    okrs = [k.lower() for k, v in (params.get('metricas') or {}).items() if v.get('selecionada')]
+    _acumular(vetor, 'okrs', okrs, PESOS_ATRIBUTOS['okrs'])
+
+    # A faixa vizinha entra com metade do peso para suavizar as bordas das faixas
+    faixa = math.floor(math.log(max(float(params.get('budget') or 1), 1)) / math.log(RAZAO_FAIXA_BUDGET))
+    _acumular(vetor, 'budget', [str(faixa)], PESOS_ATRIBUTOS['budget'])
+    _acumular(vetor, 'budget', [str(faixa - 1), str(faixa + 1)], PESOS_ATRIBUTOS['budget'] / 2)
+
+    texto = f"{params.get('objetivo_campanha') or ''} {params.get('detalhes_acao') or ''}".lower()
+    _acumular(vetor, 'texto', re.findall(r"\w{3,}", texto), PESOS_ATRIBUTOS['texto'])
+
+    norma = np.linalg.norm(vetor)
+    return vetor / norma if norma else vetor
+
+
+class IndicePlanos:
+    """Índice de similaridade dos planos já gerados, gravado em um JSONL
+    (um plano por linha) e atualizado a cada novo plano.
+
+    Em memória ficam só a matriz de vetores e a posição de cada plano no
+    arquivo; o plano é lido do disco apenas quando escolhido.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._vetores = np.zeros((0, DIMENSOES), dtype=np.float32)
+        self._posicoes: List[int] = []
+        self._lock = threading.Lock()
+
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        if os.path.exists(caminho):
+            vetores = []
+            with open(caminho, "rb") as arquivo:
+                posicao = 0
+                for linha in arquivo:
+                    if linha.strip():
+                        vetores.append(vetor_campanha(json.loads(linha)['params']))
+                        self._posicoes.append(posicao)
+                    posicao += len(linha)
+            if vetores:
+                self._vetores = np.stack(vetores)
+
+    def __len__(self) -> int:
+        return len(self._posicoes)
+
+    def adicionar(self, params: Dict[str, Any], plano: Dict[str, str]) -> None:
+        """Grava o plano e o inclui no índice"""
+        linha = json.dumps({'params': params, 'plano': plano, 'instante': time.time()}, ensure_ascii=False) + "\n"
+        vetor = vetor_campanha(params)
+        with self._lock:
+            with open(self.caminho, "ab") as arquivo:
+                posicao = arquivo.tell()
+                arquivo.write(linha.encode("utf-8"))
+            # Capacidade dobra quando a matriz enche, para a inclusão ser O(1) amortizado
+            if len(self._posicoes) == len(self._vetores):
+                maior = np.zeros((max(2 * len(self._vetores), 64), DIMENSOES), dtype=np.float32)
+                maior[:len(self._vetores)] = self._vetores
+                self._vetores = maior
+            self._vetores[len(self._posicoes)] = vetor
+            self._posicoes.append(posicao)
+
+    def buscar(self, params: Dict[str, Any], k: int = 3,
+               minimo: float = SIMILARIDADE_MINIMA) -> List[Tuple[float, int]]:
+        """(similaridade, id) dos `k` planos mais parecidos com `params`"""
+        vetor = vetor_campanha(params)
+        with self._lock:
+            similaridades = self._vetores[:len(self._posicoes)] @ vetor
+        if not len(similaridades):
+            return []
+        k = min(k, len(similaridades))
+        melhores = np.argpartition(-similaridades, k - 1)[:k]
+        melhores = melhores[np.argsort(-similaridades[melhores])]
+        return [(float(similaridades[i]), int(i)) for i in melhores if similaridades[i] >= minimo]
+
+    def obter(self, id_plano: int) -> Dict[str, Any]:
+        """Registro gravado do plano: params, plano e instante"""
+        with open(self.caminho, "rb") as arquivo:
+            arquivo.seek(self._posicoes[id_plano])
+            return json.loads(arquivo.readline())
+
+
+def criar_indice_planos(caminho: Optional[str] = None) -> IndicePlanos:
+    """Índice configurado pela variável de ambiente INDICE_PLANOS_PATH"""
+    return IndicePlanos(caminho or os.getenv("INDICE_PLANOS_PATH", ".cache/planos.jsonl"))
@@ -0,0 +1,221 @@
+import io
+import re
+import zipfile
+from typing import Any, Dict, List, Optional, Tuple
+
+# Tabela extraída do Markdown: (título, colunas, linhas com as células em texto)
+TabelaMarkdown = Tuple[str, List[str], List[List[str]]]
+
+# Seções cujas tabelas de budget devem somar 100% / params['budget']
+SECOES_ALOCACAO = ('distribuicao_budget', 'cronograma')
+
+# Diferença aceita na soma dos percentuais (1 p.p., ou o arredondamento de 0,05 p.p.
+# por linha se for maior) e dos valores (0,5% do budget, mínimo R$ 1)
+TOLERANCIA_PERCENTUAL = 0.01
+TOLERANCIA_ARREDONDAMENTO = 0.0005
+TOLERANCIA_VALOR = 0.005
+
+FORMATOS_EXPORTACAO = {
+    'csv': ("zip", "application/zip"),
+    'xlsx': ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'parquet': ("zip", "application/zip"),
+}
+
+
+def _celulas(linha: str) -> List[str]:
+    return [celula.strip().replace("**", "") for celula in linha.strip().strip("|").split("|")]
+
+
+def extrair_tabelas(texto: str) -> List[TabelaMarkdown]:
+    """Tabelas Markdown do texto, com o header mais próximo acima de cada uma como título"""
+    tabelas: List[TabelaMarkdown] = []
+    linhas = texto.splitlines()
+    titulo, i = "", 0
+    while i < len(linhas):
+        linha = linhas[i].strip()
+        if linha.startswith("#"):
+            titulo = linha.lstrip("#").strip()
+        separador = linhas[i + 1].strip() if i + 1 < len(linhas) else ""
+        if linha.startswith("|") and re.fullmatch(r"\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?", separador):
+            colunas = _celulas(linha)
+            corpo, i = [], i + 2
+            while i < len(linhas) and linhas[i].strip().startswith("|"):
+                celulas = _celulas(linhas[i])
+                corpo.append((celulas + [""] * len(colunas))[:len(colunas)])
+                i += 1
+            tabelas.append((titulo or f"Tabela {len(tabelas) + 1}", colunas, corpo))
+            continue
+        i += 1
+    return tabelas
+
+
+def _numero(texto: str) -> float:
+    # Aceita "1.234,56" (pt-BR) e "1,234.56", com os milhares agrupados de três
+    # em três; com um só separador e sem agrupamento ("1,5", "0,123"), ele é o decimal
+    sinal = -1.0 if texto.startswith("-") else 1.0
+    if texto[:1] in ("-", "+"):
+        texto = texto[1:]
+    for milhar, decimal in ((".", ","), (",", ".")):
+        if re.fullmatch(rf"[1-9]\d{{0,2}}(\{milhar}\d{{3}})+(\{decimal}\d+)?", texto):
+            return sinal * float(texto.replace(milhar, "").replace(decimal, "."))
+    if re.fullmatch(r"\d+([.,]\d+)?", texto):
+        return sinal * float(texto.replace(",", "."))
+    raise ValueError(f"Número mal formado: {texto}")
+
+
+def converter_valor(celula: str) -> Optional[float]:
+    """Número da célula ("R$ 1.234,56", "45,5%", "2.000.000"), com percentuais
+    como fração (45,5% -> 0.455); None se a célula não for numérica"""
+    texto = re.sub(r"\s+|R\$|US\$", "", celula.replace("**", ""))
+    percentual = texto.endswith("%")
+    texto = texto.rstrip("%")
+    if not re.fullmatch(r"[-+]?\d[\d.,]*", texto):
+        return None
+    try:
+        valor = _numero(texto)
+    except ValueError:
+        return None
+    return valor / 100 if percentual else valor
+
+
+def _linha_total(linha: List[str]) -> bool:
+    return linha[0].strip().lower().startswith("total")
+
+
+def _coluna_numerica(linhas: List[List[str]], indice: int) -> Optional[List[float]]:
+    valores = [converter_valor(linha[indice]) for linha in linhas if linha[indice].strip()]
+    return valores if valores and None not in valores else None
+
+
+def tabela_para_dataframe(colunas: List[str], linhas: List[List[str]]):
+    """DataFrame com colunas numéricas convertidas para float (R$ e %
+    normalizados) e as demais como texto"""
+    import pandas as pd
+
+    dados: Dict[str, Any] = {}
+    for indice, coluna in enumerate(colunas):
+        valores = [converter_valor(linha[indice]) if linha[indice].strip() else None for linha in linhas]
+        if any(v is not None for v in valores) and all(
+            v is not None or not linha[indice].strip() for v, linha in zip(valores, linhas)
+        ):
+            dados[coluna] = pd.Series(valores, dtype="float64")
+        else:
+            dados[coluna] = pd.Series([linha[indice] for linha in linhas], dtype="string")
+    return pd.DataFrame(dados)
+
+
+def tabelas_plano(plano: Dict[str, str]) -> List[Tuple[str, str, Any]]:
+    """(seção, título, DataFrame) de cada tabela das seções do plano"""
+    return [
+        (secao, titulo, tabela_para_dataframe(colunas, linhas))
+        for secao, texto in plano.items()
+        for titulo, colunas, linhas in extrair_tabelas(texto)
+    ]
+
+
+def _coluna_principal(candidatas: List[Tuple[str, List[float]]]) -> Tuple[str, List[float]]:
+    # A coluna com a divisão do budget inteiro: a de total, se houver uma, senão
+    # a de maior soma (uma coluna parcial, por plataforma ou fase, soma menos)
+    totais = [candidata for candidata in candidatas if 'total' in candidata[0].lower()]
+    if len(totais) == 1:
+        return totais[0]
+    return max(candidatas, key=lambda candidata: sum(candidata[1]))
+
+
+def validar_secao(nome: str, texto: str, params: Dict[str, Any]) -> Optional[str]:
+    """Mensagem com o problema das tabelas de budget da seção, ou None se
+    estiverem consistentes. Em cada tabela, a coluna de % e a de R$ com a
+    divisão do budget inteiro devem somar 100% e o budget; as demais colunas
+    de R$ (parciais, por plataforma ou fase) não podem passar do budget. Sem
+    coluna de total, colunas parciais que juntas somam o esperado também valem."""
+    if nome not in SECOES_ALOCACAO:
+        return None
+    budget = float(params['budget'])
+    tolerancia_valor = max(1.0, TOLERANCIA_VALOR * budget)
+    for titulo, colunas, linhas in extrair_tabelas(texto):
+        linhas = [linha for linha in linhas if not _linha_total(linha)]
+        candidatas: Dict[bool, List[Tuple[str, List[float]]]] = {True: [], False: []}
+        for indice, coluna in enumerate(colunas):
+            nome_coluna = coluna.lower()
+            if 'acumulad' in nome_coluna:
+                continue
+            percentual = "%" in nome_coluna
+            if not percentual and not ('r$' in nome_coluna or 'valor' in nome_coluna or 'budget' in nome_coluna):
+                continue
+            valores = _coluna_numerica(linhas, indice)
+            if valores is not None:
+                candidatas[percentual].append((coluna, valores))
+
+        for percentual, colunas_tipo in candidatas.items():
+            if not colunas_tipo:
+                continue
+            esperado = 1.0 if percentual else budget
+            coluna, valores = _coluna_principal(colunas_tipo)
+            soma = sum(valores)
+            tolerancia = (
+                max(TOLERANCIA_PERCENTUAL, TOLERANCIA_ARREDONDAMENTO * len(valores)) if percentual else tolerancia_valor
+            )
+            sem_total = len(colunas_tipo) > 1 and not any('total' in c.lower() for c, _ in colunas_tipo)
+            soma_colunas = sum(sum(v) for _, v in colunas_tipo)
+            if abs(soma - esperado) > tolerancia and not (sem_total and abs(soma_colunas - esperado) <= tolerancia):
+                if percentual:
+                    return f"A coluna '{coluna}' da tabela '{titulo}' soma {soma:.1%} em vez de 100%"
+                return f"A coluna '{coluna}' da tabela '{titulo}' soma R$ {soma:,.2f} em vez de R$ {budget:,.2f}"
+            if percentual:
+                # Percentuais parciais podem ser relativos à linha (a fatia da plataforma na fase)
+                continue
+            for parcial, valores_parcial in colunas_tipo:
+                if sum(valores_parcial) > budget + tolerancia_valor:
+                    return (
+                        f"A coluna '{parcial}' da tabela '{titulo}' soma R$ {sum(valores_parcial):,.2f}, "
+                        f"mais que o budget de R$ {budget:,.2f}"
+                    )
+    return None
+
+
+def validar_plano(params: Dict[str, Any], plano: Dict[str, str]) -> Dict[str, str]:
+    """Problemas encontrados por seção (vazio se o plano estiver consistente)"""
+    erros = {}
+    for nome, texto in plano.items():
+        erro = validar_secao(nome, texto, params)
+        if erro:
+            erros[nome] = erro
+    return erros
+
+
+def _nome_planilha(secao: str, titulo: str, usados: set) -> str:
+    # Nomes de planilha do Excel: até 31 caracteres, sem []:*?/\ e únicos
+    base = re.sub(r"[\[\]:*?/\\]", "", f"{secao[:12]} {titulo}")[:31].strip()
+    nome, n = base, 2
+    while nome.lower() in usados:
+        sufixo = f" {n}"
+        nome, n = base[:31 - len(sufixo)] + sufixo, n + 1
+    usados.add(nome.lower())
+    return nome
+
+
+def exportar_tabelas(plano: Dict[str, str], formato: str) -> bytes:
+    """Tabelas do plano em 'xlsx' (uma planilha por tabela) ou em um .zip com
+    um arquivo 'csv' ou 'parquet' por tabela"""
+    import pandas as pd
+
+    tabelas = tabelas_plano(plano)
+    usados: set = set()
+    nomes = [_nome_planilha(secao, titulo, usados) for secao, titulo, _ in tabelas]
+    saida = io.BytesIO()
+    if formato == 'xlsx':
+        with pd.ExcelWriter(saida, engine="xlsxwriter") as planilha:
+            for nome, (_, _, df) in zip(nomes, tabelas):
+                df.to_excel(planilha, sheet_name=nome, index=False)
+        return saida.getvalue()
+
+    with zipfile.ZipFile(saida, "w", zipfile.ZIP_DEFLATED) as arquivo_zip:
+        for nome, (_, _, df) in zip(nomes, tabelas):
+            arquivo = re.sub(r"[^\w-]+", "_", nome).strip("_")
+            if formato == 'csv':
+                arquivo_zip.writestr(f"{arquivo}.csv", df.to_csv(index=False))
+            elif formato == 'parquet':
+                arquivo_zip.writestr(f"{arquivo}.parquet", df.to_parquet(index=False))
+            else:
+                raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    return saida.getvalue()
@@ -0,0 +1,317 @@
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from instrumentacao import percentil
+
+# executar(tarefa, ao_concluir, ao_fragmento) gera o plano da tarefa e retorna
+# o resultado final (erros por seção, avisos etc.), gravado em JSON
+Executor = Callable[[Dict[str, Any], Callable[[str, str], None], Callable[[str, str], None]], Dict[str, Any]]
+
+# Distingue esta execução do processo de uma anterior com o mesmo pid (comum
+# em contêineres reiniciados, em que o app costuma ser sempre o mesmo pid)
+_EXECUCAO = uuid.uuid4().hex[:12]
+
+
+class FilaCheia(Exception):
+    """A fila de geração (ou a cota do usuário nela) está no limite"""
+
+
+def _processo_ativo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FilaTarefas:
+    """Fila de geração de planos executada por `trabalhadores` threads do
+    processo, independente das sessões do Streamlit: recarregar a página ou
+    perder a conexão não interrompe a geração.
+
+    Cada seção é gravada em SQLite assim que termina, e o texto parcial das
+    seções em streaming fica em memória, para a página acompanhar o progresso
+    pelo id da tarefa. Cada tarefa registra o processo que a executa (host,
+    pid e a execução); na inicialização, as tarefas de processos deste host
+    que já pararam, inclusive de uma execução anterior com o mesmo pid, são
+    assumidas e retomadas a partir das seções já gravadas (outros processos
+    do Streamlit podem compartilhar o mesmo arquivo).
+
+    A fila aceita até `max_pendentes` tarefas não iniciadas, no máximo
+    `max_por_usuario` de cada usuário, e os trabalhadores atendem os usuários
+    em rodízio, para um usuário com várias tarefas não atrasar os demais. O
+    usuário é a identidade informada em `submeter`; a cota só limita uma
+    pessoa se essa identidade for estável (um login, e não um id de sessão).
+    """
+
+    def __init__(self, caminho: str, executar: Executor, trabalhadores: int = 2, max_pendentes: int = 50,
+                 max_por_usuario: int = 3, ttl_segundos: float = 7 * 24 * 3600):
+        self.caminho = caminho
+        self.executar = executar
+        self.max_pendentes = max_pendentes
+        self.max_por_usuario = max_por_usuario
+        self.ttl_segundos = ttl_segundos
+        self.concluidas = 0
+        self.falhas = 0
+        self._esperas: Deque[float] = deque(maxlen=200)
+        # Tarefas na fila de cada usuário; a ordem das chaves é a vez de cada um
+        self._filas: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._usuarios: Dict[str, str] = {}
+        self._executando: Dict[str, str] = {}
+        self._parciais: Dict[str, Dict[str, str]] = {}
+        self._condicao = threading.Condition()
+        self._host = socket.gethostname()
+        self._processo = f"{self._host}:{os.getpid()}:{_EXECUCAO}"
+
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS tarefas (
+                    id TEXT PRIMARY KEY,
+                    usuario TEXT NOT NULL,
+                    estado TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    opcoes TEXT NOT NULL,
+                    processo TEXT NOT NULL DEFAULT '',
+                    resultado TEXT,
+                    erro TEXT,
+                    criado_em REAL NOT NULL,
+                    iniciado_em REAL,
+                    concluido_em REAL
+                )
+            """)
+            conexao.execute("""
+                CREATE TABLE IF NOT EXISTS secoes (
+                    tarefa TEXT NOT NULL,
+                    nome TEXT NOT NULL,
+                    texto TEXT NOT NULL,
+                    PRIMARY KEY (tarefa, nome)
+                )
+            """)
+            conexao.execute(
+                "DELETE FROM secoes WHERE tarefa IN (SELECT id FROM tarefas WHERE criado_em < ?)",
+                (time.time() - ttl_segundos,),
+            )
+            conexao.execute("DELETE FROM tarefas WHERE criado_em < ?", (time.time() - ttl_segundos,))
+            pendentes = conexao.execute(
+                "SELECT id, usuario, processo FROM tarefas WHERE estado IN ('na_fila', 'executando') ORDER BY criado_em"
+            ).fetchall()
+            for id_tarefa, usuario, processo in pendentes:
+                if not self._interrompida(processo):
+                    continue
+                # Compara o dono antes de assumir, para dois processos novos não retomarem a mesma tarefa
+                assumida = conexao.execute(
+                    "UPDATE tarefas SET estado = 'na_fila', processo = ? WHERE id = ? AND processo = ?",
+                    (self._processo, id_tarefa, processo),
+                ).rowcount
+                if assumida:
+                    self._enfileirar(id_tarefa, usuario)
+
+        for i in range(max(1, trabalhadores)):
+            threading.Thread(target=self._trabalhar, name=f"tarefas-{i}", daemon=True).start()
+
+    def _interrompida(self, processo: str) -> bool:
+        # Só dá para saber se um processo parou quando ele é deste host. Com o
+        # pid deste processo, a tarefa é de uma execução anterior se a marca da
+        # execução for outra (outra fila deste processo continua com as suas)
+        host, _, resto = processo.partition(":")
+        pid, _, execucao = resto.partition(":")
+        if host != self._host or not pid.isdigit():
+            return False
+        if int(pid) == os.getpid():
+            return execucao != _EXECUCAO
+        return not _processo_ativo(int(pid))
+
+    @contextmanager
+    def _conectar(self) -> Iterator[sqlite3.Connection]:
+        # Uma conexão por operação: sqlite3 não compartilha conexões entre threads
+        conexao = sqlite3.connect(self.caminho, timeout=10)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def _enfileirar(self, id_tarefa: str, usuario: str) -> None:
+        self._filas.setdefault(usuario, deque()).append(id_tarefa)
+        self._usuarios[id_tarefa] = usuario
+
+    def submeter(self, usuario: str, params: Dict[str, Any], opcoes: Dict[str, Any],
+                 secoes: Optional[Dict[str, str]] = None) -> str:
+        """Agenda a geração e retorna o id da tarefa. `secoes` são as seções já
+        prontas (reaproveitadas de um plano anterior), que não são geradas de novo.
+        Levanta FilaCheia se a fila ou a cota do usuário estiverem no limite."""
+        id_tarefa = uuid.uuid4().hex
+        with self._condicao:
+            pendentes = sum(len(fila) for fila in self._filas.values())
+            if pendentes >= self.max_pendentes:
+                raise FilaCheia(f"A fila de geração está cheia ({pendentes} planos aguardando). Tente novamente em instantes.")
+            do_usuario = len(self._filas.get(usuario, ())) + list(self._executando.values()).count(usuario)
+            if do_usuario >= self.max_por_usuario:
+                raise FilaCheia(f"Você já tem {do_usuario} planos em geração. Aguarde um deles terminar.")
+            with self._conectar() as conexao:
+                conexao.execute(
+                    "INSERT INTO tarefas (id, usuario, estado, params, opcoes, processo, criado_em) "
+                    "VALUES (?, ?, 'na_fila', ?, ?, ?, ?)",
+                    (id_tarefa, usuario, json.dumps(params, ensure_ascii=False), json.dumps(opcoes, ensure_ascii=False),
+                     self._processo, time.time()),
+                )
+                conexao.executemany(
+                    "INSERT INTO secoes (tarefa, nome, texto) VALUES (?, ?, ?)",
+                    [(id_tarefa, nome, texto) for nome, texto in (secoes or {}).items()],
+                )
+            self._enfileirar(id_tarefa, usuario)
+            self._condicao.notify()
+        return id_tarefa
+
+    def _proxima(self) -> str:
+        # Rodízio: o usuário atendido vai para o fim da vez
+        usuario, fila = next(iter(self._filas.items()))
+        id_tarefa = fila.popleft()
+        del self._filas[usuario]
+        if fila:
+            self._filas[usuario] = fila
+        return id_tarefa
+
+    def _trabalhar(self) -> None:
+        while True:
+            with self._condicao:
+                while not self._filas:
+                    self._condicao.wait()
+                id_tarefa = self._proxima()
+                usuario = self._usuarios.pop(id_tarefa)
+                self._executando[id_tarefa] = usuario
+                self._parciais[id_tarefa] = {}
+            # Qualquer erro, da geração ou do SQLite, faz a tarefa falhar; o
+            # trabalhador continua atendendo a fila
+            try:
+                estado, resultado, mensagem = 'concluida', self._executar(id_tarefa), None
+            except Exception as erro:
+                estado, resultado, mensagem = 'falhou', None, f"{type(erro).__name__}: {erro}"
+            try:
+                with self._conectar() as conexao:
+                    conexao.execute(
+                        "UPDATE tarefas SET estado = ?, resultado = ?, erro = ?, concluido_em = ? WHERE id = ?",
+                        (estado, json.dumps(resultado, ensure_ascii=False, default=str), mensagem, time.time(), id_tarefa),
+                    )
+            except Exception as erro:
+                # Sem como gravar o fim, a tarefa é retomada quando o processo reiniciar
+                print(f"tarefa {id_tarefa}: estado '{estado}' não gravado ({type(erro).__name__}: {erro})", file=sys.stderr)
+            with self._condicao:
+                if estado == 'concluida':
+                    self.concluidas += 1
+                else:
+                    self.falhas += 1
+                del self._executando[id_tarefa]
+                self._parciais.pop(id_tarefa, None)
+
+    def _executar(self, id_tarefa: str) -> Dict[str, Any]:
+        agora = time.time()
+        with self._conectar() as conexao:
+            conexao.execute("UPDATE tarefas SET estado = 'executando', iniciado_em = ? WHERE id = ?", (agora, id_tarefa))
+        tarefa = self.estado(id_tarefa)
+        if tarefa is None:
+            raise LookupError("tarefa removida antes de iniciar")
+        self._esperas.append(agora - tarefa['criado_em'])
+
+        def ao_concluir(nome: str, texto: str) -> None:
+            with self._conectar() as conexao:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO secoes (tarefa, nome, texto) VALUES (?, ?, ?)", (id_tarefa, nome, texto)
+                )
+            with self._condicao:
+                self._parciais[id_tarefa].pop(nome, None)
+
+        def ao_fragmento(nome: str, texto: str) -> None:
+            with self._condicao:
+                self._parciais[id_tarefa][nome] = texto
+
+        return self.executar(tarefa, ao_concluir, ao_fragmento)
+
+    def estado(self, id_tarefa: str) -> Optional[Dict[str, Any]]:
+        """Tarefa com o estado ('na_fila', 'executando', 'concluida' ou 'falhou'),
+        as seções prontas, o texto parcial das que estão em streaming, a posição
+        na fila e o resultado; None se a tarefa não existir"""
+        with self._conectar() as conexao:
+            linha = conexao.execute(
+                "SELECT usuario, estado, params, opcoes, resultado, erro, criado_em, iniciado_em, concluido_em "
+                "FROM tarefas WHERE id = ?",
+                (id_tarefa,),
+            ).fetchone()
+            if linha is None:
+                return None
+            secoes = dict(conexao.execute("SELECT nome, texto FROM secoes WHERE tarefa = ?", (id_tarefa,)).fetchall())
+        usuario, estado, params, opcoes, resultado, erro, criado_em, iniciado_em, concluido_em = linha
+        with self._condicao:
+            parciais = dict(self._parciais.get(id_tarefa, {}))
+        return {
+            'id': id_tarefa,
+            'usuario': usuario,
+            'estado': estado,
+            'params': json.loads(params),
+            'opcoes': json.loads(opcoes),
+            'secoes': secoes,
+            'parciais': parciais,
+            'posicao': self.posicao(id_tarefa),
+            'resultado': json.loads(resultado) if resultado else None,
+            'erro': erro,
+            'criado_em': criado_em,
+            'iniciado_em': iniciado_em,
+            'concluido_em': concluido_em,
+        }
+
+    def posicao(self, id_tarefa: str) -> Optional[int]:
+        """Quantas tarefas serão iniciadas antes desta pelo rodízio (0 = a próxima),
+        ou None se ela não estiver na fila"""
+        with self._condicao:
+            filas = [list(fila) for fila in self._filas.values()]
+        for usuario, fila in enumerate(filas):
+            if id_tarefa in fila:
+                rodada = fila.index(id_tarefa)
+                # Antes dela: as `rodada` primeiras de cada fila, mais a da rodada atual dos usuários à frente
+                return sum(min(len(outra), rodada + (1 if i < usuario else 0)) for i, outra in enumerate(filas))
+        return None
+
+    def metricas(self) -> Dict[str, Any]:
+        """Tamanho da fila, tarefas em execução, usuários aguardando, tempos de espera e totais deste processo"""
+        with self._condicao:
+            por_usuario = {usuario: len(fila) for usuario, fila in self._filas.items()}
+            executando = len(self._executando)
+            concluidas, falhas = self.concluidas, self.falhas
+        esperas = list(self._esperas)
+        return {
+            'na_fila': sum(por_usuario.values()),
+            'executando': executando,
+            'usuarios_aguardando': len(por_usuario),
+            'maior_fila_usuario': max(por_usuario.values(), default=0),
+            'espera_p50': percentil(esperas, 50) if esperas else 0.0,
+            'espera_p95': percentil(esperas, 95) if esperas else 0.0,
+            'concluidas': concluidas,
+            'falhas': falhas,
+        }
+
+
+def criar_fila_tarefas(executar: Executor) -> FilaTarefas:
+    """Fila configurada pelas variáveis de ambiente TAREFAS_*"""
+    return FilaTarefas(
+        os.getenv("TAREFAS_PATH", ".cache/tarefas.sqlite3"),
+        executar,
+        trabalhadores=int(os.getenv("TAREFAS_TRABALHADORES", "2")),
+        max_pendentes=int(os.getenv("TAREFAS_MAX_PENDENTES", "50")),
+        max_por_usuario=int(os.getenv("TAREFAS_MAX_POR_USUARIO", "3")),
+        ttl_segundos=float(os.getenv("TAREFAS_TTL", str(7 * 24 * 3600))),
+    )
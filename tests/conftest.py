@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+import pytest
+
+
+class ServidorOpenAI(ThreadingHTTPServer):
+    """Servidor local com o endpoint /v1/chat/completions da OpenAI.
+
+    `comportamento[modelo]` define, por nome de modelo, o texto da resposta,
+    o `atraso` (segundos) antes de responder e um `status` de erro opcional.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Tratador)
+        self.comportamento: Dict[str, Dict[str, Any]] = {}
+        self.pedidos: list = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+USO = {'prompt_tokens': 120, 'completion_tokens': 7, 'total_tokens': 127, 'prompt_tokens_details': {'cached_tokens': 64}}
+
+
+class _Tratador(BaseHTTPRequestHandler):
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _json(self, status: int, corpo: Dict[str, Any]) -> None:
+        dados = json.dumps(corpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self) -> None:
+        pedido = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.pedidos.append(pedido)
+        modelo = pedido['model']
+        comportamento = self.server.comportamento.get(modelo, {})
+        time.sleep(comportamento.get('atraso', 0))
+        if comportamento.get('status'):
+            self._json(comportamento['status'], {'error': {'message': "indisponível", 'type': "server_error"}})
+            return
+        texto = comportamento.get('texto', f"resposta de {modelo}")
+        if not pedido.get('stream'):
+            self._json(200, {
+                'id': "cmpl", 'object': "chat.completion", 'created': 0, 'model': modelo,
+                'choices': [{'index': 0, 'message': {'role': "assistant", 'content': texto}, 'finish_reason': "stop"}],
+                'usage': USO,
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        base = {'id': "cmpl", 'object': "chat.completion.chunk", 'created': 0, 'model': modelo}
+        eventos = [
+            {**base, 'choices': [{'index': 0, 'delta': {'content': parte}, 'finish_reason': None}]}
+            for parte in texto.split(" ")[:1] + [" " + p for p in texto.split(" ")[1:]]
+        ]
+        # Com stream_options.include_usage, o uso vem num último fragmento sem choices
+        eventos.append({**base, 'choices': [], 'usage': USO})
+        for evento in eventos:
+            self.wfile.write(f"data: {json.dumps(evento)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(comportamento.get('intervalo', 0))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+@pytest.fixture
+def servidor_openai():
+    servidor = ServidorOpenAI()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+class CacheMemoria:
+    """Cache de respostas em memória com a interface de CacheRespostas"""
+
+    def __init__(self):
+        self.respostas: Dict[str, str] = {}
+
+    def obter(self, chave: str):
+        return self.respostas.get(chave)
+
+    def salvar(self, chave: str, texto: str) -> None:
+        self.respostas[chave] = texto
+
+
+@pytest.fixture
+def cache_memoria():
+    return CacheMemoria()
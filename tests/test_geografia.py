@@ -0,0 +1,36 @@
+from geografia import carregar_municipios, normalizar_nome, resolver_localizacoes
+
+
+def test_indice_tem_um_municipio_por_nome_e_uf():
+    municipios = carregar_municipios()
+    pares = set(zip(municipios['nome'].tolist(), municipios['uf'].tolist()))
+    assert len(pares) == len(municipios) == 5570
+    assert len(set(municipios['codigo'].tolist())) == len(municipios)
+
+
+def test_nome_exibido_e_o_nome_do_ibge():
+    municipios = carregar_municipios()
+    for nome, chave in zip(municipios['nome'].tolist(), municipios['chave'].tolist()):
+        assert normalizar_nome(nome.decode("utf-8")) == chave.decode("ascii")
+    assert (municipios['populacao'] > 0).all()
+
+
+def test_homonimos_de_cidades_maiores_mantem_nome_e_populacao():
+    (barra,), _ = resolver_localizacoes("Barra - BA", 'municipio')
+    assert barra.rotulo == "Barra (BA)"
+    (uba,), _ = resolver_localizacoes("Ubá", 'municipio')
+    (uberaba,), _ = resolver_localizacoes("Uberaba", 'municipio')
+    assert uba.nome == "Ubá" and uba.populacao < uberaba.populacao
+
+
+def test_estado_ou_municipio_conforme_o_campo():
+    (estado,), _ = resolver_localizacoes("São Paulo", 'estado')
+    (cidade,), _ = resolver_localizacoes("São Paulo", 'municipio')
+    assert (estado.tipo, cidade.tipo) == ('estado', 'municipio')
+    assert cidade.populacao < estado.populacao
+
+
+def test_trechos_nao_reconhecidos():
+    localidades, nao_reconhecidos = resolver_localizacoes("Cuiabá - MT; Xyzlândia", 'municipio')
+    assert [l.rotulo for l in localidades] == ["Cuiabá (MT)"]
+    assert nao_reconhecidos == ("Xyzlândia",)
@@ -0,0 +1,145 @@
+import copy
+import json
+
+import pytest
+
+from benchmark import PARAMS_PADRAO, ModeloSimulado
+from gerador import DEPENDENCIAS, GeradorPlano, impressoes_digitais, secoes_reaproveitaveis
+from instrumentacao import MonitorChamadas
+
+
+def modelo(semente: int = 0) -> ModeloSimulado:
+    return ModeloSimulado(mediana_primeiro_token=0, tokens_por_segundo=1e9, tokens_resposta=50, semente=semente)
+
+
+def chamadas(modelo_simulado: ModeloSimulado) -> int:
+    return sum(modelo_simulado._chamadas.values())
+
+
+@pytest.fixture(scope="module")
+def plano():
+    return GeradorPlano(modelo()).gerar_plano(PARAMS_PADRAO)
+
+
+@pytest.mark.parametrize("campo, valor, maximo", [
+    ('observacoes', "Concorrente forte na região", 4),
+    ('tipo_criativo', ["Estático"], 2),
+    ('tipo_publico', "Lookalike", 1),
+    ('budget', 50000, 3),
+])
+def test_edicao_regenera_so_as_secoes_afetadas(plano, campo, valor, maximo):
+    editados = {**copy.deepcopy(PARAMS_PADRAO), campo: valor}
+    reaproveitadas, condicionais = secoes_reaproveitaveis(
+        plano, impressoes_digitais(PARAMS_PADRAO), impressoes_digitais(editados)
+    )
+    assert len(DEPENDENCIAS) - len(reaproveitadas) <= maximo
+    # As dependentes das seções alteradas ficam à espera do texto novo delas
+    assert set(condicionais).isdisjoint(reaproveitadas)
+
+
+class GeradorGravado(GeradorPlano):
+    """Guarda o prompt completo (prefixo e instruções) de cada seção"""
+
+    def __init__(self):
+        super().__init__(modelo(), usar_cache=False)
+        self.prompts = {}
+
+    def gerar_texto(self, prompt, ao_fragmento=None, secao="", config=None, prefixo=""):
+        self.prompts[secao] = prefixo + prompt
+        return super().gerar_texto(prompt, ao_fragmento, secao=secao, config=config, prefixo=prefixo)
+
+
+def prompts_secoes(params):
+    # Dependências com texto fixo: só os campos de `params` variam entre os prompts
+    gerador = GeradorGravado()
+    for nome, dependencias in DEPENDENCIAS.items():
+        getattr(gerador, f"gerar_{nome}")(params, *(f"Texto de {d}" for d in dependencias))
+    return gerador.prompts
+
+
+@pytest.mark.parametrize("campo, valor", [
+    ('budget', 500000),
+    ('localizacao_primaria', "SP"),
+    ('tipo_publico', "Lookalike"),
+    ('tipo_criativo', ["Estático"]),
+    ('detalhes_acao', "Lançamento de nova linha"),
+    ('observacoes', "Concorrente forte na região"),
+])
+def test_secao_com_prompt_alterado_nao_e_reaproveitada(campo, valor):
+    editados = {**copy.deepcopy(PARAMS_PADRAO), campo: valor}
+    antes, depois = prompts_secoes(PARAMS_PADRAO), prompts_secoes(editados)
+    antigas, novas = impressoes_digitais(PARAMS_PADRAO), impressoes_digitais(editados)
+    for nome in DEPENDENCIAS:
+        if antes[nome] != depois[nome]:
+            assert antigas[nome] != novas[nome], nome
+    # No modo único, todas as seções saem do mesmo prompt, com todos os campos
+    antigas, novas = (impressoes_digitais(p, {'modo': 'unico'}) for p in (PARAMS_PADRAO, editados))
+    assert all(antigas[nome] != novas[nome] for nome in DEPENDENCIAS)
+
+
+def test_dependente_reaproveitada_quando_o_texto_da_dependencia_nao_muda(plano):
+    antigas = impressoes_digitais(PARAMS_PADRAO)
+    novas = {**antigas, 'recomendacao_estrategica': "alterada"}
+    reaproveitadas, condicionais = secoes_reaproveitaveis(plano, antigas, novas)
+    assert set(reaproveitadas) == {'previsao_resultados'}
+    assert set(condicionais) == {'distribuicao_budget', 'recomendacoes_publico', 'cronograma'}
+
+    # Mesma semente e mesmo prompt: a estratégia sai igual e nada mais é gerado
+    mesmo_texto = modelo()
+    gerador = GeradorPlano(mesmo_texto)
+    novo = gerador.gerar_plano(PARAMS_PADRAO, resultados_existentes=reaproveitadas, condicionais=condicionais)
+    assert novo == plano
+    assert chamadas(mesmo_texto) == 1
+    assert gerador.condicionais_reaproveitadas == 3
+
+    outro_texto = modelo(semente=1)
+    gerador = GeradorPlano(outro_texto)
+    novo = gerador.gerar_plano(PARAMS_PADRAO, resultados_existentes=reaproveitadas, condicionais=condicionais)
+    assert novo['recomendacao_estrategica'] != plano['recomendacao_estrategica']
+    assert chamadas(outro_texto) == 4
+    assert gerador.condicionais_reaproveitadas == 0
+
+
+def test_plano_com_respostas_do_cache_fica_fora_da_comparacao_de_modos(cache_memoria):
+    monitor = MonitorChamadas()
+    for _ in range(2):
+        gerador = GeradorPlano(modelo(), cache=cache_memoria, monitor=monitor)
+        gerador.gerar_plano(PARAMS_PADRAO)
+    assert gerador.respostas_cache == len(DEPENDENCIAS)
+    assert [p['respostas_cache'] for p in monitor.planos] == [0, len(DEPENDENCIAS)]
+    ((_, resumo),) = monitor.resumo_planos().items()
+    assert resumo['planos'] == 1 and resumo['tokens_entrada'] > 0
+
+
+class ModeloCronogramaErrado(ModeloSimulado):
+    """Na primeira resposta em JSON, as fases do cronograma somam 90% do budget"""
+
+    def __init__(self):
+        super().__init__(mediana_primeiro_token=0, tokens_por_segundo=1e9, tokens_resposta=50)
+        self.respostas_json = 0
+
+    def _texto(self, json_mode, rng):
+        texto = super()._texto(json_mode, rng)
+        if not json_mode:
+            return texto
+        self.respostas_json += 1
+        dados = json.loads(texto)
+        if self.respostas_json == 1:
+            dados['cronograma'][-1]['percentual_budget'] = 15
+        return json.dumps(dados, ensure_ascii=False)
+
+
+def test_modo_unico_refaz_tabela_invalida_com_outra_chamada_unica():
+    modelo_unico = ModeloCronogramaErrado()
+    gerador = GeradorPlano(modelo_unico)
+    plano = gerador.gerar_plano(PARAMS_PADRAO, modo='unico')
+    assert chamadas(modelo_unico) == modelo_unico.respostas_json == 2
+    assert gerador.avisos_validacao == {}
+    assert "| 25%" in plano['cronograma'] and "| 15%" not in plano['cronograma']
+
+
+def test_modo_unico_sem_secoes_faltando_nao_chama_o_modelo(plano):
+    sem_chamadas = modelo()
+    novo = GeradorPlano(sem_chamadas).gerar_plano(PARAMS_PADRAO, modo='unico', resultados_existentes=plano)
+    assert novo == plano
+    assert chamadas(sem_chamadas) == 0
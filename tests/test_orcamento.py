@@ -0,0 +1,77 @@
+import copy
+
+import numpy as np
+import pytest
+
+from benchmark import PARAMS_PADRAO
+from orcamento import calcular_distribuicao, dividir_centavos
+
+
+def centavos(valor: float) -> int:
+    return int(round(valor * 100))
+
+
+@pytest.mark.parametrize("total, pesos", [
+    (100, [1, 1, 1]),
+    (0.05, [1, 1, 1, 1, 1, 1, 1]),
+    (1234.57, [0.7, 0.2, 0.1]),
+    (999.99, [3, 0, 1, 0, 2]),
+    (9_876_543_210.99, [1e-6, 1, 1e6]),
+])
+def test_divisao_soma_exatamente_o_total(total, pesos):
+    pesos = np.array(pesos, dtype=float)
+    divisao = dividir_centavos(total, pesos)
+    assert divisao.dtype == np.int64
+    assert int(divisao.sum()) == centavos(total)
+    # Cada parte fica a menos de um centavo da fatia exata; peso zero não recebe nada
+    assert np.all(np.abs(divisao - pesos / pesos.sum() * centavos(total)) < 1)
+    assert np.all(divisao[pesos == 0] == 0)
+
+
+def test_divisao_desigual_vai_para_os_maiores_restos():
+    assert sorted(dividir_centavos(100, np.array([1.0, 1.0, 1.0])).tolist()) == [3333, 3333, 3334]
+    assert dividir_centavos(0.1, np.array([2.0, 1.0])).tolist() == [7, 3]
+    assert dividir_centavos(0.1, np.array([1.0, 2.0, 3.0, 4.0])).tolist() == [1, 2, 3, 4]
+
+
+def test_divisao_matricial_mantem_o_formato():
+    pesos = np.random.default_rng(0).random((3, 2, 4))
+    pesos[1] = 0
+    divisao = dividir_centavos(54_321.09, pesos)
+    assert divisao.shape == pesos.shape
+    assert int(divisao.sum()) == 5_432_109
+    assert not divisao[1].any()
+
+
+@pytest.mark.parametrize("campos", [
+    {},
+    {'budget': 1234.57},
+    {'budget': 9_876_543_210.99},
+    {'budget': 0.07},
+    {'localizacao_secundaria': ""},
+    # Carrossel e Story não servem ao Google Ads nem ao YouTube
+    {'ferramentas': ["Google Ads", "YouTube", "TikTok"], 'tipo_criativo': ["Carrossel", "Story"]},
+    {'localizacao_primaria': "Xyzlândia", 'localizacao_secundaria': "Abcópolis"},
+])
+def test_distribuicao_soma_exatamente_o_budget(campos):
+    params = {**copy.deepcopy(PARAMS_PADRAO), **campos}
+    distribuicao = calcular_distribuicao(params)
+    matriz = distribuicao['centavos']
+    assert int(matriz.sum()) == centavos(params['budget'])
+    assert matriz.shape == (
+        len(distribuicao['plataformas']), len(distribuicao['localizacoes']), len(distribuicao['criativos'])
+    )
+    assert (matriz >= 0).all()
+    # As localidades reconhecidas dividem exatamente o valor do seu grupo
+    por_grupo = matriz.sum(axis=(0, 2))
+    for grupo, valor in enumerate(por_grupo):
+        fatias = [fatia for g, _, _, fatia in distribuicao['localidades'] if g == grupo]
+        if fatias:
+            assert sum(fatias) == valor
+
+
+def test_total_por_plataforma_nao_depende_das_localizacoes_nem_dos_criativos():
+    base = calcular_distribuicao(PARAMS_PADRAO)['centavos'].sum(axis=(1, 2))
+    for campos in ({'localizacao_primaria': "SP"}, {'localizacao_secundaria': ""}, {'tipo_criativo': ["Vídeo"]}):
+        outra = calcular_distribuicao({**copy.deepcopy(PARAMS_PADRAO), **campos})['centavos'].sum(axis=(1, 2))
+        assert outra.tolist() == base.tolist()
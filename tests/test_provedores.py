@@ -0,0 +1,98 @@
+import time
+
+import pytest
+from openai import InternalServerError, OpenAI
+
+from gerador import GeradorPlano
+from provedores import ModeloComHedge, ModeloOpenAI, UsoTokens
+
+
+def modelo(servidor, nome: str) -> ModeloOpenAI:
+    return ModeloOpenAI(nome, OpenAI(base_url=servidor.base_url, api_key="teste", max_retries=0))
+
+
+def test_resposta_e_uso_de_tokens(servidor_openai):
+    resposta = modelo(servidor_openai, "primario").generate_content("oi")
+    assert resposta.text == "resposta de primario"
+    assert resposta.modelo == "primario"
+    assert resposta.usage_metadata == UsoTokens(120, 7, 64)
+
+
+def test_json_mode_pede_response_format(servidor_openai):
+    modelo(servidor_openai, "primario").generate_content("oi", generation_config={'response_mime_type': "application/json"})
+    assert servidor_openai.pedidos[-1]['response_format'] == {'type': "json_object"}
+
+
+def test_streaming_junta_fragmentos_e_traz_uso_no_ultimo(servidor_openai):
+    servidor_openai.comportamento['primario'] = {'texto': "uma resposta em partes"}
+    fragmentos = list(modelo(servidor_openai, "primario").generate_content("oi", stream=True))
+    assert "".join(f.text for f in fragmentos) == "uma resposta em partes"
+    assert [f.usage_metadata for f in fragmentos if f.usage_metadata] == [UsoTokens(120, 7, 64)]
+    assert fragmentos[-1].usage_metadata is not None
+    assert servidor_openai.pedidos[-1]['stream_options'] == {'include_usage': True}
+
+
+def hedge(servidor, atraso_inicial: float = 0.2) -> ModeloComHedge:
+    return ModeloComHedge(modelo(servidor, "primario"), modelo(servidor, "secundario"), atraso_inicial=atraso_inicial)
+
+
+def test_primario_no_prazo_nao_dispara_secundario(servidor_openai):
+    modelo_hedge = hedge(servidor_openai)
+    assert modelo_hedge.generate_content("oi").modelo == "primario"
+    assert modelo_hedge.disparos_secundario == 0
+    assert [p['model'] for p in servidor_openai.pedidos] == ["primario"]
+
+
+def test_primario_lento_perde_para_o_secundario(servidor_openai):
+    servidor_openai.comportamento['primario'] = {'atraso': 1.5}
+    modelo_hedge = hedge(servidor_openai, atraso_inicial=0.2)
+    inicio = time.monotonic()
+    resposta = modelo_hedge.generate_content("oi")
+    duracao = time.monotonic() - inicio
+    assert resposta.modelo == "secundario"
+    assert 0.2 <= duracao < 1.0
+    assert (modelo_hedge.disparos_secundario, modelo_hedge.vitorias_secundario) == (1, 1)
+
+
+def test_erro_do_primario_dispara_o_secundario_antes_do_prazo(servidor_openai):
+    servidor_openai.comportamento['primario'] = {'status': 503}
+    modelo_hedge = hedge(servidor_openai, atraso_inicial=5)
+    inicio = time.monotonic()
+    assert modelo_hedge.generate_content("oi").modelo == "secundario"
+    assert time.monotonic() - inicio < 1.0
+
+
+def test_erro_nos_dois_levanta_o_erro(servidor_openai):
+    servidor_openai.comportamento = {'primario': {'status': 503}, 'secundario': {'status': 503}}
+    with pytest.raises(InternalServerError):
+        hedge(servidor_openai).generate_content("oi")
+
+
+def test_streaming_lento_perde_para_o_secundario_com_uso(servidor_openai):
+    servidor_openai.comportamento['primario'] = {'atraso': 1.5}
+    servidor_openai.comportamento['secundario'] = {'texto': "resposta do secundário"}
+    modelo_hedge = hedge(servidor_openai, atraso_inicial=0.2)
+    fragmentos = list(modelo_hedge.generate_content("oi", stream=True))
+    assert "".join(f.text for f in fragmentos) == "resposta do secundário"
+    assert {f.modelo for f in fragmentos} == {"secundario"}
+    assert fragmentos[-1].usage_metadata == UsoTokens(120, 7, 64)
+
+
+def test_streaming_erro_do_primario_passa_para_o_secundario(servidor_openai):
+    servidor_openai.comportamento['primario'] = {'status': 503}
+    fragmentos = list(hedge(servidor_openai, atraso_inicial=5).generate_content("oi", stream=True))
+    assert "".join(f.text for f in fragmentos) == "resposta de secundario"
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_resposta_do_secundario_nao_vai_para_o_cache_do_primario(servidor_openai, cache_memoria, streaming):
+    servidor_openai.comportamento['primario'] = {'atraso': 1.0}
+    cache = cache_memoria
+    gerador = GeradorPlano(hedge(servidor_openai, atraso_inicial=0.1), cache=cache)
+    ao_fragmento = (lambda texto: None) if streaming else None
+    assert gerador.gerar_texto("oi", ao_fragmento) == "resposta de secundario"
+    assert cache.respostas == {}
+
+    servidor_openai.comportamento['primario'] = {}
+    assert gerador.gerar_texto("oi", ao_fragmento) == "resposta de primario"
+    assert list(cache.respostas.values()) == ["resposta de primario"]
@@ -0,0 +1,61 @@
+import pytest
+
+from resiliencia import CircuitoAberto, Disjuntor, PoliticaResiliencia
+
+
+class ServiceUnavailable(Exception):
+    """Mesmo nome do erro 503 do SDK do Gemini"""
+
+
+def falhar(erro: Exception):
+    def funcao():
+        raise erro
+    return funcao
+
+
+def politica(disjuntor: Disjuntor) -> PoliticaResiliencia:
+    return PoliticaResiliencia(disjuntor=disjuntor, tentativas=1, espera_base=0)
+
+
+def test_disjuntor_abre_apos_falhas_repetiveis():
+    disjuntor = Disjuntor(limite_falhas=2, segundos_aberto=60)
+    for _ in range(2):
+        with pytest.raises(ServiceUnavailable):
+            politica(disjuntor).executar(falhar(ServiceUnavailable()))
+    assert disjuntor.estado == 'aberto'
+    with pytest.raises(CircuitoAberto):
+        politica(disjuntor).executar(lambda: "ok")
+
+
+def test_erro_nao_repetivel_nao_abre_o_circuito():
+    disjuntor = Disjuntor(limite_falhas=1, segundos_aberto=60)
+    with pytest.raises(ValueError):
+        politica(disjuntor).executar(falhar(ValueError("prompt inválido")))
+    assert disjuntor.estado == 'fechado'
+    assert politica(disjuntor).executar(lambda: "ok") == "ok"
+
+
+def test_erro_nao_repetivel_na_chamada_de_teste_fecha_o_circuito():
+    disjuntor = Disjuntor(limite_falhas=1, segundos_aberto=0)
+    with pytest.raises(ServiceUnavailable):
+        politica(disjuntor).executar(falhar(ServiceUnavailable()))
+    assert disjuntor.estado == 'aberto'
+    # A chamada de teste recebe uma resposta do modelo, ainda que de erro
+    with pytest.raises(ValueError):
+        politica(disjuntor).executar(falhar(ValueError("resposta inválida")))
+    assert disjuntor.estado == 'fechado'
+    assert politica(disjuntor).executar(lambda: "ok") == "ok"
+
+
+def test_falha_repetivel_na_chamada_de_teste_reabre_o_circuito():
+    disjuntor = Disjuntor(limite_falhas=3, segundos_aberto=0)
+    for _ in range(3):
+        with pytest.raises(ServiceUnavailable):
+            politica(disjuntor).executar(falhar(ServiceUnavailable()))
+    disjuntor.segundos_aberto = 60
+    disjuntor._aberto_em -= 60
+    with pytest.raises(ServiceUnavailable):
+        politica(disjuntor).executar(falhar(ServiceUnavailable()))
+    assert disjuntor.estado == 'aberto'
+    with pytest.raises(CircuitoAberto):
+        politica(disjuntor).executar(lambda: "ok")
@@ -0,0 +1,70 @@
+import pytest
+
+from benchmark import PARAMS_PADRAO
+from orcamento import calcular_distribuicao, tabela_distribuicao_markdown
+from tabelas import _numero, converter_valor, validar_secao
+
+
+@pytest.mark.parametrize("celula, valor", [
+    ("R$ 1.234,56", 1234.56),
+    ("1,234.56", 1234.56),
+    ("**R$ 2.000.000**", 2_000_000),
+    ("US$ 10,000", 10_000),
+    ("1.234", 1234),
+    ("1,5", 1.5),
+    ("0,123", 0.123),
+    ("1234.567", 1234.567),
+    ("-1.234,5", -1234.5),
+    ("12%", 0.12),
+    ("45,5%", 0.455),
+    ("100 %", 1.0),
+])
+def test_converte_formatos_numericos(celula, valor):
+    assert converter_valor(celula) == pytest.approx(valor)
+
+
+@pytest.mark.parametrize("celula", ["", "R$", "abc", "12a", "1..2", "1.2.3,4", "1,2,3", "1.23.456", "--5", "%"])
+def test_celula_mal_formada_nao_e_numerica(celula):
+    assert converter_valor(celula) is None
+
+
+def test_numero_mal_formado_levanta_erro():
+    with pytest.raises(ValueError):
+        _numero("1,2,3")
+
+
+def test_distribuicao_calculada_e_valida():
+    texto = tabela_distribuicao_markdown(calcular_distribuicao(PARAMS_PADRAO))
+    assert validar_secao('distribuicao_budget', texto, PARAMS_PADRAO) is None
+
+
+CRONOGRAMA = """### Cronograma
+| Fase | Período | % Budget | Meta Ads (R$) | Google Ads (R$) | Total (R$) |
+| --- | --- | --- | --- | --- | --- |
+| Lançamento | Semana 1 | 40% | 24.000,00 | 16.000,00 | 40.000,00 |
+| Otimização | Semanas 2-4 | {percentual} | 36.000,00 | 24.000,00 | {total} |
+"""
+
+
+def test_colunas_parciais_nao_precisam_somar_o_budget():
+    texto = CRONOGRAMA.format(percentual="60%", total="60.000,00")
+    assert validar_secao('cronograma', texto, PARAMS_PADRAO) is None
+
+
+@pytest.mark.parametrize("percentual, total, coluna", [
+    ("50%", "60.000,00", "% Budget"),
+    ("60%", "50.000,00", "Total (R$)"),
+])
+def test_tabela_que_nao_fecha_o_budget_falha(percentual, total, coluna):
+    erro = validar_secao('cronograma', CRONOGRAMA.format(percentual=percentual, total=total), PARAMS_PADRAO)
+    assert erro is not None and f"'{coluna}'" in erro
+
+
+def test_coluna_parcial_acima_do_budget_falha():
+    texto = CRONOGRAMA.format(percentual="60%", total="60.000,00").replace("36.000,00", "96.000,00")
+    assert "mais que o budget" in validar_secao('cronograma', texto, PARAMS_PADRAO)
+
+
+def test_secao_sem_alocacao_nao_e_validada():
+    texto = CRONOGRAMA.format(percentual="10%", total="1,00")
+    assert validar_secao('recomendacoes_publico', texto, PARAMS_PADRAO) is None
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+import tarefas
+from tarefas import FilaCheia, FilaTarefas
+
+
+class Executor:
+    """executar da fila: registra a ordem das tarefas e, até `liberar`, segura
+    cada uma depois de gravar a primeira seção"""
+
+    def __init__(self):
+        self.ordem = []
+        self.secoes_recebidas = {}
+        self.liberado = threading.Event()
+
+    def __call__(self, tarefa, ao_concluir, ao_fragmento):
+        self.ordem.append(tarefa['params']['nome'])
+        self.secoes_recebidas[tarefa['params']['nome']] = dict(tarefa['secoes'])
+        ao_concluir('recomendacao_estrategica', f"Estratégia de {tarefa['params']['nome']}")
+        self.liberado.wait(10)
+        return {'secoes': len(tarefa['secoes'])}
+
+
+@pytest.fixture
+def executor():
+    executor = Executor()
+    yield executor
+    executor.liberado.set()
+
+
+def esperar(condicao, prazo=5.0):
+    limite = time.monotonic() + prazo
+    while not condicao():
+        assert time.monotonic() < limite, "tempo esgotado"
+        time.sleep(0.01)
+
+
+def submeter(fila, usuario, nome):
+    return fila.submeter(usuario, {'nome': nome}, {})
+
+
+def test_usuarios_atendidos_em_rodizio(tmp_path, executor):
+    fila = FilaTarefas(str(tmp_path / "tarefas.sqlite3"), executor, trabalhadores=1, max_por_usuario=5)
+    submeter(fila, "ana", "a1")
+    esperar(lambda: executor.ordem == ["a1"])
+    ids = {nome: submeter(fila, usuario, nome) for usuario, nome in [
+        ("ana", "a2"), ("ana", "a3"), ("ana", "a4"), ("bia", "b1"), ("bia", "b2"), ("caio", "c1"),
+    ]}
+    ordem_esperada = ["a2", "b1", "c1", "a3", "b2", "a4"]
+    assert [fila.posicao(ids[nome]) for nome in ordem_esperada] == list(range(6))
+    assert fila.metricas()['usuarios_aguardando'] == 3
+
+    executor.liberado.set()
+    esperar(lambda: fila.metricas()['concluidas'] == 7)
+    assert executor.ordem == ["a1"] + ordem_esperada
+    assert all(fila.estado(i)['estado'] == 'concluida' for i in ids.values())
+
+
+def test_cota_por_usuario_e_limite_da_fila(tmp_path, executor):
+    fila = FilaTarefas(str(tmp_path / "tarefas.sqlite3"), executor, trabalhadores=1, max_pendentes=3,
+                       max_por_usuario=2)
+    submeter(fila, "ana", "a1")
+    esperar(lambda: executor.ordem == ["a1"])
+    submeter(fila, "ana", "a2")
+    # A tarefa em execução também conta na cota
+    with pytest.raises(FilaCheia):
+        submeter(fila, "ana", "a3")
+    submeter(fila, "bia", "b1")
+    submeter(fila, "caio", "c1")
+    with pytest.raises(FilaCheia):
+        submeter(fila, "davi", "d1")
+    assert fila.metricas()['na_fila'] == 3
+
+
+def test_tarefa_interrompida_e_retomada_com_as_secoes_gravadas(tmp_path, executor, monkeypatch):
+    caminho = str(tmp_path / "tarefas.sqlite3")
+    anterior = FilaTarefas(caminho, executor, trabalhadores=1)
+    interrompida = submeter(anterior, "ana", "a1")
+    esperar(lambda: anterior.estado(interrompida)['secoes'])
+
+    # Outra fila do mesmo processo não assume a tarefa, que continua em execução
+    outra = FilaTarefas(caminho, executor, trabalhadores=1)
+    assert outra.metricas()['na_fila'] == 0 and executor.ordem == ["a1"]
+
+    # Depois de reiniciar com o mesmo host e pid, a tarefa é de uma execução anterior
+    monkeypatch.setattr(tarefas, "_EXECUCAO", "reiniciada")
+    retomada = Executor()
+    retomada.liberado.set()
+    nova = FilaTarefas(caminho, retomada, trabalhadores=1)
+    esperar(lambda: nova.estado(interrompida)['estado'] == 'concluida')
+    assert retomada.ordem == ["a1"]
+    assert retomada.secoes_recebidas["a1"] == {'recomendacao_estrategica': "Estratégia de a1"}
+
+
+def test_erro_do_sqlite_fora_da_geracao_nao_para_o_trabalhador(tmp_path, executor, monkeypatch):
+    executor.liberado.set()
+    fila = FilaTarefas(str(tmp_path / "tarefas.sqlite3"), executor, trabalhadores=1)
+    estado = fila.estado
+    falhas = iter([True])
+
+    def estado_instavel(id_tarefa):
+        if next(falhas, False):
+            raise tarefas.sqlite3.OperationalError("database is locked")
+        return estado(id_tarefa)
+
+    monkeypatch.setattr(fila, "estado", estado_instavel)
+    primeira = submeter(fila, "ana", "a1")
+    esperar(lambda: fila.metricas()['falhas'] == 1)
+    segunda = submeter(fila, "ana", "a2")
+    esperar(lambda: fila.metricas()['concluidas'] == 1)
+    assert estado(primeira)['estado'] == 'falhou' and "database is locked" in estado(primeira)['erro']
+    assert estado(segunda)['estado'] == 'concluida'